@@ -16,11 +16,24 @@ from urllib.parse import urlparse
 from github_client import GitHubClient
 from core import (
     deduplicate_accounts, sort_priority, ensure_ws_path_field,
-    build_final_accounts, load_template, test_all_accounts
+    build_final_accounts, load_template, test_all_accounts, TOP_K_MAX_LATENCY_MS
 )
 from extractor import extract_accounts_from_config
-from converter import parse_link, inject_outbounds_to_template
-from database import save_github_config, get_github_config, save_test_session, get_latest_test_session
+from converter import inject_outbounds_to_template
+from concurrency import AdaptiveLimiter
+from budget import RunBudget
+from speedtest import run_speed_tests, load_speedtest_config
+from monitor import ConfigMonitor, load_github_client
+from retry_policy import RetryPolicy
+from database import (
+    save_github_config, get_github_config, save_test_session, get_latest_test_session,
+    get_setting, save_setting, clear_result_cache, get_speedtest_history
+)
+from result_cache import RESULT_CACHE_TTL_MINUTES
+from negative_cache import get_negative_cache
+from tester import enrich_geolocation
+from link_stream import LinkStream, iter_accounts
+from xray_pool import configure_xray_pool
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
@@ -37,56 +50,28 @@ session_data = {
     'custom_servers': None  # Store custom servers untuk config generation
 }
 
-MAX_CONCURRENT_TESTS = 5
+MAX_CONCURRENT_TESTS = 50  # concurrency awal; AdaptiveLimiter menyesuaikan selama run
 TEMPLATE_FILE = "template.json"
 
 def fetch_vpn_links_from_url(url, url_type='auto'):
     """
     Fetch VPN links from URL (API or raw text)
     url_type: 'api', 'raw', or 'auto'
+    Download di-stream per chunk (batas MAX_SOURCE_BYTES) dan link di-scan bertahap,
+    jadi body besar tidak pernah ditampung utuh sebagai response.text.
+    List link tetap dikumpulkan utuh: alur web add → dedupe → start_testing butuh semua akun
+    sebelum test dimulai. Test sambil download (test_streamed_accounts) hanya di CLI (main.py).
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        vpn_links = []
-        
-        # Try JSON first (API response)
-        try:
-            data = response.json()
-            
-            # Extract VPN links from JSON (flexible extraction)
-            def extract_from_json(obj):
-                if isinstance(obj, str):
-                    if any(proto in obj for proto in ['vless://', 'vmess://', 'trojan://', 'ss://']):
-                        vpn_links.append(obj)
-                elif isinstance(obj, list):
-                    for item in obj:
-                        extract_from_json(item)
-                elif isinstance(obj, dict):
-                    for value in obj.values():
-                        extract_from_json(value)
-            
-            extract_from_json(data)
-            
-        except json.JSONDecodeError:
-            # Not JSON, treat as plain text
-            pass
-        
-        # If no links found in JSON or it's plain text, use regex
-        if not vpn_links:
-            content = response.text
-            vpn_pattern = r"(?:vless|vmess|trojan|ss)://[^\s\n\r]+"
-            vpn_links = re.findall(vpn_pattern, content)
+        stream = LinkStream(url)
+        vpn_links = list(stream)
         
         return {
             'success': True,
             'links': vpn_links,
-            'count': len(vpn_links)
+            'count': len(vpn_links),
+            'bytes': stream.bytes_read,
+            'truncated': stream.truncated
         }
         
     except requests.exceptions.Timeout:
@@ -295,15 +280,9 @@ def add_links_and_test():
         })
     
     # Parse each link
-    accounts_from_links = []
     invalid_links = []
-    
-    for link in found_links:
-        parsed = parse_link(link)
-        if parsed:
-            accounts_from_links.append(parsed)
-        else:
-            invalid_links.append(link[:50] + "..." if len(link) > 50 else link)
+    accounts_from_links = list(iter_accounts(
+        found_links, on_invalid=lambda link: invalid_links.append(link[:50] + "..." if len(link) > 50 else link)))
     
     if not accounts_from_links:
         return jsonify({'success': False, 'message': 'No valid accounts could be parsed from the links'})
@@ -341,9 +320,50 @@ def add_links_and_test():
     return jsonify(response)
 
 @socketio.on('start_testing')
-def handle_start_testing():
+def handle_start_testing(data=None):
     print(f"🔍 DEBUG: start_testing received, accounts count: {len(session_data['all_accounts'])}")
     
+    # Freshness TTL hasil cache: dari client, lalu setting tersimpan, lalu default
+    data = data or {}
+    cache_ttl_minutes = data.get('cache_ttl_minutes')
+    if cache_ttl_minutes is None:
+        cache_ttl_minutes = get_setting('result_cache_ttl_minutes', RESULT_CACHE_TTL_MINUTES)
+    try:
+        cache_ttl_minutes = float(cache_ttl_minutes)
+    except (TypeError, ValueError):
+        cache_ttl_minutes = RESULT_CACHE_TTL_MINUTES
+    
+    # Batas waktu total run (detik); kosong/0 = tanpa batas
+    budget_seconds = data.get('budget_seconds')
+    if budget_seconds is None:
+        budget_seconds = get_setting('test_budget_seconds', None)
+    try:
+        budget_seconds = float(budget_seconds) if budget_seconds else None
+    except (TypeError, ValueError):
+        budget_seconds = None
+    
+    # Mode top-K per region (early exit); kosong/0 = test semua akun
+    top_k = data.get('top_k')
+    if top_k is None:
+        top_k = get_setting('top_k_per_region', None)
+    try:
+        top_k = int(top_k) if top_k else None
+    except (TypeError, ValueError):
+        top_k = None
+    top_k_max_latency = data.get('top_k_max_latency') or get_setting('top_k_max_latency', TOP_K_MAX_LATENCY_MS)
+    try:
+        top_k_max_latency = float(top_k_max_latency)
+    except (TypeError, ValueError):
+        top_k_max_latency = TOP_K_MAX_LATENCY_MS
+    
+    # Retry policy (max_attempts, base_delay, max_delay, jitter, fail_fast) dari payload/setting
+    retry_policy = RetryPolicy.from_dict(data.get('retry_policy') or get_setting('retry_policy', None))
+    
+    # Speed test (download/upload) untuk akun ✅ setelah test liveness; default mati
+    run_speedtest = data.get('speedtest')
+    if run_speedtest is None:
+        run_speedtest = get_setting('speedtest_enabled', False)
+    
     if not session_data['all_accounts']:
         print("❌ DEBUG: No accounts found in session_data")
         emit('testing_error', {'message': 'No accounts to test'})
@@ -389,8 +409,9 @@ def handle_start_testing():
             print(f"Starting testing for {len(live_results)} accounts - table will show accounts as they are tested")
             socketio.emit('testing_update', initial_data)
             
-            # Create semaphore and run tests
-            semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
+            # Create adaptive limiter and run tests
+            semaphore = AdaptiveLimiter(initial=MAX_CONCURRENT_TESTS)
+            budget = RunBudget(budget_seconds) if budget_seconds and budget_seconds > 0 else None
             
             # Create a background task to emit updates
             def emit_periodic_updates():
@@ -433,13 +454,24 @@ def handle_start_testing():
             
             # Main async function to run tests
             async def run_all_tests():
-                await test_all_accounts(session_data['all_accounts'], semaphore, live_results)
+                await test_all_accounts(session_data['all_accounts'], semaphore, live_results,
+                                        cache_ttl_minutes=cache_ttl_minutes, budget=budget,
+                                        top_k=top_k, top_k_max_latency=top_k_max_latency,
+                                        retry_policy=retry_policy)
+                
+                # Real geolocation hanya untuk akun yang lolos: semuanya masuk config auto-generate
+                await enrich_geolocation([res for res in live_results if res["Status"] == "✅"], budget, live_results)
+                
+                speedtest_summary = None
+                if run_speedtest:
+                    speedtest_summary = await run_speed_tests(live_results, load_speedtest_config(), live_results)
                 
                 # Count successful accounts (USER REQUEST: exclude dead accounts from final config)
                 successful_accounts = [res for res in live_results if res["Status"] == "✅"]
                 dead_accounts = [res for res in live_results if res["Status"] == "Dead"]
+                cached_count = len([res for res in live_results if res.get("Cached")])
                 
-                print(f"📊 Testing completed: {len(successful_accounts)} successful, {len(dead_accounts)} dead")
+                print(f"📊 Testing completed: {len(successful_accounts)} successful, {len(dead_accounts)} dead, {cached_count} from cache")
                 if dead_accounts:
                     print(f"💀 Dead accounts excluded from final config: {len(dead_accounts)} accounts")
                     for dead in dead_accounts:
@@ -449,10 +481,16 @@ def handle_start_testing():
                 successful_accounts.sort(key=sort_priority)
                 
                 # Save test session to database
+                concurrency_summary = semaphore.summary()
+                budget_summary = budget.summary() if budget else None
                 session_id = save_test_session({
                     'results': live_results,
                     'successful': len(successful_accounts),
                     'total': len(live_results),
+                    'cached': cached_count,
+                    'concurrency': concurrency_summary,
+                    'budget': budget_summary,
+                    'speedtest': speedtest_summary,
                     'timestamp': datetime.now().isoformat()
                 })
                 
@@ -502,6 +540,10 @@ def handle_start_testing():
                     'results': live_results,
                     'successful': len(successful_accounts),
                     'total': len(live_results),
+                    'cached': cached_count,
+                    'concurrency': concurrency_summary,
+                    'budget': budget_summary,
+                    'speedtest': speedtest_summary,
                     'session_id': session_id
                 })
             
@@ -740,6 +782,168 @@ def save_github_config():
             'message': f'Failed to save GitHub config: {str(e)}'
         })
 
+@app.route('/api/result-cache', methods=['GET', 'POST', 'DELETE'])
+def result_cache_settings():
+    """Lihat/ubah freshness TTL result cache, atau kosongkan cache-nya"""
+    try:
+        if request.method == 'DELETE':
+            deleted = clear_result_cache()
+            return jsonify({'success': True, 'message': f'Cleared {deleted} cached results'})
+        
+        if request.method == 'POST':
+            data = request.json or {}
+            ttl = float(data.get('ttl_minutes', RESULT_CACHE_TTL_MINUTES))
+            if ttl < 0:
+                return jsonify({'success': False, 'message': 'TTL must be >= 0'})
+            save_setting('result_cache_ttl_minutes', ttl)
+        
+        return jsonify({
+            'success': True,
+            'ttl_minutes': get_setting('result_cache_ttl_minutes', RESULT_CACHE_TTL_MINUTES)
+        })
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid TTL value'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Result cache error: {str(e)}'})
+
+# Payload key → setting key untuk default opsi run yang dibaca handle_start_testing
+TEST_SETTINGS = {
+    'budget_seconds': 'test_budget_seconds',
+    'top_k': 'top_k_per_region',
+    'top_k_max_latency': 'top_k_max_latency',
+    'retry_policy': 'retry_policy',
+    'speedtest': 'speedtest_enabled',
+    'xray_pool_size': 'xray_pool_size',
+    'xray_startup_timeout': 'xray_startup_timeout',
+}
+
+def apply_xray_settings():
+    """Pool xray bersama sesuai setting tersimpan (kosong = default env/CPU)"""
+    configure_xray_pool(get_setting('xray_pool_size', None), get_setting('xray_startup_timeout', None))
+
+def _test_setting_value(name, value):
+    """Validasi satu opsi run; ValueError/TypeError kalau tidak valid"""
+    if name == 'budget_seconds':
+        value = float(value) if value else None
+        if value is not None and value < 0:
+            raise ValueError(name)
+        return value
+    if name == 'top_k':
+        value = int(value) if value else None
+        if value is not None and value < 0:
+            raise ValueError(name)
+        return value
+    if name == 'top_k_max_latency':
+        value = float(value)
+        if value <= 0:
+            raise ValueError(name)
+        return value
+    if name == 'retry_policy':
+        return RetryPolicy.from_dict(value).to_dict() if value else None
+    if name in ('xray_pool_size', 'xray_startup_timeout'):
+        value = (int(value) if name == 'xray_pool_size' else float(value)) if value else None
+        if value is not None and value <= 0:
+            raise ValueError(name)
+        return value
+    return bool(value)
+
+@app.route('/api/test-settings', methods=['GET', 'POST'])
+def test_settings():
+    """
+    Lihat/ubah default opsi run: budget_seconds, top_k, top_k_max_latency, retry_policy, speedtest,
+    plus xray_pool_size / xray_startup_timeout (langsung diterapkan ke pool xray bersama)
+    """
+    try:
+        if request.method == 'POST':
+            data = request.json or {}
+            values = {name: _test_setting_value(name, data[name]) for name in TEST_SETTINGS if name in data}
+            for name, value in values.items():
+                save_setting(TEST_SETTINGS[name], json.dumps(value))  # JSON supaya bool/dict/None terbaca ulang
+            if 'xray_pool_size' in values or 'xray_startup_timeout' in values:
+                apply_xray_settings()
+        
+        return jsonify({
+            'success': True,
+            'budget_seconds': get_setting('test_budget_seconds', None),
+            'top_k': get_setting('top_k_per_region', None),
+            'top_k_max_latency': get_setting('top_k_max_latency', TOP_K_MAX_LATENCY_MS),
+            'retry_policy': RetryPolicy.from_dict(get_setting('retry_policy', None)).to_dict(),
+            'speedtest': get_setting('speedtest_enabled', False),
+            'xray_pool_size': get_setting('xray_pool_size', None),
+            'xray_startup_timeout': get_setting('xray_startup_timeout', None),
+        })
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Invalid test setting: {e}'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Test settings error: {str(e)}'})
+
+@app.route('/api/negative-cache', methods=['GET', 'DELETE'])
+def negative_cache_entries():
+    """Lihat daftar nama/endpoint di negative cache, atau kosongkan"""
+    try:
+        cache = get_negative_cache()
+        if request.method == 'DELETE':
+            deleted = cache.clear()
+            return jsonify({'success': True, 'message': f'Cleared {deleted} negative cache entries'})
+        
+        entries = cache.entries()
+        return jsonify({'success': True, 'count': len(entries), 'entries': entries, 'ttls': cache.ttls})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Negative cache error: {str(e)}'})
+
+# Monitor config terpublish (thread background, opsional)
+monitor_state = {'monitor': None}
+
+def start_config_monitor(github_path=None, config_file=None, interval_minutes=None, speedtest=False):
+    """Hentikan monitor lama (kalau ada) lalu jalankan monitor baru di thread background"""
+    if monitor_state['monitor']:
+        monitor_state['monitor'].stop()
+    github_client = load_github_client() if github_path else None
+    if github_path and not github_client:
+        raise RuntimeError('GitHub not configured')
+    monitor = ConfigMonitor(github_client, github_path, config_file, interval_minutes, speedtest)
+    monitor.start()
+    monitor_state['monitor'] = monitor
+    return monitor
+
+@app.route('/api/monitor', methods=['GET', 'POST', 'DELETE'])
+def config_monitor():
+    """Status monitor (GET), start dengan {github_path|config_file, interval_minutes, speedtest} (POST), stop (DELETE)"""
+    try:
+        if request.method == 'DELETE':
+            if monitor_state['monitor']:
+                monitor_state['monitor'].stop()
+            save_setting('monitor_config', json.dumps({'enabled': False}))
+            return jsonify({'success': True, 'message': 'Monitor stopped'})
+        
+        if request.method == 'POST':
+            data = request.json or {}
+            monitor_config = {
+                'enabled': True,
+                'github_path': data.get('github_path'),
+                'config_file': data.get('config_file'),
+                'interval_minutes': data.get('interval_minutes'),
+                'speedtest': bool(data.get('speedtest', False)),
+            }
+            start_config_monitor(monitor_config['github_path'], monitor_config['config_file'],
+                                 monitor_config['interval_minutes'], monitor_config['speedtest'])
+            save_setting('monitor_config', json.dumps(monitor_config))
+        
+        monitor = monitor_state['monitor']
+        return jsonify({'success': True, 'monitor': monitor.get_status() if monitor else None})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Monitor error: {str(e)}'})
+
+@app.route('/api/speedtest-history')
+def speedtest_history():
+    """Riwayat speed test terbaru (opsional ?fingerprint=...&limit=...)"""
+    try:
+        limit = int(request.args.get('limit', 100))
+        history = get_speedtest_history(request.args.get('fingerprint'), limit)
+        return jsonify({'success': True, 'history': history})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Speedtest history error: {str(e)}'})
+
 @app.route('/api/get-accounts')
 def get_accounts():
     """Get all parsed VPN accounts for server replacement"""
@@ -842,6 +1046,29 @@ def parse_servers_input(servers_input):
     
     return servers
 
+def start_background_services():
+    """Pool xray sesuai setting tersimpan + lanjutkan monitor yang aktif sebelum restart"""
+    apply_xray_settings()
+    monitor_config = get_setting('monitor_config') or {}
+    if monitor_config.get('enabled'):
+        try:
+            start_config_monitor(monitor_config.get('github_path'), monitor_config.get('config_file'),
+                                 monitor_config.get('interval_minutes'), monitor_config.get('speedtest', False))
+            print("🛰️ Config monitor resumed")
+        except Exception as e:
+            print(f"⚠️ Config monitor not started: {e}")
+
+def is_reloader_parent(use_reloader):
+    """Proses induk reloader werkzeug hanya mengawasi file; app yang melayani request jalan di proses anak"""
+    return use_reloader and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+
+if __name__ != '__main__':
+    # Di-import oleh run.py atau server WSGI: tanpa reloader, proses ini yang melayani request
+    start_background_services()
+
 if __name__ == '__main__':
     load_dotenv()
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    debug = True  # socketio.run memakai reloader werkzeug kalau debug
+    if not is_reloader_parent(debug):
+        start_background_services()
+    socketio.run(app, debug=debug, host='0.0.0.0', port=5000)
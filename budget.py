@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Run Budget - batas waktu total untuk satu run test_all_accounts
+Timeout per percobaan dan jumlah retry dipotong supaya seluruh run muat di deadline
+"""
+
+import math
+import time
+
+# Nilai normal (tanpa budget) - sama dengan konstanta di tester.py
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_DELAY = 1.5
+MIN_CONNECT_TIMEOUT = 1.0  # di bawah ini hampir semua akun jauh akan terlihat mati
+SLOW_STAGE_MIN_SECONDS = 20  # sisa waktu minimum untuk real geolocation (xray + proxy probe)
+# Bagian akhir budget yang tidak dipakai probe: DNS, GeoIP, hasil & cleanup
+RESERVE_SHARE = 0.25
+RESERVE_MIN_SECONDS = 1.0
+RESERVE_MAX_SHARE = 0.5  # budget sangat kecil: reserve minimum tidak boleh makan semua waktu probe
+ATTEMPT_SHARE = 0.8  # satu percobaan maksimal sebagian ini dari sisa jendela probe
+
+class RunBudget:
+    """
+    Deadline satu run + rencana probe (timeout connect, jumlah retry) yang muat di dalamnya.
+    Probe hanya boleh memakai jendela sampai probe_deadline; sisanya (reserve) untuk
+    resolusi, GeoIP dan cleanup. plan() dipanggil setelah jumlah target dan concurrency diketahui.
+    """
+
+    def __init__(self, total_seconds):
+        self.total_seconds = float(total_seconds)
+        self.deadline = time.monotonic() + self.total_seconds
+        self.reserve_seconds = min(max(self.total_seconds * RESERVE_SHARE, RESERVE_MIN_SECONDS),
+                                   self.total_seconds * RESERVE_MAX_SHARE)
+        self.probe_deadline = self.deadline - self.reserve_seconds
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT
+        self.max_retries = DEFAULT_MAX_RETRIES
+        self.retry_delay = DEFAULT_RETRY_DELAY
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def probe_remaining(self):
+        """Sisa jendela probe (remaining() dikurangi reserve)"""
+        return max(0.0, self.probe_deadline - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def clip(self, timeout):
+        """Timeout satu percobaan: di bawah sisa jendela probe, jadi reserve tetap utuh"""
+        return max(0.05, min(timeout, self.probe_remaining() * ATTEMPT_SHARE))
+
+    def allow_slow_stage(self):
+        """Real geolocation (xray) hanya kalau sisa waktunya masih cukup"""
+        return self.remaining() >= SLOW_STAGE_MIN_SECONDS
+
+    def plan(self, target_count, concurrency):
+        """
+        Hitung jatah waktu per target: jendela probe / jumlah gelombang (target / concurrency).
+        Retry dikurangi dulu, baru timeout connect dipotong (maksimal ATTEMPT_SHARE jatahnya).
+        """
+        waves = max(1, math.ceil(target_count / max(1, concurrency)))
+        allowance = self.probe_remaining() / waves
+
+        def worst_case(retries, timeout):
+            return retries * timeout + (retries - 1) * self.retry_delay
+
+        retries, timeout = DEFAULT_MAX_RETRIES, DEFAULT_CONNECT_TIMEOUT
+        while worst_case(retries, timeout) > allowance and retries > 1:
+            retries -= 1
+        if worst_case(retries, timeout) > allowance:
+            timeout = max(MIN_CONNECT_TIMEOUT, allowance * ATTEMPT_SHARE)
+
+        self.max_retries = retries
+        self.connect_timeout = timeout
+        print(f"⏱️ Budget {self.total_seconds:.0f}s for {target_count} targets @ {concurrency} concurrent: "
+              f"timeout {timeout:.1f}s × {retries} tries, {self.reserve_seconds:.1f}s reserved")
+        return self
+
+    def summary(self):
+        return {
+            'budget_seconds': self.total_seconds,
+            'connect_timeout': round(self.connect_timeout, 1),
+            'max_retries': self.max_retries,
+            'expired': self.expired(),
+        }
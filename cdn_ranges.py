@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+CDN Ranges - klasifikasi IP edge CDN (Cloudflare, Fastly, CloudFront, Akamai) secara lokal
+Range CIDR dari cdn_ranges.txt dimuat ke prefix trie biner; lookup O(panjang prefix),
+tanpa geo lookup. Dipakai resolver untuk skip/deprioritize IP CDN sebelum spend kuota geo.
+"""
+
+import argparse
+import ipaddress
+import os
+import socket
+import threading
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+CDN_RANGES_FILE = os.getenv("CDN_RANGES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            "cdn_ranges.txt"))
+
+# Daftar resmi untuk --update (Akamai tidak punya, tetap dari file)
+CLOUDFLARE_URLS = ("https://www.cloudflare.com/ips-v4", "https://www.cloudflare.com/ips-v6")
+FASTLY_URL = "https://api.fastly.com/public-ip-list"
+AWS_RANGES_URL = "https://ip-ranges.amazonaws.com/ip-ranges.json"
+
+class PrefixTrie:
+    """
+    Trie biner per bit alamat (root terpisah IPv4/IPv6). Node = [child0, child1, value];
+    lookup jalan dari MSB dan ingat value terakhir = longest prefix match.
+    """
+
+    def __init__(self):
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+        self.count = 0
+
+    def insert(self, cidr, value):
+        network = ipaddress.ip_network(cidr, strict=False)
+        node = self.roots[network.version]
+        bits = int(network.network_address)
+        width = network.max_prefixlen
+        for depth in range(network.prefixlen):
+            bit = (bits >> (width - 1 - depth)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = value
+        self.count += 1
+
+    def lookup(self, ip):
+        """Value prefix terpanjang yang memuat ip, atau None (juga untuk string bukan IP)"""
+        try:
+            if ":" in str(ip):
+                packed, version, width = socket.inet_pton(socket.AF_INET6, ip), 6, 128
+            else:
+                packed, version, width = socket.inet_pton(socket.AF_INET, ip), 4, 32
+        except (OSError, TypeError):
+            return None
+        bits = int.from_bytes(packed, "big")
+        node = self.roots[version]
+        found = node[2]
+        for depth in range(width):
+            node = node[(bits >> (width - 1 - depth)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                found = node[2]
+        return found
+
+    def __len__(self):
+        return self.count
+
+def read_ranges(path=CDN_RANGES_FILE):
+    """List (provider, cidr) dari file ranges (baris kosong/# diabaikan)"""
+    ranges = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split("#", 1)[0].split()
+            if len(parts) >= 2:
+                ranges.append((parts[0].lower(), parts[1]))
+    return ranges
+
+class CDNRanges:
+    """Prefix trie CDN yang dimuat dari file; reload() setelah file di-update"""
+
+    def __init__(self, path=CDN_RANGES_FILE):
+        self.path = path
+        self.trie = PrefixTrie()
+        self.providers = set()
+
+    def load(self):
+        trie = PrefixTrie()
+        providers = set()
+        if os.path.exists(self.path):
+            for provider, cidr in read_ranges(self.path):
+                try:
+                    trie.insert(cidr, provider)
+                except ValueError:
+                    print(f"⚠️ CDN ranges: invalid CIDR '{cidr}' ({provider})")
+                    continue
+                providers.add(provider)
+        else:
+            print(f"⚠️ CDN ranges file not found: {self.path}")
+        self.trie, self.providers = trie, providers  # swap sekali, aman untuk pembaca thread lain
+        return self
+
+    reload = load
+
+    def provider_for(self, ip):
+        """Nama provider CDN untuk ip (mis. 'cloudflare'), atau None kalau bukan CDN"""
+        return self.trie.lookup(ip) if ip else None
+
+    def is_cdn(self, ip):
+        return self.provider_for(ip) is not None
+
+    def split(self, ips):
+        """Pisahkan (non_cdn, cdn) dengan urutan asli - untuk evaluasi IP non-CDN lebih dulu"""
+        non_cdn, cdn = [], []
+        for ip in ips:
+            (cdn if self.is_cdn(ip) else non_cdn).append(ip)
+        return non_cdn, cdn
+
+_shared_ranges = None
+_shared_lock = threading.Lock()
+
+def get_cdn_ranges():
+    """CDNRanges bersama untuk semua resolver (dimuat sekali)"""
+    global _shared_ranges
+    with _shared_lock:
+        if _shared_ranges is None:
+            _shared_ranges = CDNRanges().load()
+        return _shared_ranges
+
+def is_cdn_ip(ip):
+    return get_cdn_ranges().is_cdn(ip)
+
+# --- update dari sumber resmi ---
+
+def fetch_official_ranges(timeout=15):
+    """Ambil daftar resmi Cloudflare, Fastly dan CloudFront; return {provider: [cidr, ...]}"""
+    if requests is None:
+        raise RuntimeError("requests tidak terinstall")
+    fetched = {}
+
+    cloudflare = []
+    for url in CLOUDFLARE_URLS:
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        cloudflare.extend(line.strip() for line in response.text.splitlines() if line.strip())
+    fetched["cloudflare"] = cloudflare
+
+    response = requests.get(FASTLY_URL, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    fetched["fastly"] = data.get("addresses", []) + data.get("ipv6_addresses", [])
+
+    response = requests.get(AWS_RANGES_URL, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    fetched["cloudfront"] = (
+        [p["ip_prefix"] for p in data.get("prefixes", []) if p.get("service") == "CLOUDFRONT"]
+        + [p["ipv6_prefix"] for p in data.get("ipv6_prefixes", []) if p.get("service") == "CLOUDFRONT"]
+    )
+    return fetched
+
+def update_ranges_file(path=CDN_RANGES_FILE):
+    """Ganti range provider yang punya daftar resmi; provider lain (mis. akamai) dipertahankan"""
+    fetched = {provider: cidrs for provider, cidrs in fetch_official_ranges().items() if cidrs}
+    kept = [(provider, cidr) for provider, cidr in (read_ranges(path) if os.path.exists(path) else [])
+            if provider not in fetched]
+    lines = ["# CDN edge ranges - satu \"provider CIDR\" per baris, dipakai cdn_ranges.py",
+             "# Di-generate oleh: python cdn_ranges.py --update", ""]
+    for provider, cidrs in fetched.items():
+        lines.extend(f"{provider} {cidr}" for cidr in cidrs)
+    lines.extend(f"{provider} {cidr}" for provider, cidr in kept)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"✅ CDN ranges updated: {', '.join(f'{p} {len(c)}' for p, c in fetched.items())}, "
+          f"{len(kept)} kept → {path}")
+    if _shared_ranges is not None:
+        _shared_ranges.reload()
+
+def main():
+    parser = argparse.ArgumentParser(description="VortexVpn CDN ranges")
+    parser.add_argument("--update", action="store_true", help="update file ranges dari daftar resmi")
+    parser.add_argument("ips", nargs="*", help="IP yang mau dicek")
+    args = parser.parse_args()
+
+    if args.update:
+        update_ranges_file()
+    ranges = get_cdn_ranges()
+    for ip in args.ips:
+        print(f"{ip}: {ranges.provider_for(ip) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Adaptive Concurrency - limiter AIMD pengganti asyncio.Semaphore untuk test_all_accounts
+Naik pelan-pelan selama timeout/refused jarang, turun setengah kalau rasionya melonjak
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+INITIAL_CONCURRENCY = 50
+MIN_CONCURRENCY = 4
+MAX_CONCURRENCY = 1000
+FDS_PER_PROBE = 2  # socket probe + cadangan untuk DNS/geo
+FD_RESERVE = 64  # fd untuk Flask, SQLite, log, dll.
+SCORING_FANOUT = 8  # evaluasi kandidat IP paralel (geo lookup) per domain
+
+def fd_concurrency_cap():
+    """Batas concurrency dari RLIMIT_NOFILE proses (None kalau tidak tersedia)"""
+    if resource is None:
+        return None
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ValueError, OSError):
+        return None
+    if soft == resource.RLIM_INFINITY:
+        return None
+    return max(MIN_CONCURRENCY, (soft - FD_RESERVE) // FDS_PER_PROBE)
+
+def evaluate_concurrently(items, evaluate, stop=None, max_workers=SCORING_FANOUT):
+    """
+    Jalankan evaluate(item) paralel di thread (maks max_workers sekaligus) untuk kode blocking.
+    Return [(item, hasil)] urut selesai; evaluate yang raise dilewati. Kalau stop(item, hasil)
+    True, berhenti: item yang belum mulai dibatalkan, yang sedang jalan tidak ditunggu.
+    """
+    items = list(items)
+    if not items:
+        return []
+    results = []
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix="evaluate")
+    try:
+        futures = {executor.submit(evaluate, item): item for item in items}
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                continue
+            item, result = futures[future], future.result()
+            results.append((item, result))
+            if stop is not None and stop(item, result):
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+class TokenBucket:
+    """
+    Token bucket thread-safe untuk API dengan kuota per menit (mis. ip-api).
+    Isi ulang rate_per_minute token/menit sampai capacity; acquire() blocking sampai ada token.
+    limit()/pause() menyelaraskan bucket dengan header rate-limit dari server.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or rate_per_minute)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self):
+        """Ambil satu token kalau ada (return 0), atau return detik sampai token berikutnya"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._updated:
+                return self._updated - now  # sedang di-pause
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Blocking sampai dapat token; return total detik menunggu"""
+        waited = 0.0
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def refund(self):
+        """Kembalikan token yang tidak jadi dipakai"""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def limit(self, remaining):
+        """Server bilang sisa kuota tinggal `remaining`: jangan pakai lebih dari itu"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, max(0, remaining))
+
+    def pause(self, seconds):
+        """Kuota habis sampai `seconds` lagi; setelah itu window baru = bucket penuh"""
+        with self._lock:
+            resume_at = time.monotonic() + max(0.0, seconds)
+            if resume_at > self._updated:
+                self._updated = resume_at
+                self.tokens = self.capacity
+
+class AdaptiveLimiter:
+    """
+    Drop-in pengganti asyncio.Semaphore (`async with limiter:`) dengan limit yang berubah.
+    Probe melapor lewat record(ok, error_kind); tiap `window` percobaan limit dievaluasi:
+    - rasio timeout rendah → limit += increase_step (additive increase)
+    - rasio timeout melonjak di atas baseline → limit *= decrease_factor (multiplicative decrease)
+    Refused/unreachable = host mati, bukan kongesti, jadi tidak dihitung. Window pertama hanya
+    mengisi baseline (list yang banyak host blackhole tidak langsung dipotong).
+    min_interval: jarak minimum (detik) antar probe yang mulai, supaya tidak burst (mode monitor)
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY,
+                 window=20, increase_step=5, decrease_factor=0.5,
+                 low_failure_rate=0.10, high_failure_rate=0.25, min_interval=0):
+        cap = fd_concurrency_cap()
+        self.maximum = min(maximum, cap) if cap else maximum
+        self.minimum = min(minimum, self.maximum)
+        self.limit = max(self.minimum, min(int(initial), self.maximum))
+        self.window = window
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.low_failure_rate = low_failure_rate
+        self.high_failure_rate = high_failure_rate
+        self.min_interval = min_interval
+        self._next_start = 0.0
+
+        self.active = 0
+        self.peak_active = 0
+        self._condition = None  # dibuat di loop yang memakai limiter
+        self._window_attempts = 0
+        self._window_failures = 0
+        self._baseline = None  # EWMA rasio timeout (None sampai window pertama selesai)
+        self._started = time.monotonic()
+        self.history = [(0.0, self.limit)]
+
+    def _get_condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        if self.min_interval:
+            # Pesan jadwal mulai dulu, baru tunggu slot; tidak memegang slot selama menunggu jadwal
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self.min_interval
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.active -= 1
+            condition.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.release()
+
+    def record(self, ok, error_kind=""):
+        """Laporan satu percobaan koneksi; hanya timeout yang dihitung sebagai sinyal kongesti"""
+        self._window_attempts += 1
+        if not ok and error_kind == "timeout":
+            self._window_failures += 1
+        if self._window_attempts >= self.window:
+            self._adjust()
+
+    def _adjust(self):
+        rate = self._window_failures / self._window_attempts
+        self._window_attempts = 0
+        self._window_failures = 0
+
+        old_limit = self.limit
+        if self._baseline is None:
+            # Window pertama: belum ada pembanding, jadi hanya boleh naik
+            self._baseline = rate
+            if rate <= self.low_failure_rate:
+                self.limit = min(self.maximum, self.limit + self.increase_step)
+        else:
+            if rate > self.high_failure_rate and rate > self._baseline * 1.5:
+                self.limit = max(self.minimum, int(self.limit * self.decrease_factor))
+            elif rate <= max(self.low_failure_rate, self._baseline * 1.1):
+                self.limit = min(self.maximum, self.limit + self.increase_step)
+            self._baseline = 0.8 * self._baseline + 0.2 * rate
+
+        if self.limit != old_limit:
+            self.history.append((round(time.monotonic() - self._started, 1), self.limit))
+            print(f"⚙️ Concurrency {old_limit} → {self.limit} (failure rate {rate:.0%})")
+            if self.limit > old_limit and self._condition is not None:
+                asyncio.ensure_future(self._wake_waiters())
+
+    async def _wake_waiters(self):
+        condition = self._get_condition()
+        async with condition:
+            condition.notify_all()
+
+    def summary(self):
+        """Ringkasan untuk run summary: limit akhir, puncak, dan riwayat (detik, limit)"""
+        limits = [limit for _, limit in self.history]
+        return {
+            'final': self.limit,
+            'min': min(limits),
+            'max': max(limits),
+            'peak_active': self.peak_active,
+            'cap': self.maximum,
+            'history': self.history,
+        }
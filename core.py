@@ -1,8 +1,18 @@
 import re
 import json
 import asyncio
+import threading
 from converter import extract_ip_port_from_path
-from tester import test_account
+from tester import test_account, get_test_target_async, get_probe_identity, enrich_geolocation_sync
+from concurrency import AdaptiveLimiter
+from result_cache import load_fresh_results, store_results
+from budget import RunBudget
+from negative_cache import get_negative_cache
+from utils import geoip_lookup_async
+from geoip_client import PRIORITY_BACKGROUND
+
+TOP_K_MAX_LATENCY_MS = 500  # top-K mode: akun dihitung "sehat" kalau latency TCP <= ini
+UNKNOWN_REGION = "❓"
 
 def clean_account_dict(account: dict) -> dict:
     return {k: v for k, v in account.items() if not k.startswith("_")}
@@ -48,26 +58,325 @@ def ensure_ws_path_field(accounts: list) -> list:
                 acc["_ws_path"] = transport.get("path", "")
     return accounts
 
-async def test_all_accounts(accounts: list, semaphore, live_results):
-    print(f"🔍 DEBUG: test_all_accounts called with {len(accounts)} accounts")
-    
-    tasks = [
-        test_account(acc, semaphore, i, live_results)
-        for i, acc in enumerate(accounts)
-    ]
-    print(f"🔍 DEBUG: Created {len(tasks)} test tasks")
+# Field identitas akun yang TIDAK ikut disalin saat hasil probe dibagi ke akun lain
+ACCOUNT_IDENTITY_FIELDS = ("index", "OriginalTag", "VpnType", "OriginalAccount")
+
+def fan_out_result(leader_result: dict, account: dict, index: int) -> dict:
+    """Salin hasil probe target bersama ke akun lain dengan target dan identitas probe yang sama"""
+    result = {k: v for k, v in leader_result.items() if k not in ACCOUNT_IDENTITY_FIELDS}
+    result.update({
+        "index": index,
+        "OriginalTag": account.get("tag", "proxy"),
+        "VpnType": account.get("type", "N/A"),
+        "OriginalAccount": account,
+        "SharedWith": leader_result["index"],
+    })
+    return result
+
+async def group_accounts_by_target(accounts: list, indexes=None) -> list:
+    """
+    Kelompokkan akun berdasarkan target (ip, port) hasil get_test_target_async plus identitas probe
+    (transport, path + Host ws, SNI) dari get_probe_identity; hanya akun dengan probe identik yang berbagi hasil.
+    indexes: subset akun yang mau dikelompokkan (default semua).
+    Return list grup (list index); akun tanpa target jadi grup sendiri.
+    """
+    if indexes is None:
+        indexes = range(len(accounts))
+    indexes = list(indexes)
+    targets = await asyncio.gather(*(get_test_target_async(accounts[i]) for i in indexes))
+    groups = {}
+    for i, (ip, port, source) in zip(indexes, targets):
+        key = (ip, int(port), get_probe_identity(accounts[i], source)) if ip else ("unresolved", i)
+        groups.setdefault(key, []).append(i)
+    return list(groups.values())
+
+async def predict_group_regions(accounts: list, groups: list) -> list:
+    """
+    Perkiraan negara (flag) tiap grup dari GeoIP IP target leader, sebelum di-probe.
+    Lookup ikut batch GeoIP bersama, jadi ribuan grup hanya butuh beberapa request.
+    """
+    targets = await asyncio.gather(*(get_test_target_async(accounts[indexes[0]]) for indexes in groups))
+    geos = await asyncio.gather(*(geoip_lookup_async(ip, priority=PRIORITY_BACKGROUND) if ip else _unknown_geo()
+                                  for ip, _, _ in targets))
+    return [geo.get("Country", UNKNOWN_REGION) for geo in geos]
+
+async def _unknown_geo():
+    return {"Country": UNKNOWN_REGION}
+
+def is_healthy_result(result: dict, max_latency=TOP_K_MAX_LATENCY_MS) -> bool:
+    """Akun lolos test dengan latency numerik di bawah batas top-K"""
+    latency = result.get("Latency")
+    return (result.get("Status") == "✅" and isinstance(latency, (int, float))
+            and 0 <= latency <= max_latency)
+
+async def test_all_accounts(accounts: list, semaphore, live_results, cache_ttl_minutes=None, budget=None,
+                            top_k=None, top_k_max_latency=TOP_K_MAX_LATENCY_MS, retry_policy=None,
+                            indexes=None, plan_budget=True):
+    """
+    Test semua akun secara concurrent.
+    semaphore: asyncio.Semaphore (limit tetap) atau AdaptiveLimiter (limit AIMD);
+    None = AdaptiveLimiter default.
+    Akun dengan target (ip, port) dan identitas probe (transport, path/Host ws, SNI) sama hanya di-probe sekali;
+    hasilnya dibagi ke semua anggota grup.
+    cache_ttl_minutes: hasil test akun yang sama (fingerprint) lebih baru dari ini dipakai ulang
+    tanpa probe (ditandai "Cached"); None/0 = selalu test ulang.
+    budget: RunBudget (atau jumlah detik) untuk membatasi lama seluruh run. Timeout/retry
+    disesuaikan supaya muat; saat deadline, target yang belum selesai dibatalkan dan
+    ditandai TestType "Deadline" (kecuali sudah ✅). None = tanpa batas.
+    top_k: mode early-exit per region. Grup diurutkan sesuai sort_priority (perkiraan negara dari
+    GeoIP); begitu satu negara punya top_k akun ✅ dengan latency <= top_k_max_latency, sisa grup
+    negara itu dibatalkan dan ditandai ⏭️ (TestType "Skipped (top-K)"). None = test semua.
+    retry_policy: RetryPolicy untuk test_account (None = DEFAULT_RETRY_POLICY).
+    indexes: hanya test akun di index ini (mis. satu batch dari test_streamed_accounts); None = semua.
+    plan_budget: False kalau pemanggil sudah memanggil budget.plan untuk seluruh run
+    (test_streamed_accounts), supaya satu batch kecil tidak menimpa rencana itu.
+    """
+    if indexes is None:
+        indexes = range(len(accounts))
+    print(f"🔍 DEBUG: test_all_accounts called with {len(indexes)} accounts")
+    if semaphore is None:
+        semaphore = AdaptiveLimiter()
     
     results = []
-    for i, future in enumerate(asyncio.as_completed(tasks)):
-        print(f"🔍 DEBUG: Processing task {i+1}/{len(tasks)}")
-        result = await future
-        print(f"🔍 DEBUG: Task {i+1} completed with status: {result.get('Status', 'unknown')}")
-        live_results[result["index"]].update(result)
+    cached_results = load_fresh_results(accounts, cache_ttl_minutes, indexes)
+    for index, result in cached_results.items():
+        live_results[index].update(result)
         results.append(result)
+    if cached_results:
+        print(f"⚡ {len(cached_results)} accounts served from result cache (< {cache_ttl_minutes} min old)")
+    
+    to_test = [i for i in indexes if i not in cached_results]
+    groups = await group_accounts_by_target(accounts, to_test)
+    print(f"🔗 {len(to_test)} accounts → {len(groups)} unique targets")
+    
+    regions = {}
+    region_healthy = {}
+    if top_k:
+        predicted = await predict_group_regions(accounts, groups)
+        order = sorted(range(len(groups)), key=lambda g: sort_priority({"Country": predicted[g]}))
+        groups = [groups[g] for g in order]
+        regions = {tuple(groups[g]): predicted[order[g]] for g in range(len(groups))}
+        for result in results:
+            if is_healthy_result(result, top_k_max_latency):
+                region_healthy[result.get("Country")] = region_healthy.get(result.get("Country"), 0) + 1
+        print(f"🎯 Top-{top_k} per region mode: {len(set(regions.values()))} predicted regions, "
+              f"latency <= {top_k_max_latency}ms")
+    
+    if budget is not None and not isinstance(budget, RunBudget):
+        budget = RunBudget(budget)
+    if budget is not None and plan_budget:
+        budget.plan(len(groups), concurrency_limit(semaphore))
+    
+    async def test_group(indexes):
+        leader = indexes[0]
+        for i in indexes[1:]:
+            live_results[i]["Status"] = "🔄"
+        leader_result = await test_account(accounts[leader], semaphore, leader, live_results, budget, retry_policy)
+        group_results = [leader_result]
+        for i in indexes[1:]:
+            member_result = fan_out_result(leader_result, accounts[i], i)
+            live_results[i].update(member_result)
+            group_results.append(member_result)
+        return group_results
+    
+    tasks = {asyncio.ensure_future(test_group(indexes)): indexes for indexes in groups}
+    print(f"🔍 DEBUG: Created {len(tasks)} test tasks")
+    
+    pending = set(tasks)
+    
+    async def skip_region(region):
+        """Batalkan semua grup yang tersisa untuk region yang kuotanya sudah penuh"""
+        skipped = [task for task in pending if regions.get(tuple(tasks[task])) == region]
+        if not skipped:
+            return
+        print(f"🎯 {region} has {region_healthy[region]} healthy accounts: skipping {len(skipped)} remaining targets")
+        for task in skipped:
+            pending.discard(task)
+            task.cancel()
+        await asyncio.gather(*skipped, return_exceptions=True)
+        for task in skipped:
+            results.extend(unfinished_results(tasks[task], accounts, live_results,
+                                              status="⏭️", test_type="Skipped (top-K)"))
+    
+    if top_k:
+        for region, count in list(region_healthy.items()):
+            if count >= top_k and region != UNKNOWN_REGION:
+                await skip_region(region)
+    
+    completed_tasks = 0
+    while pending:
+        timeout = budget.remaining() if budget is not None else None
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break  # deadline budget habis
+        for task in done:
+            completed_tasks += 1
+            print(f"🔍 DEBUG: Processing task {completed_tasks}/{len(tasks)}")
+            for result in task.result():
+                print(f"🔍 DEBUG: Account {result['index']} completed with status: {result.get('Status', 'unknown')}")
+                live_results[result["index"]].update(result)
+                results.append(result)
+                if top_k and is_healthy_result(result, top_k_max_latency):
+                    region = result.get("Country", UNKNOWN_REGION)
+                    region_healthy[region] = region_healthy.get(region, 0) + 1
+                    if region_healthy[region] == top_k and region != UNKNOWN_REGION:
+                        await skip_region(region)
+    
+    if pending:
+        print(f"⏱️ Budget exhausted: cancelling {len(pending)} unfinished targets")
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in pending:
+            results.extend(unfinished_results(tasks[task], accounts, live_results))
     
     print(f"🔍 DEBUG: test_all_accounts completed, {len(results)} results")
+    store_results(accounts, results)
+    get_negative_cache().flush()
+    if isinstance(semaphore, AdaptiveLimiter):
+        summary = semaphore.summary()
+        print(f"⚙️ Concurrency: final {summary['final']}, range {summary['min']}-{summary['max']}, peak active {summary['peak_active']}")
     return results
 
+def concurrency_limit(semaphore) -> int:
+    """Limit saat ini dari AdaptiveLimiter (.limit) atau asyncio.Semaphore (._value)"""
+    return getattr(semaphore, 'limit', None) or getattr(semaphore, '_value', 1)
+
+def new_live_result(index: int, account: dict) -> dict:
+    """Baris live_results awal (status WAIT) untuk satu akun"""
+    return {
+        "index": index,
+        "OriginalTag": account.get("tag", "proxy"),
+        "OriginalAccount": account,
+        "VpnType": account.get("type", "-"),
+        "Country": "❓",
+        "Provider": "-",
+        "Tested IP": "-",
+        "Latency": -1,
+        "Jitter": -1,
+        "ICMP": "N/A",
+        "Status": "WAIT",
+    }
+
+# Ingestion streaming: akun dari sumber yang masih di-download dites per batch
+STREAM_BATCH_SIZE = 50
+STREAM_BATCH_WAIT = 0.5  # detik; batch yang belum penuh tetap dites setelah sumber diam selama ini
+_STREAM_END = object()
+
+async def test_streamed_accounts(account_source, semaphore, accounts: list, live_results: list,
+                                 cache_ttl_minutes=None, budget=None, retry_policy=None,
+                                 batch_size=STREAM_BATCH_SIZE):
+    """
+    Seperti test_all_accounts, tapi akun datang dari iterator blocking (mis. link_stream.iter_accounts
+    atas LinkStream) yang dibaca di thread terpisah. Akun yang sudah ada di `accounts` dites dulu;
+    tiap akun baru ditambahkan ke accounts & live_results lalu dites per batch, jadi probe pertama
+    jalan selagi download masih berlangsung. Semua batch berbagi semaphore (dan budget).
+    Budget di-plan di sini dari semua akun yang belum selesai di run ini (batch yang masih
+    jalan + batch baru), bukan dari isi satu batch saja.
+    Top-K per region butuh semua kandidat sekaligus, jadi tidak didukung di sini.
+    """
+    if semaphore is None:
+        semaphore = AdaptiveLimiter()
+    if budget is not None and not isinstance(budget, RunBudget):
+        budget = RunBudget(budget)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def produce():
+        try:
+            for account in account_source:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, account)
+        except Exception as e:
+            print(f"⚠️ Account stream error: {e}")
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+    
+    producer = threading.Thread(target=produce, name="account-stream", daemon=True)
+    producer.start()
+    
+    batches = []  # (future test_all_accounts, jumlah akun batch)
+    
+    def start_batch(indexes):
+        if budget is not None:
+            unfinished = sum(size for future, size in batches if not future.done())
+            budget.plan(unfinished + len(indexes), concurrency_limit(semaphore))
+        future = asyncio.ensure_future(test_all_accounts(
+            accounts, semaphore, live_results, cache_ttl_minutes=cache_ttl_minutes, budget=budget,
+            retry_policy=retry_policy, indexes=indexes, plan_budget=False))
+        batches.append((future, len(indexes)))
+    
+    ensure_ws_path_field(accounts)
+    for index in range(len(live_results), len(accounts)):
+        live_results.append(new_live_result(index, accounts[index]))
+    if accounts:
+        start_batch(list(range(len(accounts))))
+    
+    batch = []
+    streamed = 0
+    try:
+        while True:
+            wait = STREAM_BATCH_WAIT if batch else None
+            if budget is not None:
+                wait = min(wait or budget.remaining(), budget.remaining())
+            try:
+                account = await asyncio.wait_for(queue.get(), timeout=wait)
+            except asyncio.TimeoutError:
+                account = None
+                if budget is not None and budget.remaining() <= 0:
+                    print("⏱️ Budget exhausted: ignoring the rest of the account stream")
+                    break
+            if account is _STREAM_END:
+                break
+            if account is not None:
+                index = len(accounts)
+                accounts.append(ensure_ws_path_field([account])[0])
+                live_results.append(new_live_result(index, account))
+                batch.append(index)
+                streamed += 1
+            if batch and (account is None or len(batch) >= batch_size):
+                start_batch(batch)
+                batch = []
+    finally:
+        stop.set()
+    if batch:
+        start_batch(batch)
+    print(f"📥 Account stream: {streamed} accounts in {len(batches)} batches")
+    
+    results = []
+    for batch_results in await asyncio.gather(*(future for future, _ in batches)):
+        results.extend(batch_results)
+    return results
+
+def unfinished_results(indexes, accounts, live_results, status="❌", test_type="Deadline"):
+    """
+    Hasil untuk grup yang dibatalkan sebelum selesai (deadline budget / kuota top-K penuh).
+    Kalau leader sudah lolos TCP (✅) sebelum dibatalkan, hasil itu dipakai semua anggota;
+    selain itu semua anggota ditandai `status` dengan TestType `test_type`.
+    """
+    leader = indexes[0]
+    leader_result = dict(live_results[leader])
+    if leader_result.get("Status") != "✅":
+        leader_result.update({
+            "Status": status,
+            "TestType": test_type,
+            "Latency": "Timeout" if test_type == "Deadline" else -1,
+        })
+    leader_result.update({
+        "index": leader,
+        "OriginalTag": accounts[leader].get("tag", "proxy"),
+        "VpnType": accounts[leader].get("type", "N/A"),
+        "OriginalAccount": accounts[leader],
+    })
+    group_results = [leader_result]
+    for i in indexes[1:]:
+        group_results.append(fan_out_result(leader_result, accounts[i], i))
+    for result in group_results:
+        live_results[result["index"]].update(result)
+    return group_results
+
 def build_final_accounts(successful_results, custom_servers=None):
     """
     Build final accounts untuk config dengan optional server replacement
@@ -76,6 +385,9 @@ def build_final_accounts(successful_results, custom_servers=None):
         successful_results: Test results yang successful
         custom_servers: Optional list server baru untuk replacement
     """
+    # Akun terpilih yang real geolocation-nya belum jalan (caller belum enrich) → jalankan sekarang
+    enrich_geolocation_sync(successful_results)
+    
     final_accounts = []
     
     # Jika ada custom servers, buat random distribution
@@ -1,6 +1,7 @@
 import sqlite3
 import json
 import os
+import time
 from pathlib import Path
 
 DB_FILE = "vortexvpn.db"
@@ -29,6 +30,49 @@ def init_db():
         )
     ''')
     
+    # Create geoip_cache table for ip-api answers (raw JSON + expiry)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS geoip_cache (
+            ip TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    
+    # Create result_cache table for per-account test results (keyed by fingerprint)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS result_cache (
+            fingerprint TEXT PRIMARY KEY,
+            result TEXT NOT NULL,
+            tested_at REAL NOT NULL
+        )
+    ''')
+    
+    # Create speedtest_history table for throughput benchmark results
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS speedtest_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fingerprint TEXT NOT NULL,
+            tag TEXT,
+            result TEXT NOT NULL,
+            tested_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_speedtest_history_fp
+        ON speedtest_history (fingerprint, tested_at)
+    ''')
+    
+    # Create negative_cache table for unresolvable names and dead endpoints
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS negative_cache (
+            key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            reason TEXT,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    
     conn.commit()
     conn.close()
 
@@ -116,5 +160,200 @@ def get_latest_test_session():
             return None
     return None
 
+def get_cached_geoip(ips):
+    """Get unexpired GeoIP answers for a list of IPs as {ip: data}."""
+    ips = list(ips)
+    if not ips:
+        return {}
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    found = {}
+    now = time.time()
+    # SQLite membatasi jumlah parameter per query, jadi dipecah per 500
+    for start in range(0, len(ips), 500):
+        chunk = ips[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f'''
+            SELECT ip, data FROM geoip_cache
+            WHERE ip IN ({placeholders}) AND expires_at > ?
+        ''', (*chunk, now))
+        for ip, data in cursor.fetchall():
+            try:
+                found[ip] = json.loads(data)
+            except:
+                continue
+    
+    conn.close()
+    return found
+
+def save_geoip_results(results, ttl_seconds):
+    """Save GeoIP answers ({ip: data}) with an expiry."""
+    if not results:
+        return
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    expires_at = time.time() + ttl_seconds
+    cursor.executemany('''
+        INSERT OR REPLACE INTO geoip_cache (ip, data, expires_at)
+        VALUES (?, ?, ?)
+    ''', [(ip, json.dumps(data), expires_at) for ip, data in results.items()])
+    
+    conn.commit()
+    conn.close()
+
+def purge_expired_geoip():
+    """Delete expired GeoIP cache rows."""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM geoip_cache WHERE expires_at <= ?', (time.time(),))
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return deleted
+
+def get_cached_results(fingerprints, max_age_seconds):
+    """Get test results newer than max_age_seconds as {fingerprint: (result, tested_at)}."""
+    fingerprints = list(fingerprints)
+    if not fingerprints:
+        return {}
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    found = {}
+    min_tested_at = time.time() - max_age_seconds
+    for start in range(0, len(fingerprints), 500):
+        chunk = fingerprints[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f'''
+            SELECT fingerprint, result, tested_at FROM result_cache
+            WHERE fingerprint IN ({placeholders}) AND tested_at > ?
+        ''', (*chunk, min_tested_at))
+        for fingerprint, result, tested_at in cursor.fetchall():
+            try:
+                found[fingerprint] = (json.loads(result), tested_at)
+            except:
+                continue
+    
+    conn.close()
+    return found
+
+def save_cached_results(results):
+    """Save test results ({fingerprint: result}) stamped with the current time."""
+    if not results:
+        return
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    tested_at = time.time()
+    cursor.executemany('''
+        INSERT OR REPLACE INTO result_cache (fingerprint, result, tested_at)
+        VALUES (?, ?, ?)
+    ''', [(fp, json.dumps(result, ensure_ascii=False), tested_at) for fp, result in results.items()])
+    
+    conn.commit()
+    conn.close()
+
+def clear_result_cache():
+    """Delete all cached test results."""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM result_cache')
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return deleted
+
+def get_negative_cache_entries():
+    """Get unexpired negative cache rows as {key: (kind, reason, expires_at)}; expired rows are deleted."""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    now = time.time()
+    cursor.execute('DELETE FROM negative_cache WHERE expires_at <= ?', (now,))
+    cursor.execute('SELECT key, kind, reason, expires_at FROM negative_cache')
+    entries = {key: (kind, reason or "", expires_at) for key, kind, reason, expires_at in cursor.fetchall()}
+    
+    conn.commit()
+    conn.close()
+    return entries
+
+def save_negative_cache_entries(entries):
+    """Save negative cache rows; entries is a list of (key, kind, reason, expires_at)."""
+    if not entries:
+        return
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    cursor.executemany('''
+        INSERT OR REPLACE INTO negative_cache (key, kind, reason, expires_at)
+        VALUES (?, ?, ?, ?)
+    ''', entries)
+    
+    conn.commit()
+    conn.close()
+
+def clear_negative_cache():
+    """Delete all negative cache rows."""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM negative_cache')
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return deleted
+
+def save_speedtest_history(entries):
+    """Append speed test results; entries is a list of (fingerprint, tag, result)."""
+    if not entries:
+        return
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    tested_at = time.time()
+    cursor.executemany('''
+        INSERT INTO speedtest_history (fingerprint, tag, result, tested_at)
+        VALUES (?, ?, ?, ?)
+    ''', [(fp, tag, json.dumps(result, ensure_ascii=False), tested_at) for fp, tag, result in entries])
+    
+    conn.commit()
+    conn.close()
+
+def get_speedtest_history(fingerprint=None, limit=100):
+    """Get recent speed test results (newest first), optionally for one account fingerprint."""
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    
+    if fingerprint:
+        cursor.execute('''
+            SELECT fingerprint, tag, result, tested_at FROM speedtest_history
+            WHERE fingerprint = ? ORDER BY tested_at DESC LIMIT ?
+        ''', (fingerprint, limit))
+    else:
+        cursor.execute('''
+            SELECT fingerprint, tag, result, tested_at FROM speedtest_history
+            ORDER BY tested_at DESC LIMIT ?
+        ''', (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    history = []
+    for fp, tag, result, tested_at in rows:
+        try:
+            history.append({"fingerprint": fp, "tag": tag, "tested_at": tested_at, **json.loads(result)})
+        except ValueError:
+            continue
+    return history
+
 # Initialize database on import
 init_db()
\ No newline at end of file
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+DNS Client - query A/AAAA langsung lewat UDP ke beberapa resolver sekaligus (tanpa dig/nslookup)
+Semua query (resolver × tipe record) jalan paralel dengan timeout per query, jawaban digabung.
+Server & port bisa diarahkan ke stub DNS lokal untuk testing.
+"""
+
+import asyncio
+import os
+import random
+import socket
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from negative_cache import classify_dns_error, get_negative_cache
+
+DEFAULT_DNS_SERVERS = [s.strip() for s in os.getenv("DNS_SERVERS", "8.8.8.8,1.1.1.1").split(",") if s.strip()]
+DNS_PORT = 53
+DNS_QUERY_TIMEOUT = 2.0  # detik per query; semua query paralel, jadi ini juga batas total
+
+QTYPES = {"A": 1, "AAAA": 28}
+QCLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+def build_query(name: str, qtype: int, qid: int) -> bytes:
+    """Paket query DNS standar (RD=1, satu pertanyaan)"""
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0)
+    qname = b""
+    for label in name.rstrip(".").split("."):
+        encoded = label.encode("idna") if not label.isascii() else label.encode("ascii")
+        if not encoded or len(encoded) > 63:
+            raise ValueError(f"invalid DNS label in '{name}'")
+        qname += bytes([len(encoded)]) + encoded
+    return header + qname + b"\x00" + struct.pack("!HH", qtype, QCLASS_IN)
+
+def _skip_name(data: bytes, offset: int) -> int:
+    """Lewati nama (label / pointer kompresi) di paket, return offset sesudahnya"""
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += 1 + length
+
+def parse_response(data: bytes, qid: int) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Return (rcode, [(ip, ttl), ...]) dari semua record A/AAAA di answer section
+    (termasuk ujung rantai CNAME). ValueError kalau paket rusak atau bukan jawaban query ini.
+    """
+    try:
+        rid, flags, qdcount, ancount, _, _ = struct.unpack_from("!HHHHHH", data, 0)
+        if rid != qid or not flags & 0x8000:
+            raise ValueError("not a response to this query")
+        offset = 12
+        for _ in range(qdcount):
+            offset = _skip_name(data, offset) + 4
+        records = []
+        for _ in range(ancount):
+            offset = _skip_name(data, offset)
+            rtype, _, ttl, rdlength = struct.unpack_from("!HHIH", data, offset)
+            offset += 10
+            rdata = data[offset:offset + rdlength]
+            offset += rdlength
+            if rtype == QTYPES["A"] and rdlength == 4:
+                records.append((socket.inet_ntop(socket.AF_INET, rdata), ttl))
+            elif rtype == QTYPES["AAAA"] and rdlength == 16:
+                records.append((socket.inet_ntop(socket.AF_INET6, rdata), ttl))
+        return flags & 0x000F, records
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"malformed DNS response: {e}")
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    """Satu query UDP: datagram dengan ID yang cocok menyelesaikan future, sisanya diabaikan"""
+
+    def __init__(self, qid, future):
+        self.qid = qid
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if self.future.done():
+            return
+        try:
+            self.future.set_result(parse_response(data, self.qid))
+        except ValueError:
+            pass  # paket lain/rusak; tunggu jawaban berikutnya sampai timeout
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+class DNSClient:
+    """Client DNS UDP async; resolve() query semua server × tipe record secara paralel"""
+
+    def __init__(self, servers=None, timeout=DNS_QUERY_TIMEOUT, port=DNS_PORT):
+        self.servers = list(servers or DEFAULT_DNS_SERVERS)
+        self.timeout = timeout
+        self.port = port
+        self.stats = {"queries": 0, "answers": 0, "timeouts": 0, "errors": 0}
+
+    async def query(self, name: str, qtype="A", server: Optional[str] = None,
+                    timeout: Optional[float] = None) -> List[Tuple[str, int]]:
+        """Satu query ke satu server; return [(ip, ttl)], kosong kalau gagal/timeout/NXDOMAIN"""
+        _, records = await self._query(name, qtype, server, timeout)
+        return records
+
+    async def _query(self, name, qtype, server, timeout):
+        """Return (rcode, records); rcode None kalau timeout/error jaringan (tidak ada jawaban)"""
+        loop = asyncio.get_running_loop()
+        qid = random.randrange(0x10000)
+        try:
+            packet = build_query(name, QTYPES[qtype], qid)
+        except (ValueError, UnicodeError):
+            return RCODE_NXDOMAIN, []  # nama tidak valid, tidak akan pernah resolve
+        future = loop.create_future()
+        self.stats["queries"] += 1
+        transport = None
+        try:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _QueryProtocol(qid, future), remote_addr=(server or self.servers[0], self.port))
+            transport.sendto(packet)
+            rcode, records = await asyncio.wait_for(future, timeout=timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return None, []
+        except OSError:
+            self.stats["errors"] += 1
+            return None, []
+        finally:
+            if transport is not None:
+                transport.close()
+        if rcode != 0:
+            if rcode != RCODE_NXDOMAIN:
+                self.stats["errors"] += 1
+            return rcode, []
+        self.stats["answers"] += 1
+        return rcode, records
+
+    async def _system_lookup(self, name: str):
+        """Resolver sistem (getaddrinfo, ikut /etc/hosts); return (rcode, records) tanpa TTL"""
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(
+                loop.getaddrinfo(name, None, family=socket.AF_INET, type=socket.SOCK_STREAM),
+                timeout=self.timeout,
+            )
+        except (asyncio.TimeoutError, OSError, UnicodeError) as e:
+            return (RCODE_NXDOMAIN if classify_dns_error(e) == "nxdomain" else None), []
+        return 0, [(info[4][0], None) for info in infos]
+
+    async def resolve(self, name: str, qtypes=("A", "AAAA"), servers=None, timeout=None,
+                      include_system=False) -> Tuple[List[str], Optional[int]]:
+        """
+        Query semua server × qtypes paralel, gabungkan jawaban (urutan pertama muncul, tanpa duplikat).
+        Return (ips, ttl) dengan ttl = TTL terkecil dari jawaban DNS (None kalau tidak ada).
+        """
+        ips, ttl, _ = await self.lookup(name, qtypes, servers, timeout, include_system)
+        return ips, ttl
+
+    async def lookup(self, name: str, qtypes=("A", "AAAA"), servers=None, timeout=None,
+                     include_system=False) -> Tuple[List[str], Optional[int], Optional[str]]:
+        """
+        Seperti resolve(), plus jenis kegagalan kalau tidak ada IP sama sekali:
+        'nxdomain' kalau ada resolver yang menjawab NXDOMAIN, selain itu 'dns' (timeout/SERVFAIL).
+        """
+        jobs = [self._query(name, qtype, server, timeout)
+                for server in (servers or self.servers) for qtype in qtypes]
+        if include_system:
+            jobs.append(self._system_lookup(name))
+        answers = await asyncio.gather(*jobs)
+        ips, ttls, rcodes = [], [], set()
+        for rcode, records in answers:
+            rcodes.add(rcode)
+            for ip, ttl in records:
+                if ip not in ips:
+                    ips.append(ip)
+                if ttl is not None:
+                    ttls.append(ttl)
+        if ips:
+            return ips, (min(ttls) if ttls else None), None
+        return [], None, "nxdomain" if RCODE_NXDOMAIN in rcodes else "dns"
+
+def resolve_domain_ips(name: str, servers=None, timeout=DNS_QUERY_TIMEOUT, qtypes=("A",),
+                       include_system=True) -> List[str]:
+    """
+    Versi sync untuk kode blocking (resolver lokasi): satu event loop singkat per nama.
+    Kalau dipanggil dari thread yang sudah punya loop jalan, query dijalankan di thread lain.
+    Nama yang gagal di-resolve dicatat di negative cache bersama (dan langsung [] selama masih berlaku).
+    """
+    negative = get_negative_cache()
+    if negative.check_name(name):
+        return []
+    client = DNSClient(servers, timeout)
+
+    def run():
+        ips, _, failure = asyncio.run(client.lookup(name, qtypes, include_system=include_system))
+        if failure:
+            negative.add_name(name, failure, "resolve_domain_ips")
+        return ips
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return run()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="dns") as executor:
+        return executor.submit(run).result()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Async DNS Resolver - resolve banyak hostname sekaligus tanpa nge-block event loop
+Cache TTL + LRU terbatas, dan lookup yang sama yang sedang jalan digabung (coalesced)
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dns_client import DNSClient
+from negative_cache import classify_dns_error, get_negative_cache
+
+DEFAULT_TTL = 300  # detik, dipakai kalau sumber jawaban tidak memberi TTL
+MIN_TTL = 30  # TTL DNS lebih kecil (mis. 0 di CDN) tetap di-cache selama ini
+MAX_CACHE_ENTRIES = 4096
+RESOLVE_TIMEOUT = 5  # detik per nama
+
+class AsyncResolver:
+    """
+    Resolver hostname → list IPv4 dengan TTL cache, LRU, dan in-flight coalescing.
+    dns_client (dns_client.DNSClient, opsional): query UDP langsung, TTL jawaban dipakai untuk cache;
+    tanpa itu (atau kalau kosong) lewat getaddrinfo sistem dengan default_ttl.
+    negative_cache (negative_cache.NegativeCache, opsional): nama yang gagal di-resolve dicatat dan
+    langsung dijawab [] selama masih berlaku.
+    """
+
+    def __init__(self, max_entries=MAX_CACHE_ENTRIES, default_ttl=DEFAULT_TTL, timeout=RESOLVE_TIMEOUT,
+                 dns_client=None, negative_cache=None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self.dns_client = dns_client
+        self.negative_cache = negative_cache
+        self._cache = OrderedDict()  # name -> (expires_at, [ips])
+        self._lock = threading.Lock()
+        self._inflight = {}  # name -> asyncio.Future (terikat ke loop pemanggil)
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "negative": 0}
+
+    def _is_ip(self, address: str) -> bool:
+        try:
+            socket.inet_aton(address)
+            return True
+        except (OSError, TypeError):
+            return False
+
+    def get_cached(self, name: str) -> Optional[List[str]]:
+        """Ambil jawaban dari cache kalau belum expired"""
+        key = name.lower().rstrip(".")
+        with self._lock:
+            entry = self._cache.get(key)
+            if not entry:
+                return None
+            expires_at, ips = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return list(ips)
+
+    def store(self, name: str, ips: List[str], ttl: Optional[float] = None):
+        """Simpan jawaban ke cache; entry paling lama dibuang kalau penuh"""
+        if not ips:
+            return
+        key = name.lower().rstrip(".")
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, list(ips))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    async def _lookup(self, name: str) -> Tuple[List[str], Optional[float], Optional[str]]:
+        """
+        Lookup sebenarnya: DNSClient (kalau ada) lalu getaddrinfo milik event loop.
+        Return (ips, ttl, failure) dengan failure 'nxdomain'/'dns' kalau tidak ada IP.
+        """
+        if self.dns_client is not None:
+            ips, ttl, _ = await self.dns_client.lookup(name, ("A",))
+            if ips:
+                return ips, (max(MIN_TTL, ttl) if ttl is not None else None), None
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(
+                loop.getaddrinfo(name, None, family=socket.AF_INET, type=socket.SOCK_STREAM),
+                timeout=self.timeout,
+            )
+        except (asyncio.TimeoutError, OSError, UnicodeError) as e:
+            return [], None, classify_dns_error(e)
+        ips = []
+        for info in infos:
+            ip = info[4][0]
+            if ip not in ips:
+                ips.append(ip)
+        return ips, None, None if ips else "dns"
+
+    async def resolve_all(self, name: str) -> List[str]:
+        """Resolve satu nama ke semua IPv4-nya (cache → in-flight → lookup baru)"""
+        if not name:
+            return []
+        if self._is_ip(name):
+            return [name]
+
+        cached = self.get_cached(name)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+        if self.negative_cache is not None and self.negative_cache.check_name(name):
+            self.stats["negative"] += 1
+            return []
+
+        key = name.lower().rstrip(".")
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            self.stats["coalesced"] += 1
+            ips = await asyncio.shield(pending)
+            if ips is None:
+                # Task yang lookup dibatalkan (top-K / budget), bukan task ini: lookup ulang
+                return await self.resolve_all(name)
+            return list(ips)
+
+        self.stats["misses"] += 1
+        future = loop.create_future()
+        self._inflight[key] = future
+        result = None  # tetap None kalau task ini dibatalkan → waiter lookup ulang sendiri
+        try:
+            ips, ttl, failure = await self._lookup(name)
+            result = ips
+            self.store(name, ips, ttl)
+            if failure and self.negative_cache is not None:
+                self.negative_cache.add_name(name, failure, "AsyncResolver")
+        except Exception:
+            if result is None:
+                result = []
+            raise
+        finally:
+            # Selalu diselesaikan supaya waiter tidak menunggu selamanya
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_result(result)
+        return list(ips)
+
+    async def resolve(self, name: str) -> Optional[str]:
+        """Resolve satu nama ke IP pertama (atau None)"""
+        ips = await self.resolve_all(name)
+        return ips[0] if ips else None
+
+    async def resolve_many(self, names: List[str]) -> Dict[str, Optional[str]]:
+        """Resolve banyak nama secara bersamaan; hasil {name: ip_or_None}"""
+        unique = list(dict.fromkeys(n for n in names if n))
+        answers = await asyncio.gather(*(self.resolve(n) for n in unique))
+        return dict(zip(unique, answers))
+
+_shared_resolver = None
+_shared_lock = threading.Lock()
+
+def get_resolver() -> AsyncResolver:
+    """
+    Resolver bersama untuk satu proses (cache dipakai lintas run). Query lewat DNSClient UDP
+    (DNS_SERVERS) supaya cache ikut TTL record; getaddrinfo hanya fallback (mis. /etc/hosts).
+    """
+    global _shared_resolver
+    with _shared_lock:
+        if _shared_resolver is None:
+            _shared_resolver = AsyncResolver(dns_client=DNSClient(), negative_cache=get_negative_cache())
+        return _shared_resolver
+
+def resolve_blocking(name: str) -> Optional[str]:
+    """
+    get_resolver().resolve() untuk kode blocking (mis. real geolocation): cache TTL dan negative
+    cache bersama tetap dipakai. Kalau thread ini sudah punya loop jalan, lookup di thread lain.
+    """
+    def run():
+        return asyncio.run(get_resolver().resolve(name))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return run()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="dns") as executor:
+        return executor.submit(run).result()
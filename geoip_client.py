@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+GeoIP Client - lookup ip-api.com secara batch (max 100 IP per request)
+IP yang diminta dikumpulkan dulu sebentar, dikirim sekaligus lewat /batch,
+lalu jawabannya disimpan di tabel geoip_cache (vortexvpn.db) dengan expiry.
+Kalau dataset offline (geoip_offline.py) tersedia, IP dijawab dari situ dulu.
+Semua request online lewat satu token bucket per proses (kuota ip-api) dan antrian
+berprioritas: IP akun yang akan masuk config final dikirim duluan.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterable, Optional
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+from database import get_cached_geoip, save_geoip_results, purge_expired_geoip
+from geoip_offline import get_offline_geoip
+from concurrency import TokenBucket
+
+GEOIP_API_URL = "http://ip-api.com"
+GEOIP_FIELDS = "status,message,country,countryCode,isp,org,query"
+BATCH_SIZE = 100  # batas ip-api untuk endpoint /batch
+FLUSH_DELAY = 0.05  # detik menunggu IP lain sebelum batch dikirim
+SUCCESS_TTL = 7 * 24 * 3600  # jawaban sukses jarang berubah
+FAIL_TTL = 24 * 3600  # "fail" (private/reserved range) tetap di-cache, lebih pendek
+REQUEST_TIMEOUT = 10
+LOOKUP_TIMEOUT = 30  # batas tunggu caller sync
+REQUESTS_PER_MINUTE = 15  # ip-api gratis: /batch 15 request/menit (= 1500 IP), /json 45
+MAX_BATCH_ATTEMPTS = 3  # batch yang kena 429/error jaringan diantrikan ulang, bukan dijawab None
+RATE_LIMIT_PAUSE = 60  # detik, kalau 429 tanpa header X-Ttl
+
+# Prioritas antrian (kecil = duluan)
+PRIORITY_FINAL = 0  # akun lolos test, akan masuk config final
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2  # prediksi region top-K sebelum probe
+
+def _int_header(response, name) -> Optional[int]:
+    """Header angka dari response; None kalau tidak ada / bukan angka (header lain tetap dipakai)"""
+    try:
+        return int(response.headers.get(name, ""))
+    except ValueError:
+        return None
+
+class GeoIPClient:
+    """Client ip-api dengan antrian batch berprioritas, token bucket, session keep-alive dan cache SQLite"""
+
+    def __init__(self, api_url=GEOIP_API_URL, batch_size=BATCH_SIZE, flush_delay=FLUSH_DELAY,
+                 success_ttl=SUCCESS_TTL, fail_ttl=FAIL_TTL, use_db_cache=True, use_offline=True,
+                 requests_per_minute=REQUESTS_PER_MINUTE):
+        self.api_url = api_url.rstrip("/")
+        self.batch_size = batch_size
+        self.flush_delay = flush_delay
+        self.success_ttl = success_ttl
+        self.fail_ttl = fail_ttl
+        self.use_db_cache = use_db_cache
+        self.offline = get_offline_geoip() if use_offline else None
+        self.session = requests.Session() if requests else None
+        self._lock = threading.Lock()
+        self._pending = {}  # ip -> [priority, seq, Future, attempts] yang belum dikirim
+        self._inflight = {}  # ip -> Future yang batch-nya sedang dikirim
+        self._seq = itertools.count()  # FIFO di dalam prioritas yang sama
+        self._worker = None
+        self.bucket = TokenBucket(requests_per_minute)
+        self.stats = {"requests": 0, "offline_hits": 0, "cache_hits": 0, "looked_up": 0,
+                      "rate_limited": 0, "requeued": 0, "bucket_wait_seconds": 0.0}
+        if use_db_cache:
+            # Baris expired tidak pernah dibaca lagi; buang sekali per client supaya tabel tidak tumbuh terus
+            try:
+                purged = purge_expired_geoip()
+                if purged:
+                    print(f"🧹 GeoIP cache: purged {purged} expired rows")
+            except Exception as e:
+                print(f"⚠️ GeoIP cache purge error: {e}")
+
+    def _count(self, name, amount=1):
+        """Tambah counter stats; worker dan thread caller update bersamaan, jadi lewat self._lock"""
+        with self._lock:
+            self.stats[name] += amount
+
+    # --- cache ---
+
+    def _from_offline(self, ips) -> Dict[str, dict]:
+        if self.offline is None:
+            return {}
+        found = {}
+        for ip in ips:
+            data = self.offline.lookup(ip)
+            if data:
+                found[ip] = data
+        self._count("offline_hits", len(found))
+        return found
+
+    def _from_cache(self, ips) -> Dict[str, dict]:
+        if not self.use_db_cache:
+            return {}
+        try:
+            return get_cached_geoip(ips)
+        except Exception as e:
+            print(f"⚠️ GeoIP cache read error: {e}")
+            return {}
+
+    def _to_cache(self, results: Dict[str, dict]):
+        if not self.use_db_cache or not results:
+            return
+        ok = {ip: d for ip, d in results.items() if d.get("status") == "success"}
+        fail = {ip: d for ip, d in results.items() if d.get("status") != "success"}
+        try:
+            save_geoip_results(ok, self.success_ttl)
+            save_geoip_results(fail, self.fail_ttl)
+        except Exception as e:
+            print(f"⚠️ GeoIP cache write error: {e}")
+
+    # --- HTTP ---
+
+    def _respect_rate_limit(self, response):
+        """Selaraskan token bucket dengan header ip-api (X-Rl sisa request, X-Ttl detik sampai reset)"""
+        remaining = _int_header(response, "X-Rl")
+        reset_in = _int_header(response, "X-Ttl")
+        if response.status_code == 429:
+            self._count("rate_limited")
+            self.bucket.pause(reset_in if reset_in is not None else RATE_LIMIT_PAUSE)
+            print(f"⏳ GeoIP rate limited (429), pausing {reset_in if reset_in is not None else RATE_LIMIT_PAUSE}s")
+        elif remaining is not None:
+            self.bucket.limit(remaining)
+            if remaining <= 0 and reset_in is not None:
+                self.bucket.pause(reset_in)
+
+    def _post_batch(self, ips) -> Optional[Dict[str, dict]]:
+        """Kirim satu request /batch; return {ip: raw_json}, atau None kalau perlu dicoba lagi (429/jaringan/5xx)"""
+        if not self.session or not ips:
+            return {}
+        try:
+            self._count("requests")
+            response = self.session.post(
+                f"{self.api_url}/batch",
+                params={"fields": GEOIP_FIELDS},
+                json=[{"query": ip} for ip in ips],
+                timeout=REQUEST_TIMEOUT,
+            )
+        except requests.RequestException as e:
+            print(f"⚠️ GeoIP batch request failed: {e}")
+            return None
+        self._respect_rate_limit(response)
+        if response.status_code == 429 or response.status_code >= 500:
+            return None
+        if response.status_code != 200:
+            print(f"⚠️ GeoIP batch HTTP {response.status_code}")
+            return {}
+        try:
+            answers = response.json()
+        except ValueError:
+            return {}
+        results = {}
+        for ip, data in zip(ips, answers):
+            if isinstance(data, dict):
+                results[data.get("query") or ip] = data
+        return results
+
+    # --- antrian batch ---
+
+    def _ensure_worker(self):
+        """Dipanggil dengan self._lock dipegang; satu worker kirim batch satu per satu"""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+            self._worker.start()
+
+    def _take_batch(self):
+        """Dipanggil dengan self._lock dipegang: batch_size IP dengan prioritas tertinggi"""
+        chosen = heapq.nsmallest(self.batch_size, self._pending.items(), key=lambda item: item[1][:2])
+        batch = {}
+        for ip, entry in chosen:
+            del self._pending[ip]
+            batch[ip] = entry
+            self._inflight[ip] = entry[2]
+        return batch
+
+    def _worker_loop(self):
+        # Tunggu sebentar supaya IP dari caller lain ikut masuk batch pertama;
+        # selama menunggu token / satu request jalan, IP baru menumpuk jadi batch berikutnya
+        # (dan yang prioritasnya lebih tinggi menyalip).
+        time.sleep(self.flush_delay)
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._worker = None
+                    return
+            waited = self.bucket.acquire()
+            self._count("bucket_wait_seconds", waited)
+            with self._lock:
+                batch = self._take_batch()
+            if not batch:
+                self.bucket.refund()
+                continue
+            try:
+                results = self._post_batch(list(batch))
+            except Exception as e:
+                print(f"⚠️ GeoIP batch error: {e}")
+                results = {}
+            if results is not None:
+                self._count("looked_up", len(results))
+                self._to_cache(results)
+            requeue = {}
+            with self._lock:
+                for ip, entry in batch.items():
+                    self._inflight.pop(ip, None)
+                    if results is None and entry[3] + 1 < MAX_BATCH_ATTEMPTS:
+                        entry[3] += 1
+                        self._pending[ip] = entry
+                        requeue[ip] = entry
+            self._count("requeued", len(requeue))
+            for ip, (_, _, future, _) in batch.items():
+                if ip not in requeue and not future.done():
+                    future.set_result((results or {}).get(ip))
+
+    def submit(self, ips: Iterable[str], priority=PRIORITY_NORMAL) -> Dict[str, Future]:
+        """Masukkan IP ke antrian (priority: PRIORITY_*); return {ip: Future(raw_json_or_None)}"""
+        ips = [ip for ip in dict.fromkeys(ips) if ip]
+        futures = {}
+        known = self._from_offline(ips)
+        cached = self._from_cache([ip for ip in ips if ip not in known])
+        self._count("cache_hits", len(cached))
+        known.update(cached)
+        for ip, data in known.items():
+            future = Future()
+            future.set_result(data)
+            futures[ip] = future
+        with self._lock:
+            for ip in ips:
+                if ip in futures:
+                    continue
+                entry = self._pending.get(ip)
+                if entry is not None:
+                    entry[0] = min(entry[0], priority)  # caller lebih penting → naik antrian
+                    futures[ip] = entry[2]
+                    continue
+                future = self._inflight.get(ip)
+                if future is None:
+                    future = Future()
+                    self._pending[ip] = [priority, next(self._seq), future, 0]
+                futures[ip] = future
+            if self._pending:
+                self._ensure_worker()
+        return futures
+
+    # --- API publik ---
+
+    def lookup_many(self, ips: Iterable[str], timeout=LOOKUP_TIMEOUT,
+                    priority=PRIORITY_NORMAL) -> Dict[str, Optional[dict]]:
+        """Lookup banyak IP (sync); return {ip: raw_json_or_None}"""
+        futures = self.submit(ips, priority)
+        results = {}
+        for ip, future in futures.items():
+            try:
+                results[ip] = future.result(timeout=timeout)
+            except Exception:
+                results[ip] = None
+        return results
+
+    def lookup(self, ip: str, timeout=LOOKUP_TIMEOUT, priority=PRIORITY_NORMAL) -> Optional[dict]:
+        """Lookup satu IP (sync, thread-safe); ikut batch bersama caller lain"""
+        if not ip:
+            return None
+        return self.lookup_many([ip], timeout=timeout, priority=priority).get(ip)
+
+    async def lookup_async(self, ip: str, timeout=LOOKUP_TIMEOUT, priority=PRIORITY_NORMAL) -> Optional[dict]:
+        """Lookup satu IP dari event loop tanpa memakai thread pool"""
+        if not ip:
+            return None
+        offline = self._from_offline([ip])
+        if offline:
+            return offline[ip]  # tanpa thread / SQLite sama sekali
+        future = (await asyncio.to_thread(self.submit, [ip], priority))[ip]
+        try:
+            # shield: timeout caller ini tidak boleh membatalkan Future milik caller lain
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=timeout)
+        except Exception:
+            return None
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+def get_geoip_client() -> GeoIPClient:
+    """GeoIPClient bersama untuk satu proses (supaya antrian batch-nya dipakai semua caller)"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = GeoIPClient()
+        return _shared_client
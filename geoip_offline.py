@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Offline GeoIP - dataset range IP → negara/ASN/org lokal, dicari dengan binary search
+Dipakai GeoIPClient sebelum cache SQLite dan ip-api; hanya IP yang tidak ketemu yang online.
+
+Format yang didukung (dipilih dari ekstensi, .gz boleh):
+- .tsv  ip2asn (iptoasn.com): range_start, range_end, AS_number, country_code, AS_description
+- .csv  start, end, country_code[, asn, org] (mis. dbip-country-lite, atau ekspor sendiri)
+- .mmdb MaxMind/DB-IP (butuh paket maxminddb)
+"""
+
+import bisect
+import csv
+import gzip
+import os
+import socket
+import threading
+import time
+from array import array
+
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
+GEOIP_DB_PATH = os.getenv("GEOIP_DB_PATH", "geoip/ip2asn-v4.tsv")
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    return open(path, "r", encoding="utf-8", errors="replace", newline="")
+
+def _ip_to_int(ip):
+    """IPv4 string → int (None untuk IPv6/bukan IP); inet_aton jauh lebih cepat dari ipaddress"""
+    if not ip or ip.count(".") != 3:
+        return None
+    try:
+        return int.from_bytes(socket.inet_aton(ip), "big")
+    except (OSError, TypeError):
+        return None
+
+class RangeIndex:
+    """
+    Index range IPv4 yang ringkas: start/end di array('I') terurut, negara & org di-intern
+    (array index ke list string). lookup() = bisect di starts, O(log n), tanpa alokasi besar.
+    """
+
+    def __init__(self):
+        self.starts = array("I")
+        self.ends = array("I")
+        self.country_ids = array("H")
+        self.org_ids = array("I")
+        self.asns = array("I")
+        self.countries = [""]
+        self.orgs = [""]
+        self._country_index = {"": 0}
+        self._org_index = {"": 0}
+
+    def _intern(self, value, values, index):
+        value = value or ""
+        if value not in index:
+            index[value] = len(values)
+            values.append(value)
+        return index[value]
+
+    def add(self, start, end, country="", asn=0, org=""):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.country_ids.append(self._intern(country.upper(), self.countries, self._country_index))
+        self.org_ids.append(self._intern(org, self.orgs, self._org_index))
+        self.asns.append(asn or 0)
+
+    def finalize(self):
+        """Urutkan kalau dataset tidak terurut (bisect butuh starts naik)"""
+        if all(self.starts[i] <= self.starts[i + 1] for i in range(len(self.starts) - 1)):
+            return
+        order = sorted(range(len(self.starts)), key=self.starts.__getitem__)
+        for name in ("starts", "ends", "country_ids", "org_ids", "asns"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[i] for i in order)))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, ip):
+        """Return (country_code, asn, org) atau None kalau IP tidak ada di range mana pun"""
+        value = _ip_to_int(ip)
+        if value is None:
+            return None
+        i = bisect.bisect_right(self.starts, value) - 1
+        if i < 0 or value > self.ends[i]:
+            return None
+        country = self.countries[self.country_ids[i]]
+        if not country or country in ("NONE", "ZZ"):
+            return None  # ip2asn: range tanpa negara (belum dialokasikan)
+        return country, self.asns[i], self.orgs[self.org_ids[i]]
+
+class OfflineGeoIP:
+    """Jawab lookup dengan format ip-api (status, countryCode, isp, org, as) dari dataset lokal"""
+
+    def __init__(self, path=GEOIP_DB_PATH):
+        self.path = path
+        self.index = None
+        self._mmdb = None
+        self.stats = {"hits": 0, "misses": 0}
+
+    def is_available(self):
+        return os.path.exists(self.path) and (not self.path.endswith(".mmdb") or maxminddb is not None)
+
+    def load(self):
+        started = time.monotonic()
+        if self.path.endswith(".mmdb"):
+            self._mmdb = maxminddb.open_database(self.path)
+            print(f"🗺️ Offline GeoIP: opened {self.path}")
+            return self
+        self.index = RangeIndex()
+        delimiter = "\t" if ".tsv" in self.path else ","
+        with _open_text(self.path) as f:
+            for row in csv.reader(f, delimiter=delimiter):
+                self._add_row(row)
+        self.index.finalize()
+        print(f"🗺️ Offline GeoIP: {len(self.index)} ranges from {self.path} "
+              f"in {time.monotonic() - started:.1f}s")
+        return self
+
+    def _add_row(self, row):
+        if len(row) < 3:
+            return
+        start, end = _ip_to_int(row[0].strip()), _ip_to_int(row[1].strip())
+        if start is None or end is None:
+            return  # header, komentar, atau baris IPv6
+        if len(row) >= 5 and row[2].strip().isdigit():
+            # ip2asn: start, end, asn, country, description
+            self.index.add(start, end, row[3].strip(), int(row[2]), row[4].strip())
+        else:
+            # start, end, country[, asn, org]
+            asn = row[3].strip() if len(row) > 3 else ""
+            org = row[4].strip() if len(row) > 4 else ""
+            self.index.add(start, end, row[2].strip(), int(asn) if asn.isdigit() else 0, org)
+
+    def _lookup_mmdb(self, ip):
+        try:
+            record = self._mmdb.get(ip)
+        except ValueError:
+            return None
+        if not record:
+            return None
+        country = (record.get("country") or record.get("registered_country") or {}).get("iso_code", "")
+        if not country:
+            return None
+        org = record.get("autonomous_system_organization") or record.get("isp") or record.get("organization", "")
+        return country, record.get("autonomous_system_number") or 0, org
+
+    def lookup(self, ip):
+        """Return jawaban gaya ip-api ({"status": "success", ...}) atau None kalau tidak ketemu"""
+        found = self._lookup_mmdb(ip) if self._mmdb else (self.index.lookup(ip) if self.index else None)
+        if not found:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        country, asn, org = found
+        return {
+            "status": "success",
+            "countryCode": country,
+            "isp": org,
+            "org": org,
+            "as": f"AS{asn} {org}".strip() if asn else "",
+            "query": ip,
+            "source": "offline",
+        }
+
+_shared_offline = None
+_shared_loaded = False
+_shared_lock = threading.Lock()
+
+def get_offline_geoip():
+    """OfflineGeoIP bersama (dimuat sekali); None kalau dataset tidak ada"""
+    global _shared_offline, _shared_loaded
+    with _shared_lock:
+        if not _shared_loaded:
+            _shared_loaded = True
+            offline = OfflineGeoIP()
+            if offline.is_available():
+                try:
+                    _shared_offline = offline.load()
+                except Exception as e:
+                    print(f"⚠️ Offline GeoIP load error ({offline.path}): {e}")
+        return _shared_offline
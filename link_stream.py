@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Link Stream - download sumber link VPN (raw list / API) per chunk dengan batas ukuran
+Link di-scan bertahap (aman terhadap link yang terpotong di batas chunk) dan di-yield selama
+download masih berjalan, jadi list agregator multi-MB tidak perlu ditampung utuh di memori.
+"""
+
+import codecs
+import json
+import os
+import re
+
+import requests
+
+from converter import parse_link
+
+MAX_SOURCE_BYTES = int(os.getenv("MAX_SOURCE_BYTES", 32 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+SOURCE_TIMEOUT = 30  # detik per operasi socket (connect / tiap chunk)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+VPN_PROTOCOLS = ('vless://', 'vmess://', 'trojan://', 'ss://')
+VPN_LINK_PATTERN = re.compile(r"(?:vless|vmess|trojan|ss)://[^\s\n\r]+")
+SCHEME_OVERLAP = len("trojan://")  # sisa chunk yang mungkin scheme terpotong (belum ada isi link)
+
+def extract_links_from_json(obj, links=None):
+    """Semua string berisi link VPN di struktur JSON (list/dict bersarang)"""
+    if links is None:
+        links = []
+    if isinstance(obj, str):
+        if any(proto in obj for proto in VPN_PROTOCOLS):
+            links.append(obj)
+    elif isinstance(obj, list):
+        for item in obj:
+            extract_links_from_json(item, links)
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            extract_links_from_json(value, links)
+    return links
+
+class LinkScanner:
+    """
+    Scanner regex bertahap: feed() per potongan teks, return link yang sudah pasti lengkap.
+    Link tidak mengandung whitespace, jadi teks dipotong di whitespace terakhir; sisanya
+    (link yang belum selesai, atau beberapa karakter calon scheme) disimpan untuk chunk berikutnya.
+    Hasil akhirnya sama dengan findall() atas seluruh teks.
+    """
+
+    def __init__(self, pattern=VPN_LINK_PATTERN):
+        self.pattern = pattern
+        self._tail = ""
+
+    def feed(self, text):
+        data = self._tail + text
+        cut = max(data.rfind(c) for c in " \t\n\r\f\v") + 1
+        links = self.pattern.findall(data, 0, cut) if cut else []
+        tail = data[cut:]
+        match = self.pattern.search(tail)
+        self._tail = tail[match.start():] if match else tail[-SCHEME_OVERLAP:]
+        return links
+
+    def close(self):
+        links = self.pattern.findall(self._tail)
+        self._tail = ""
+        return links
+
+class LinkStream:
+    """
+    Iterator link VPN dari satu URL. Response JSON (diawali '{' / '[') tetap di-parse utuh
+    (API biasanya kecil), selain itu di-scan per chunk. Download berhenti di max_bytes
+    (truncated=True); error requests (timeout, HTTP, koneksi) naik ke pemanggil saat iterasi.
+    """
+
+    def __init__(self, url, timeout=SOURCE_TIMEOUT, max_bytes=MAX_SOURCE_BYTES, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.headers = headers or DEFAULT_HEADERS
+        self.bytes_read = 0
+        self.links_found = 0
+        self.truncated = False
+        self.format = None  # 'json' atau 'text', diketahui setelah chunk pertama
+
+    def _chunks(self, response):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            if self.bytes_read + len(chunk) > self.max_bytes:
+                chunk = chunk[:self.max_bytes - self.bytes_read]
+                self.truncated = True
+            self.bytes_read += len(chunk)
+            yield decoder.decode(chunk)
+            if self.truncated:
+                print(f"⚠️ Source {self.url} exceeds {self.max_bytes} bytes, stopped reading (truncated)")
+                return
+        yield decoder.decode(b"", final=True)
+
+    def _json_links(self, text, chunks):
+        content = text + "".join(chunks)
+        try:
+            links = extract_links_from_json(json.loads(content))
+        except json.JSONDecodeError:
+            links = []
+        # Tidak ada link di JSON (atau ternyata bukan JSON valid) → regex seperti plain text
+        return links or VPN_LINK_PATTERN.findall(content)
+
+    def __iter__(self):
+        with requests.get(self.url, headers=self.headers, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            chunks = self._chunks(response)
+            scanner = LinkScanner()
+            for text in chunks:
+                if self.format is None:
+                    if not text.strip():
+                        continue
+                    self.format = "json" if text.lstrip()[:1] in ("{", "[") else "text"
+                    if self.format == "json":
+                        for link in self._json_links(text, chunks):
+                            self.links_found += 1
+                            yield link
+                        return
+                for link in scanner.feed(text):
+                    self.links_found += 1
+                    yield link
+            for link in scanner.close():
+                self.links_found += 1
+                yield link
+
+def iter_accounts(links, on_invalid=None):
+    """Generator akun hasil parse_link; link yang tidak valid dilewati (dilaporkan ke on_invalid)"""
+    for link in links:
+        parsed = parse_link(link)
+        if parsed:
+            yield parsed
+        elif on_invalid:
+            on_invalid(link)
@@ -5,7 +5,6 @@ Resolves ke real server location, bukan CDN/Cloudflare
 """
 
 import socket
-import re
 import asyncio
 from typing import Dict, List, Optional, Tuple
 
@@ -15,6 +14,9 @@ except ImportError:
     requests = None
 
 from utils import geoip_lookup
+from cdn_ranges import get_cdn_ranges
+from dns_client import resolve_domain_ips
+from concurrency import evaluate_concurrently
 
 class SmartLocationResolver:
     """Resolve real VPN server location meskipun menggunakan domain/SNI"""
@@ -47,84 +49,73 @@ class SmartLocationResolver:
         except:
             return False
     
-    def _is_cdn_provider(self, provider: str) -> bool:
-        """Check if provider is CDN/Proxy (likely not real VPN server)"""
+    def _is_cdn_provider(self, provider: str, ip: Optional[str] = None) -> bool:
+        """Check if provider is CDN/Proxy (likely not real VPN server); ip dicek dulu di prefix trie CDN"""
+        if ip and get_cdn_ranges().is_cdn(ip):
+            return True
         provider_lower = provider.lower()
         return any(cdn in provider_lower for cdn in self.cdn_providers)
     
     def _resolve_domain_multiple_dns(self, domain: str) -> List[str]:
-        """Resolve domain menggunakan multiple methods untuk dapat semua IPs"""
-        all_ips = set()
+        """Resolve domain ke semua IP: resolver sistem + query UDP ke semua dns_servers, paralel"""
+        return resolve_domain_ips(domain, servers=self.dns_servers)
+    
+    def _score_ip_for_location(self, ip: str) -> Tuple[int, dict]:
+        """Skor satu IP untuk location lookup (geo lookup, tinggi = lebih mungkin server asli)"""
+        geo_info = geoip_lookup(ip)
+        provider = geo_info.get('Provider', '').lower()
+        country = geo_info.get('Country', '❓')
         
-        # Method 1: System resolver
-        try:
-            ip = socket.gethostbyname(domain)
-            all_ips.add(ip)
-        except:
-            pass
+        score = 0
         
-        # Method 2: Manual dig command (if available)
-        try:
-            import subprocess
-            result = subprocess.run(['dig', '+short', domain], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    line = line.strip()
-                    if line and self._is_ip(line):
-                        all_ips.add(line)
-        except (ImportError, FileNotFoundError, subprocess.TimeoutExpired):
-            pass
+        # Penalize CDN providers
+        if self._is_cdn_provider(provider):
+            score -= 50
         
-        # Method 3: Use different DNS servers with nslookup
-        for dns_server in self.dns_servers[:2]:  # Limit to 2 DNS servers
-            try:
-                import subprocess
-                result = subprocess.run(['nslookup', domain, dns_server], 
-                                      capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    # Extract IPs from nslookup output
-                    ips = re.findall(r'Address: (\d+\.\d+\.\d+\.\d+)', result.stdout)
-                    all_ips.update(ips)
-            except (ImportError, FileNotFoundError, subprocess.TimeoutExpired):
-                continue
+        # Reward VPS providers  
+        if any(vps in provider for vps in self.vps_providers):
+            score += 30
         
-        return list(all_ips)
+        # Reward if has country info
+        if country != '❓':
+            score += 20
+        
+        # Reward non-US IPs (karena banyak CDN di US)
+        if '🇺🇸' not in country:
+            score += 10
+        
+        return score, geo_info
     
     def _get_best_ip_for_location(self, ips: List[str]) -> Optional[str]:
-        """Pilih IP terbaik untuk location lookup (hindari CDN)"""
+        """
+        Pilih IP terbaik untuk location lookup (hindari CDN). Geo lookup kandidat jalan paralel
+        dan berhenti begitu ada provider VPS (hasil terbaik yang mungkin).
+        """
         ip_scores = []
+        cdn_ranges = get_cdn_ranges()
+        candidates = []
         
         for ip in ips:
-            geo_info = geoip_lookup(ip)
-            provider = geo_info.get('Provider', '').lower()
-            country = geo_info.get('Country', '❓')
-            
-            score = 0
-            
-            # Penalize CDN providers
-            if self._is_cdn_provider(provider):
-                score -= 50
-            
-            # Reward VPS providers  
-            if any(vps in provider for vps in self.vps_providers):
-                score += 30
-            
-            # Reward if has country info
-            if country != '❓':
-                score += 20
-            
-            # Reward non-US IPs (karena banyak CDN di US)
-            if '🇺🇸' not in country:
-                score += 10
-            
+            cdn = cdn_ranges.provider_for(ip)
+            if cdn:
+                # Edge CDN ketahuan dari prefix trie: tanpa geo lookup, skor paling bawah
+                ip_scores.append((ip, -50, {'Provider': cdn, 'Country': '❓'}))
+            else:
+                candidates.append(ip)
+        
+        def is_vps(ip, result):
+            provider = result[1].get('Provider', '').lower()
+            return any(vps in provider for vps in self.vps_providers)
+        
+        for ip, (score, geo_info) in evaluate_concurrently(candidates, self._score_ip_for_location, stop=is_vps):
             ip_scores.append((ip, score, geo_info))
         
         if not ip_scores:
             return None
         
-        # Sort by score dan return IP terbaik
-        ip_scores.sort(key=lambda x: x[1], reverse=True)
+        # Sort by score dan return IP terbaik (skor sama → urutan asli)
+        order = {ip: i for i, ip in enumerate(ips)}
+        ip_scores.sort(key=lambda x: (-x[1], order[x[0]]))
         best_ip, best_score, best_geo = ip_scores[0]
         
         print(f"🎯 Best IP for location: {best_ip} (score: {best_score})")
@@ -206,6 +197,10 @@ class SmartLocationResolver:
             
             if self._is_ip(candidate):
                 # Direct IP
+                cdn = get_cdn_ranges().provider_for(candidate)
+                if cdn and best_result["Country"] != "❓":
+                    print(f"⚠️  CDN IP from {method}: {candidate} ({cdn}), skipping geo lookup")
+                    continue
                 geo_info = geoip_lookup(candidate)
                 result = {
                     "Country": geo_info.get("Country", "❓"),
@@ -214,7 +209,7 @@ class SmartLocationResolver:
                     "Resolution Method": f"{method} (direct IP)"
                 }
                 
-                if not self._is_cdn_provider(result["Provider"]):
+                if not self._is_cdn_provider(result["Provider"], candidate):
                     print(f"✅ Good result from {method}: {result['Country']} - {result['Provider']}")
                     return result
                 else:
@@ -239,7 +234,7 @@ class SmartLocationResolver:
                                 "Resolution Method": f"{method} (best of {len(ips)} IPs)"
                             }
                             
-                            if not self._is_cdn_provider(result["Provider"]):
+                            if not self._is_cdn_provider(result["Provider"], best_ip):
                                 print(f"✅ Good result from {method}: {result['Country']} - {result['Provider']}")
                                 return result
                             else:
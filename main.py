@@ -1,5 +1,6 @@
 import os
 import json
+import argparse
 import re
 import asyncio
 import requests
@@ -13,163 +14,76 @@ from urllib.parse import urlparse
 from github_client import GitHubClient
 from core import (
     deduplicate_accounts, sort_priority, ensure_ws_path_field,
-    build_final_accounts, load_template, test_all_accounts
+    build_final_accounts, load_template, test_all_accounts, TOP_K_MAX_LATENCY_MS,
+    test_streamed_accounts, new_live_result
 )
 from extractor import extract_accounts_from_config
 from converter import parse_link, inject_outbounds_to_template
-
-MAX_CONCURRENT_TESTS = 5
+from concurrency import AdaptiveLimiter
+from budget import RunBudget
+from retry_policy import RetryPolicy, DEFAULT_RETRY_POLICY
+from speedtest import run_speed_tests, load_speedtest_config
+from result_cache import RESULT_CACHE_TTL_MINUTES
+from database import clear_result_cache
+from negative_cache import get_negative_cache
+from tester import enrich_geolocation
+from link_stream import LinkStream, iter_accounts
+from xray_pool import configure_xray_pool
+
+MAX_CONCURRENT_TESTS = 50  # concurrency awal; AdaptiveLimiter menyesuaikan selama run
 TEMPLATE_FILE = "template.json"
 SPINNERS = ["◐", "◓", "◑", "◒"]
 DOTS = ["⠁", "⠂", "⠄", "⠂"]
 
-def fetch_vpn_links_from_raw_url(raw_url):
+def _stream_vpn_links(url, source):
     """
-    USER REQUEST: Fetch VPN links from raw text URL
-    Example: https://raw.githubusercontent.com/user/repo/main/vpn-links.txt
+    Generator link dari LinkStream: link di-yield selama download berjalan (dites sambil jalan),
+    preview 3 link pertama dan ringkasan dicetak; error koneksi dicetak lalu stream berhenti.
     """
     console = Console()
-    
+    stream = LinkStream(url)
     try:
-        console.print(f"\n[bold blue]📄 Fetching VPN links from raw URL...[/bold blue]")
-        console.print(f"[dim]URL: {raw_url}[/dim]")
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(raw_url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Extract VPN links from raw text
-        content = response.text
-        console.print(f"[green]✔️ Raw content received ({len(content)} chars)[/green]")
-        
-        # Extract all VPN links dengan regex
-        vpn_pattern = r"(?:vless|vmess|trojan|ss)://[^\s\n\r]+"
-        vpn_links = re.findall(vpn_pattern, content)
-        
-        if vpn_links:
-            console.print(f"[bold green]✔️ Successfully extracted {len(vpn_links)} VPN links from raw URL![/bold green]")
-            
-            # Show preview
-            console.print(f"\n[bold cyan]Preview of extracted links:[/bold cyan]")
-            for i, link in enumerate(vpn_links[:3], 1):
+        for link in stream:
+            if stream.links_found <= 3:
                 preview = link[:50] + "..." if len(link) > 50 else link
-                console.print(f"  {i}. {preview}")
-            
-            if len(vpn_links) > 3:
-                console.print(f"  ... and {len(vpn_links) - 3} more links")
-                
-            return vpn_links
-        else:
-            console.print(f"[red]❌ No VPN links found in raw content[/red]")
-            return []
-            
+                console.print(f"  {stream.links_found}. {preview}")
+            yield link
     except requests.exceptions.Timeout:
-        console.print(f"[red]❌ Request timeout - URL took too long to respond[/red]")
-        return []
+        console.print(f"[red]❌ Request timeout - {source} took too long to respond[/red]")
     except requests.exceptions.ConnectionError:
-        console.print(f"[red]❌ Connection error - Could not reach URL[/red]")
-        return []
+        console.print(f"[red]❌ Connection error - Could not reach {source}[/red]")
     except requests.exceptions.HTTPError as e:
         console.print(f"[red]❌ HTTP error: {e}[/red]")
-        return []
     except Exception as e:
-        console.print(f"[red]❌ Error fetching from raw URL: {e}[/red]")
-        return []
+        console.print(f"[red]❌ Error fetching from {source}: {e}[/red]")
+    
+    if stream.links_found:
+        console.print(f"[bold green]✔️ Successfully extracted {stream.links_found} VPN links from {source} "
+                      f"({stream.bytes_read} bytes{', truncated' if stream.truncated else ''})[/bold green]")
+    else:
+        console.print(f"[red]❌ No VPN links found in {source} response[/red]")
+
+def fetch_vpn_links_from_raw_url(raw_url):
+    """
+    USER REQUEST: Fetch VPN links from raw text URL
+    Example: https://raw.githubusercontent.com/user/repo/main/vpn-links.txt
+    Generator: link di-scan per chunk, tidak menunggu download selesai.
+    """
+    console = Console()
+    console.print(f"\n[bold blue]📄 Streaming VPN links from raw URL...[/bold blue]")
+    console.print(f"[dim]URL: {raw_url}[/dim]")
+    return _stream_vpn_links(raw_url, "raw URL")
 
 def fetch_vpn_links_from_api(api_url):
     """
     USER REQUEST: Fetch VPN links from API URL  
     Example: https://admin.ari-andika2.site/api/v2ray?type=vless&bug=quiz.int.vidio.com&tls=true&wildcard=false&limit=5&country=SG
+    Generator: response JSON di-parse utuh, plain text di-scan per chunk.
     """
     console = Console()
-    
-    try:
-        console.print(f"\n[bold blue]🌐 Fetching VPN links from API...[/bold blue]")
-        console.print(f"[dim]URL: {api_url}[/dim]")
-        
-        # Add timeout and headers
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(api_url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        # Try to parse response
-        try:
-            # If JSON response
-            data = response.json()
-            console.print(f"[green]✔️ JSON response received[/green]")
-            
-            # Extract VPN links from JSON (flexible extraction)
-            vpn_links = []
-            
-            # Handle different JSON structures
-            if isinstance(data, list):
-                # Direct list of links
-                for item in data:
-                    if isinstance(item, str) and any(proto in item for proto in ['vless://', 'vmess://', 'trojan://', 'ss://']):
-                        vpn_links.append(item)
-                    elif isinstance(item, dict):
-                        # Look for link field in dict
-                        for key, value in item.items():
-                            if isinstance(value, str) and any(proto in value for proto in ['vless://', 'vmess://', 'trojan://', 'ss://']):
-                                vpn_links.append(value)
-            elif isinstance(data, dict):
-                # Look for VPN links in dict values
-                def extract_from_dict(d):
-                    for key, value in d.items():
-                        if isinstance(value, str) and any(proto in value for proto in ['vless://', 'vmess://', 'trojan://', 'ss://']):
-                            vpn_links.append(value)
-                        elif isinstance(value, list):
-                            for item in value:
-                                if isinstance(item, str) and any(proto in item for proto in ['vless://', 'vmess://', 'trojan://', 'ss://']):
-                                    vpn_links.append(item)
-                        elif isinstance(value, dict):
-                            extract_from_dict(value)
-                
-                extract_from_dict(data)
-            
-        except json.JSONDecodeError:
-            # If plain text response, extract VPN links with regex
-            console.print(f"[yellow]⚠️ Plain text response, extracting with regex[/yellow]")
-            content = response.text
-            vpn_pattern = r"(?:vless|vmess|trojan|ss)://[^\s\n]+"
-            vpn_links = re.findall(vpn_pattern, content)
-        
-        if vpn_links:
-            console.print(f"[bold green]✔️ Successfully fetched {len(vpn_links)} VPN links from API![/bold green]")
-            
-            # Show preview
-            console.print(f"\n[bold cyan]Preview of fetched links:[/bold cyan]")
-            for i, link in enumerate(vpn_links[:3], 1):
-                # Show first 50 chars
-                preview = link[:50] + "..." if len(link) > 50 else link
-                console.print(f"  {i}. {preview}")
-            
-            if len(vpn_links) > 3:
-                console.print(f"  ... and {len(vpn_links) - 3} more links")
-                
-            return vpn_links
-        else:
-            console.print(f"[red]❌ No VPN links found in API response[/red]")
-            return []
-            
-    except requests.exceptions.Timeout:
-        console.print(f"[red]❌ Request timeout - API took too long to respond[/red]")
-        return []
-    except requests.exceptions.ConnectionError:
-        console.print(f"[red]❌ Connection error - Could not reach API[/red]")
-        return []
-    except requests.exceptions.HTTPError as e:
-        console.print(f"[red]❌ HTTP error: {e}[/red]")
-        return []
-    except Exception as e:
-        console.print(f"[red]❌ Error fetching from API: {e}[/red]")
-        return []
+    console.print(f"\n[bold blue]🌐 Streaming VPN links from API...[/bold blue]")
+    console.print(f"[dim]URL: {api_url}[/dim]")
+    return _stream_vpn_links(api_url, "API")
 
 def get_user_vpn_links():
     console = Console()
@@ -367,6 +281,26 @@ def get_source_config(github_client):
     with open(TEMPLATE_FILE, "r") as f:
         return json.load(f), None, None
 
+def show_negative_cache(clear=False):
+    """CLI: tampilkan (atau kosongkan) negative cache"""
+    console = Console()
+    cache = get_negative_cache()
+    if clear:
+        console.print(f"🧹 {cache.clear()} entry negative cache dihapus", style="green")
+        return
+    entries = cache.entries()
+    if not entries:
+        console.print("Negative cache kosong.")
+        return
+    table = Table(title=f"Negative Cache ({len(entries)})")
+    table.add_column("Key")
+    table.add_column("Jenis")
+    table.add_column("Sisa (detik)", justify="right")
+    table.add_column("Alasan")
+    for entry in entries:
+        table.add_row(entry["key"], entry["kind"], str(entry["expires_in"]), entry["reason"])
+    console.print(table)
+
 def perform_final_action(config_str, github_client, github_path, sha):
     console = Console()
     timestamp = datetime.now().strftime("%Y%m%d-%H%M")
@@ -396,7 +330,8 @@ def perform_final_action(config_str, github_client, github_path, sha):
         elif choice == "3":
             break
 
-async def main():
+async def main(budget_seconds=None, top_k=None, top_k_max_latency=TOP_K_MAX_LATENCY_MS, speedtest=False,
+               cache_ttl_minutes=RESULT_CACHE_TTL_MINUTES, retry_policy=None):
     console = Console()
     console.print("[bold green]--- Manajer Konfigurasi VortexVpn ---[/bold green]")
     load_dotenv()
@@ -417,6 +352,15 @@ async def main():
     user_links = get_user_vpn_links()
     accounts_from_links = []
 
+    # Sumber URL (generator): akun di-parse dan dites sambil download berjalan.
+    # Top-K per region butuh semua kandidat untuk urutan region, jadi dikumpulkan dulu.
+    streamed_links = None
+    if not isinstance(user_links, list):
+        if top_k:
+            user_links = list(user_links)
+        else:
+            streamed_links, user_links = user_links, []
+
     for link in user_links:
         parsed = parse_link(link)
         if parsed:
@@ -432,41 +376,74 @@ async def main():
     all_accounts = deduplicate_accounts(existing_accounts + accounts_from_links)
     all_accounts = ensure_ws_path_field(all_accounts)
 
-    if not all_accounts:
+    if not all_accounts and streamed_links is None:
         console.print("❌ Tidak ada akun valid untuk dites.", style="bold red")
         return
 
     console.print(
-        f"\n[bold]Memulai pengetesan untuk {len(all_accounts)} akun unik...[/bold]"
+        f"\n[bold]Memulai pengetesan untuk {len(all_accounts)} akun unik"
+        f"{' + akun dari URL (dites sambil download)' if streamed_links is not None else ''}...[/bold]"
     )
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
-
-    live_results = [
-        {
-            "index": i,
-            "OriginalTag": acc["tag"],
-            "OriginalAccount": acc,
-            "VpnType": acc.get("type", "-"),
-            "Country": "❓",
-            "Provider": "-",
-            "Tested IP": "-",
-            "Latency": -1,
-            "Jitter": -1,
-            "ICMP": "N/A",
-            "Status": "WAIT",
-        }
-        for i, acc in enumerate(all_accounts)
-    ]
+    semaphore = AdaptiveLimiter(initial=MAX_CONCURRENT_TESTS)
+    budget = RunBudget(budget_seconds) if budget_seconds else None
+
+    live_results = [new_live_result(i, acc) for i, acc in enumerate(all_accounts)]
 
     with Live(
         generate_table(live_results, 0), refresh_per_second=6, screen=True
     ) as live:
         frame = 0
-        results = await test_all_accounts(all_accounts, semaphore, live_results)
+        if streamed_links is not None:
+            accounts_stream = iter_accounts(
+                streamed_links,
+                on_invalid=lambda link: console.print(f"⚠️ Link tidak valid diabaikan: {link[:50]}...", style="yellow"),
+            )
+            results = await test_streamed_accounts(
+                accounts_stream, semaphore, all_accounts, live_results,
+                cache_ttl_minutes=cache_ttl_minutes, budget=budget, retry_policy=retry_policy
+            )
+        else:
+            results = await test_all_accounts(
+                all_accounts, semaphore, live_results, cache_ttl_minutes=cache_ttl_minutes,
+                budget=budget, top_k=top_k, top_k_max_latency=top_k_max_latency, retry_policy=retry_policy
+            )
         for res in results:
             frame += 1
             live.update(generate_table(live_results, frame))
 
+    cached_count = len([res for res in live_results if res.get("Cached")])
+    if cached_count:
+        console.print(f"[dim]⚡ {cached_count} akun memakai hasil cache (< {cache_ttl_minutes:g} menit)[/dim]")
+
+    concurrency = semaphore.summary()
+    console.print(
+        f"[dim]Concurrency: akhir {concurrency['final']}, rentang {concurrency['min']}-{concurrency['max']}, "
+        f"puncak aktif {concurrency['peak_active']} (batas fd {concurrency['cap']})[/dim]"
+    )
+    console.print(
+        "[dim]Riwayat: " + ", ".join(f"{t}s→{limit}" for t, limit in concurrency['history']) + "[/dim]"
+    )
+
+    if budget:
+        deadline_count = len([res for res in live_results if res.get("TestType") == "Deadline"])
+        console.print(
+            f"[dim]Budget {budget.total_seconds:.0f}s: timeout {budget.connect_timeout:.1f}s × {budget.max_retries}, "
+            f"{deadline_count} akun tidak selesai sebelum deadline[/dim]"
+        )
+
+    # Real geolocation hanya untuk akun yang lolos, sesudah semua tes liveness selesai
+    await enrich_geolocation([res for res in live_results if res["Status"] == "✅"], budget, live_results)
+
+    if speedtest:
+        summary = await run_speed_tests(live_results, load_speedtest_config())
+        console.print(
+            f"[dim]Speed test: {summary['tested']} diukur, {summary['alerts']} di bawah threshold, "
+            f"{summary['failed']} gagal[/dim]"
+        )
+        for res in live_results:
+            if res.get("Speed Alert"):
+                console.print(f"[yellow]⚠️ {res['OriginalTag']}: {', '.join(res['Speed Alert'])}[/yellow]")
+
     successful_accounts = [res for res in live_results if res["Status"] == "●"]
 
     if not successful_accounts:
@@ -495,4 +472,41 @@ async def main():
     console.print("\n[bold green]Terima kasih![/bold green]")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Manajer Konfigurasi VortexVpn")
+    parser.add_argument("--budget", type=float, default=None, metavar="SECONDS",
+                        help="batas waktu total pengetesan (detik); akun yang belum selesai ditandai Deadline")
+    parser.add_argument("--top-k", type=int, default=None, metavar="K",
+                        help="berhenti test satu negara setelah K akun sehat ditemukan")
+    parser.add_argument("--top-k-latency", type=float, default=TOP_K_MAX_LATENCY_MS, metavar="MS",
+                        help=f"batas latency akun sehat untuk --top-k (default {TOP_K_MAX_LATENCY_MS}ms)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRY_POLICY.max_attempts, metavar="N",
+                        help=f"total percobaan per akun untuk error transien (default {DEFAULT_RETRY_POLICY.max_attempts}, "
+                             "1 = tanpa retry); dengan --budget tetap dipotong sesuai rencana budget")
+    parser.add_argument("--retry-delay", type=float, default=DEFAULT_RETRY_POLICY.base_delay, metavar="SECONDS",
+                        help=f"jeda backoff awal antar percobaan (default {DEFAULT_RETRY_POLICY.base_delay}s, naik 2x tiap retry)")
+    parser.add_argument("--speedtest", action="store_true",
+                        help="ukur download/upload akun yang lolos (endpoint & threshold di speedtest_config.json)")
+    parser.add_argument("--xray-pool-size", type=int, default=None, metavar="N",
+                        help="jumlah proses xray bersamaan untuk real geolocation (default XRAY_POOL_SIZE / jumlah CPU)")
+    parser.add_argument("--xray-startup-timeout", type=float, default=None, metavar="SECONDS",
+                        help="batas tunggu xray siap (default XRAY_STARTUP_TIMEOUT / 5 detik)")
+    parser.add_argument("--show-negative-cache", action="store_true",
+                        help="tampilkan nama/endpoint yang sedang di negative cache lalu keluar")
+    parser.add_argument("--clear-negative-cache", action="store_true",
+                        help="kosongkan negative cache (nama gagal resolve, endpoint mati) lalu keluar")
+    parser.add_argument("--cache-ttl", type=float, default=RESULT_CACHE_TTL_MINUTES, metavar="MINUTES",
+                        help=f"pakai ulang hasil test yang lebih baru dari ini (default {RESULT_CACHE_TTL_MINUTES} menit, 0 = nonaktif)")
+    parser.add_argument("--clear-result-cache", action="store_true",
+                        help="hapus semua hasil test yang di-cache lalu keluar")
+    args = parser.parse_args()
+    if args.clear_result_cache:
+        Console().print(f"🧹 {clear_result_cache()} hasil test di cache dihapus", style="green")
+        raise SystemExit(0)
+    if args.show_negative_cache or args.clear_negative_cache:
+        show_negative_cache(clear=args.clear_negative_cache)
+        raise SystemExit(0)
+    if args.xray_pool_size or args.xray_startup_timeout:
+        configure_xray_pool(args.xray_pool_size, args.xray_startup_timeout)
+    asyncio.run(main(budget_seconds=args.budget, top_k=args.top_k, top_k_max_latency=args.top_k_latency,
+                     speedtest=args.speedtest, cache_ttl_minutes=args.cache_ttl,
+                     retry_policy=RetryPolicy(max_attempts=args.retries, base_delay=args.retry_delay)))
\ No newline at end of file
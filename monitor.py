@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Config Monitor - validasi ulang config yang sudah dipublish setiap check_interval_minutes
+Config diambil dari GitHub (atau file lokal), akun dites ulang secara bertahap, dan config
+baru hanya dibuat + di-upload kalau himpunan akun sehat berubah.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from core import (
+    ensure_ws_path_field, sort_priority, build_final_accounts, load_template, test_all_accounts
+)
+from extractor import extract_accounts_from_config
+from converter import inject_outbounds_to_template
+from concurrency import AdaptiveLimiter
+from database import save_test_session, get_github_config
+from github_client import GitHubClient
+from result_cache import account_fingerprint
+from speedtest import load_speedtest_config, run_speed_tests
+from tester import enrich_geolocation
+
+TEMPLATE_FILE = "template.json"
+GITHUB_CONFIG_FILE = "github_config.json"
+MONITOR_CONCURRENCY = 10  # monitor tidak perlu cepat; concurrency kecil = tidak burst
+PROBE_SPREAD_FRACTION = 0.1  # probe disebar di maksimal 10% interval
+MAX_PROBE_SPACING = 1.0  # detik, jarak maksimum antar probe
+DEAD_RETEST_CYCLES = 3  # akun yang tidak sehat dites ulang tiap N siklus (lewat result cache)
+
+def load_github_client(owner=None, repo=None):
+    """GitHubClient dari github_config.json, lalu setting database, lalu env GITHUB_TOKEN + owner/repo"""
+    config = {}
+    if os.path.exists(GITHUB_CONFIG_FILE):
+        try:
+            with open(GITHUB_CONFIG_FILE, "r") as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            config = {}
+    if not config.get("token"):
+        config = get_github_config() or {}
+    token = config.get("token") or os.getenv("GITHUB_TOKEN")
+    owner = owner or config.get("owner")
+    repo = repo or config.get("repo")
+    if not (token and owner and repo):
+        return None
+    return GitHubClient(token, owner, repo)
+
+class ConfigMonitor:
+    """
+    Satu siklus (run_cycle):
+    1. Ambil config terpublish (GitHub path atau file lokal), ekstrak akun ke pool monitor
+    2. Akun yang sehat/terpublish dites ulang (warm); akun lain cukup tiap DEAD_RETEST_CYCLES siklus
+    3. Probe disebar (min_interval) supaya tidak burst
+    4. Simpan riwayat siklus ke test_sessions; kalau himpunan akun sehat != akun terpublish,
+       buat config baru dari template dan upload/tulis
+    """
+
+    def __init__(self, github_client=None, github_path=None, config_file=None, interval_minutes=None,
+                 speedtest=False):
+        if not github_path and not config_file:
+            raise ValueError("github_path atau config_file harus diisi")
+        self.github_client = github_client
+        self.github_path = github_path
+        self.config_file = config_file
+        self.speedtest_config = load_speedtest_config()
+        self.interval_minutes = float(interval_minutes or self.speedtest_config.get("check_interval_minutes", 120))
+        self.speedtest = speedtest
+
+        self.pool = {}  # fingerprint → akun; akun yang dibuang dari config tetap di sini, bisa kembali sehat
+        self.last_healthy = set()
+        self.cycles = 0
+        self.status = {"running": False, "last_cycle_at": None, "next_cycle_at": None, "last_summary": None}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- sumber config ---
+
+    def _load_published(self):
+        """Return (config_data, sha); sha None untuk file lokal"""
+        if self.github_path:
+            if not self.github_client:
+                raise RuntimeError("GitHub client belum dikonfigurasi")
+            content, sha = self.github_client.get_file(self.github_path)
+            if not content:
+                raise RuntimeError(f"Gagal mengambil '{self.github_path}' dari GitHub")
+            return json.loads(content), sha
+        with open(self.config_file, "r", encoding="utf-8") as f:
+            return json.load(f), None
+
+    def _publish(self, config_str, sha, healthy_count):
+        if self.github_path:
+            message = f"Monitor: {healthy_count} healthy accounts ({datetime.now().strftime('%Y-%m-%d %H:%M')})"
+            return self.github_client.update_or_create_file(self.github_path, config_str, message, sha) is not None
+        with open(self.config_file, "w", encoding="utf-8") as f:
+            f.write(config_str)
+        return True
+
+    # --- siklus ---
+
+    def _probe_spacing(self, count):
+        if not count:
+            return 0
+        return min(MAX_PROBE_SPACING, self.interval_minutes * 60 * PROBE_SPREAD_FRACTION / count)
+
+    async def _test(self, accounts, cache_ttl_minutes, limiter):
+        live_results = [
+            {"index": i, "OriginalTag": acc.get("tag", "proxy"), "OriginalAccount": acc,
+             "VpnType": acc.get("type", "-"), "Status": "WAIT"}
+            for i, acc in enumerate(accounts)
+        ]
+        if accounts:
+            await test_all_accounts(accounts, limiter, live_results, cache_ttl_minutes=cache_ttl_minutes)
+        return live_results
+
+    async def run_cycle(self) -> dict:
+        self.cycles += 1
+        started = time.monotonic()
+        config_data, sha = self._load_published()
+        published_accounts = ensure_ws_path_field(extract_accounts_from_config(config_data) or [])
+        published = set()
+        for account in published_accounts:
+            fingerprint = account_fingerprint(account)
+            published.add(fingerprint)
+            self.pool[fingerprint] = account
+
+        warm_fps = [fp for fp in self.pool if fp in published or fp in self.last_healthy]
+        cold_fps = [fp for fp in self.pool if fp not in warm_fps]
+        print(f"🛰️ Monitor cycle {self.cycles}: {len(published)} published, "
+              f"{len(warm_fps)} warm, {len(cold_fps)} cold accounts")
+
+        limiter = AdaptiveLimiter(initial=MONITOR_CONCURRENCY, maximum=MONITOR_CONCURRENCY,
+                                  min_interval=self._probe_spacing(len(self.pool)))
+        warm_results = await self._test([self.pool[fp] for fp in warm_fps], 0, limiter)
+        cold_results = await self._test([self.pool[fp] for fp in cold_fps],
+                                        self.interval_minutes * DEAD_RETEST_CYCLES, limiter)
+        results = warm_results + cold_results
+
+        healthy_results = [res for res in results if res.get("Status") == "✅"]
+        if self.speedtest and healthy_results:
+            await run_speed_tests(healthy_results, self.speedtest_config)
+        healthy = {account_fingerprint(res["OriginalAccount"]) for res in healthy_results}
+
+        changed = healthy != published
+        uploaded = False
+        if changed and not healthy:
+            print("⚠️ Monitor: no healthy accounts, keeping the published config")
+        elif changed:
+            # Real geolocation hanya kalau config memang akan di-publish ulang (memo per akun)
+            await enrich_geolocation(healthy_results)
+            healthy_results.sort(key=sort_priority)
+            final_accounts = build_final_accounts(healthy_results)
+            config_out = inject_outbounds_to_template(load_template(TEMPLATE_FILE), final_accounts)
+            config_str = json.dumps(config_out, indent=2, ensure_ascii=False)
+            uploaded = self._publish(config_str, sha, len(final_accounts))
+            print(f"🛰️ Monitor: healthy set changed (+{len(healthy - published)} / -{len(published - healthy)}), "
+                  f"{'published' if uploaded else 'publish FAILED'}")
+        else:
+            print("🛰️ Monitor: healthy set unchanged, nothing to publish")
+        self.last_healthy = healthy
+
+        summary = {
+            "cycle": self.cycles,
+            "published": len(published),
+            "tested": len(results),
+            "healthy": len(healthy),
+            "added": len(healthy - published),
+            "removed": len(published - healthy),
+            "changed": changed,
+            "uploaded": uploaded,
+            "duration_seconds": round(time.monotonic() - started, 1),
+        }
+        save_test_session({
+            "monitor": summary,
+            "results": results,
+            "successful": len(healthy_results),
+            "total": len(results),
+            "concurrency": limiter.summary(),
+            "timestamp": datetime.now().isoformat(),
+        })
+        return summary
+
+    # --- loop ---
+
+    def run_forever(self):
+        """Jalankan siklus tiap interval sampai stop() dipanggil (blocking)"""
+        self.status["running"] = True
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.status["last_summary"] = asyncio.run(self.run_cycle())
+                except Exception as e:
+                    print(f"❌ Monitor cycle error: {e}")
+                    self.status["last_summary"] = {"cycle": self.cycles, "error": str(e)}
+                self.status["last_cycle_at"] = datetime.now().isoformat()
+                self.status["next_cycle_at"] = datetime.fromtimestamp(
+                    time.time() + self.interval_minutes * 60).isoformat()
+                self._stop.wait(self.interval_minutes * 60)
+        finally:
+            self.status["running"] = False
+
+    def start(self):
+        """Jalankan monitor di thread background (dipakai app.py)"""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, daemon=True, name="config-monitor")
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def get_status(self):
+        return {
+            **self.status,
+            "interval_minutes": self.interval_minutes,
+            "source": f"github:{self.github_path}" if self.github_path else self.config_file,
+            "pool_size": len(self.pool),
+            "healthy": len(self.last_healthy),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="VortexVpn config monitor")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--github-path", help="path file config di repo GitHub")
+    source.add_argument("--file", help="file config lokal")
+    parser.add_argument("--owner", help="owner repo GitHub (default dari github_config.json)")
+    parser.add_argument("--repo", help="nama repo GitHub (default dari github_config.json)")
+    parser.add_argument("--interval", type=float, default=None, metavar="MINUTES",
+                        help="interval cek (default check_interval_minutes di speedtest_config.json)")
+    parser.add_argument("--speedtest", action="store_true", help="speed test akun sehat tiap siklus")
+    parser.add_argument("--once", action="store_true", help="jalankan satu siklus lalu keluar")
+    args = parser.parse_args()
+
+    load_dotenv()
+    github_client = load_github_client(args.owner, args.repo) if args.github_path else None
+    if args.github_path and not github_client:
+        parser.error("GitHub belum dikonfigurasi (github_config.json / GITHUB_TOKEN + --owner/--repo)")
+    monitor = ConfigMonitor(github_client, args.github_path, args.file, args.interval, args.speedtest)
+
+    if args.once:
+        print(asyncio.run(monitor.run_cycle()))
+        return
+    print(f"🛰️ Monitor started: every {monitor.interval_minutes:g} min (Ctrl+C to stop)")
+    try:
+        monitor.run_forever()
+    except KeyboardInterrupt:
+        monitor.stop()
+
+if __name__ == "__main__":
+    main()
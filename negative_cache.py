@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Negative Cache - ingat nama yang tidak bisa di-resolve dan endpoint IP:port yang mati
+Dipakai bersama oleh resolver DNS, resolver lokasi dan probe di tester.py; disimpan di
+vortexvpn.db supaya run berikutnya tidak mengulang semua retry ke target yang sama.
+"""
+
+import atexit
+import socket
+import threading
+import time
+
+from database import get_negative_cache_entries, save_negative_cache_entries, clear_negative_cache
+
+# TTL (detik) per jenis kegagalan: definitif lama, transien pendek
+NEGATIVE_TTLS = {
+    "nxdomain": 3600,  # nama memang tidak ada
+    "refused": 1800,  # port tertutup
+    "unreachable": 600,
+    "dns": 120,  # resolver timeout / SERVFAIL
+    "timeout": 120,
+    "tls": 300,
+}
+FLUSH_THRESHOLD = 100  # entry baru ditulis ke SQLite per batch, bukan satu-satu
+# Kegagalan yang berlaku untuk semua akun di ip:port; selain ini (tls, timeout, ...) bisa
+# tergantung SNI akun, jadi disimpan per (ip, port, sni)
+ENDPOINT_WIDE_KINDS = ("refused", "unreachable")
+
+def classify_dns_error(error):
+    """Jenis kegagalan resolve: 'nxdomain' (nama tidak ada) atau 'dns' (transien)"""
+    if isinstance(error, UnicodeError):
+        return "nxdomain"  # nama tidak valid, tidak akan pernah resolve
+    nxdomain_codes = {getattr(socket, name) for name in ("EAI_NONAME", "EAI_NODATA") if hasattr(socket, name)}
+    if isinstance(error, socket.gaierror) and error.errno in nxdomain_codes:
+        return "nxdomain"
+    return "dns"
+
+class NegativeCache:
+    """
+    Key "dns:<nama>", "ep:<ip>:<port>" (refused/unreachable) atau "ep:<ip>:<port>/<sni>"
+    (kegagalan lain) → (kind, reason, expires_at).
+    Dibaca dari SQLite sekali (lazy), lalu entry baru ditulis per batch (flush()).
+    """
+
+    def __init__(self, ttls=None, persist=True):
+        self.ttls = dict(NEGATIVE_TTLS, **(ttls or {}))
+        self.persist = persist
+        self._entries = {}
+        self._pending = []
+        self._loaded = not persist
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "added": 0}
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            self._entries.update(get_negative_cache_entries())
+        except Exception as e:
+            print(f"⚠️ Negative cache read error: {e}")
+
+    @staticmethod
+    def name_key(name):
+        return f"dns:{(name or '').lower().rstrip('.')}"
+
+    @staticmethod
+    def endpoint_key(ip, port, sni=None, kind=None):
+        if kind in ENDPOINT_WIDE_KINDS:
+            return f"ep:{ip}:{port}"
+        return f"ep:{ip}:{port}/{sni or ''}"
+
+    def get(self, key):
+        """Entry {kind, reason, expires_in} yang belum expired, atau None"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            kind, reason, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self.stats["hits"] += 1
+            return {"kind": kind, "reason": reason, "expires_in": round(expires_at - time.time())}
+
+    def add(self, key, kind, reason=""):
+        """Catat kegagalan; kind tanpa TTL (mis. penolakan WS per path) diabaikan"""
+        ttl = self.ttls.get(kind)
+        if not ttl:
+            return
+        expires_at = time.time() + ttl
+        flush = False
+        with self._lock:
+            self._ensure_loaded()
+            current = self._entries.get(key)
+            if current and current[2] >= expires_at:
+                return
+            self._entries[key] = (kind, reason or "", expires_at)
+            self.stats["added"] += 1
+            if self.persist:
+                self._pending.append((key, kind, reason or "", expires_at))
+                flush = len(self._pending) >= FLUSH_THRESHOLD
+        if flush:
+            self.flush()
+
+    def check_name(self, name):
+        return self.get(self.name_key(name)) if name else None
+
+    def add_name(self, name, kind, reason=""):
+        if name:
+            self.add(self.name_key(name), kind, reason)
+
+    def check_endpoint(self, ip, port, sni=None):
+        """Entry untuk endpoint ini: kegagalan ip:port (refused/unreachable) atau milik SNI ini"""
+        if not ip:
+            return None
+        entry = self.get(self.endpoint_key(ip, port, kind=ENDPOINT_WIDE_KINDS[0]))
+        if entry and entry["kind"] in ENDPOINT_WIDE_KINDS:  # entry lama per ip:port bisa "timeout"
+            return entry
+        return self.get(self.endpoint_key(ip, port, sni))
+
+    def add_endpoint(self, ip, port, kind, reason="", sni=None):
+        if ip:
+            self.add(self.endpoint_key(ip, port, sni, kind), kind, reason)
+
+    def flush(self):
+        """Tulis entry baru ke SQLite"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            save_negative_cache_entries(pending)
+        except Exception as e:
+            print(f"⚠️ Negative cache write error: {e}")
+
+    def entries(self):
+        """Daftar entry aktif untuk UI/CLI, yang paling lama berlaku dulu"""
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            rows = [
+                {"key": key, "kind": kind, "reason": reason, "expires_in": round(expires_at - now)}
+                for key, (kind, reason, expires_at) in self._entries.items() if expires_at > now
+            ]
+        return sorted(rows, key=lambda row: -row["expires_in"])
+
+    def clear(self):
+        """Kosongkan cache (memori + SQLite); return jumlah entry yang dihapus"""
+        with self._lock:
+            self._ensure_loaded()
+            count = len(self._entries)
+            self._entries.clear()
+            self._pending = []
+        if self.persist:
+            try:
+                count = max(count, clear_negative_cache())
+            except Exception as e:
+                print(f"⚠️ Negative cache clear error: {e}")
+        return count
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_negative_cache():
+    """NegativeCache bersama untuk satu proses; sisa entry ditulis saat proses keluar"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = NegativeCache()
+            atexit.register(_shared_cache.flush)
+        return _shared_cache
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Proxy HTTP Client - HTTP request lewat inbound HTTP proxy lokal (xray) tanpa fork curl
+Satu koneksi keep-alive ke proxy dipakai untuk beberapa sampel latency + lookup exit IP
+"""
+
+import http.client
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+LATENCY_URL = 'http://www.gstatic.com/generate_204'
+EXIT_IP_URL = 'http://ip-api.com/json'
+LATENCY_SAMPLES = 3
+
+class ProxyHTTPClient:
+    """Client HTTP/1.1 minimal yang mengirim request absolute-URI ke proxy HTTP"""
+
+    def __init__(self, proxy_host, proxy_port, timeout=15):
+        self.proxy_host = proxy_host
+        self.proxy_port = int(proxy_port)
+        self.timeout = timeout
+        self._conn = None
+
+    @classmethod
+    def from_url(cls, proxy_url, timeout=15):
+        parts = urlsplit(proxy_url)
+        return cls(parts.hostname or '127.0.0.1', parts.port or 80, timeout=timeout)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, method, url, headers=None, body=None):
+        """
+        Kirim satu request lewat proxy (reuse koneksi kalau masih hidup); body opsional (upload).
+        Return (status, body_bytes, timings) dengan timings dalam ms:
+        connect (0 kalau koneksi di-reuse), ttfb, total.
+        """
+        parts = urlsplit(url)
+        request_headers = {"Host": parts.netloc, "Connection": "keep-alive", "User-Agent": "VortexVPN"}
+        request_headers.update(headers or {})
+
+        for attempt in range(2):
+            start = time.monotonic()
+            connect_ms = 0.0
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.proxy_host, self.proxy_port, timeout=self.timeout)
+                self._conn.connect()
+                connect_ms = (time.monotonic() - start) * 1000
+            try:
+                self._conn.request(method, url, body=body, headers=request_headers)
+                response = self._conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # Proxy menutup koneksi keep-alive; buka ulang sekali
+                self.close()
+                if attempt == 0:
+                    continue
+                raise
+            ttfb_ms = (time.monotonic() - start) * 1000
+            response_body = response.read()
+            total_ms = (time.monotonic() - start) * 1000
+            if response.will_close:
+                self.close()
+            return response.status, response_body, {
+                "connect": round(connect_ms, 1),
+                "ttfb": round(ttfb_ms, 1),
+                "total": round(total_ms, 1),
+            }
+
+    def measure_latency(self, url=LATENCY_URL, samples=LATENCY_SAMPLES):
+        """
+        Ambil beberapa sampel request ke url lewat koneksi yang sama.
+        Sampel pertama (cold) termasuk setup koneksi upstream; latency/jitter dihitung dari semua sampel.
+        """
+        timings = []
+        for _ in range(samples):
+            status, _, timing = self.request("GET", url)
+            if status >= 500:
+                raise http.client.HTTPException(f"proxy returned HTTP {status}")
+            timings.append(timing)
+
+        totals = [t["total"] for t in timings]
+        jitter = 0
+        if len(totals) > 1:
+            jitter = statistics.mean(abs(totals[i] - totals[i-1]) for i in range(1, len(totals)))
+        return {
+            "latency": round(statistics.mean(totals)),
+            "jitter": round(jitter),
+            "connect": timings[0]["connect"],
+            "ttfb": timings[0]["ttfb"],
+            "ttfb_warm": round(statistics.mean(t["ttfb"] for t in timings[1:])) if len(timings) > 1 else timings[0]["ttfb"],
+            "samples": totals,
+        }
+
+    def measure_download(self, url):
+        """
+        Download url lewat proxy. Mbps dihitung dari byte body / waktu setelah byte pertama,
+        jadi TTFB (setup tunnel + respon server) tidak ikut menurunkan throughput.
+        """
+        status, body, timing = self.request("GET", url)
+        if status != 200:
+            raise http.client.HTTPException(f"download returned HTTP {status}")
+        return _transfer_stats(len(body), timing["total"] - timing["ttfb"], timing)
+
+    def measure_upload(self, url, size):
+        """POST `size` byte ke url lewat proxy; Mbps dari total waktu sampai respon diterima"""
+        status, _, timing = self.request("POST", url, headers={"Content-Type": "application/octet-stream"},
+                                         body=b"\0" * int(size))
+        if status >= 400:
+            raise http.client.HTTPException(f"upload returned HTTP {status}")
+        return _transfer_stats(int(size), timing["ttfb"], timing)
+
+    def get_json(self, url=EXIT_IP_URL):
+        status, body, _ = self.request("GET", url)
+        if status != 200:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+def _transfer_stats(size, transfer_ms, timing):
+    mbps = (size * 8 / 1_000_000) / (max(transfer_ms, 1) / 1000)
+    return {
+        "bytes": size,
+        "mbps": round(mbps, 2),
+        "ttfb": timing["ttfb"],
+        "total": timing["total"],
+    }
@@ -4,23 +4,30 @@ Real Geolocation Tester - based on user's working method
 Menggunakan metode yang sudah proven untuk mendapatkan ISP asli
 """
 
-import json
-import subprocess
 import time
-import tempfile
-import os
 import re
-from utils import geoip_lookup
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from geoip_client import get_geoip_client
+from cdn_ranges import get_cdn_ranges
+from concurrency import evaluate_concurrently
+from dns_client import resolve_domain_ips
+from dns_resolver import resolve_blocking
+from proxy_http import ProxyHTTPClient, LATENCY_URL
+from xray_pool import get_xray_pool, XrayStartupError, XRAY_PATH, XRAY_BATCH_SIZE
 
 class RealGeolocationTester:
     """Test VPN dengan actual connection untuk mendapatkan ISP asli"""
     
     def __init__(self):
-        self.local_http_port = 10809
-        self.test_url = 'https://www.google.com'
+        self.local_http_port = 10809  # default untuk config standalone; worker pool pakai port dinamis
+        self.test_url = LATENCY_URL  # plain HTTP supaya sampel latency & exit IP bisa satu koneksi proxy
         self.geo_api_url = 'http://ip-api.com/json'
         self.timeout_seconds = 15
-        self.xray_path = './xray'  # Adjust path as needed
+        self.xray_path = XRAY_PATH  # Adjust path as needed
+        self.batch_mode = True  # gabungkan banyak akun ke satu proses xray
+        self.cancelled = None  # threading.Event opsional: pemanggil sudah tidak menunggu hasil
+        self.dns_servers = ['8.8.8.8', '1.1.1.1']  # resolver untuk cari semua IP domain (selain sistem)
         
     def extract_real_ip_from_path(self, path):
         """Extract IP dari path seperti metode user"""
@@ -148,11 +155,62 @@ class RealGeolocationTester:
         print("🎯 Using actual VPN proxy method (no direct lookup target)")
         return None, "VPN proxy method"
     
-    def create_xray_config(self, account):
+    def create_xray_config(self, account, inbound_port=None):
         """
         USER'S IMPROVED METHOD: Create Xray config dengan proper VLESS/VMess handling
         Based on working standalone script
+        inbound_port: port HTTP inbound (default self.local_http_port)
         """
+        outbound = self._build_xray_outbound(account)
+        if not outbound:
+            return None
+        
+        return {
+            "log": {"loglevel": "warning"},
+            "inbounds": [{
+                "listen": "127.0.0.1",
+                "port": inbound_port or self.local_http_port,
+                "protocol": "http",
+                "settings": {}
+            }],
+            "outbounds": [outbound]
+        }
+    
+    def create_xray_batch_config(self, accounts, ports):
+        """
+        BATCH MODE: satu config xray dengan N inbound HTTP yang di-route 1:1 ke N outbound
+        accounts[i] → inbound di ports[i] (tag in-i) → outbound out-i
+        Return (config, indexes) - indexes = posisi akun yang outbound-nya berhasil dibuat
+        """
+        inbounds, outbounds, rules, indexes = [], [], [], []
+        for i, (account, port) in enumerate(zip(accounts, ports)):
+            outbound = self._build_xray_outbound(account)
+            if not outbound:
+                continue
+            outbound["tag"] = f"out-{i}"
+            inbounds.append({
+                "tag": f"in-{i}",
+                "listen": "127.0.0.1",
+                "port": port,
+                "protocol": "http",
+                "settings": {}
+            })
+            outbounds.append(outbound)
+            rules.append({"type": "field", "inboundTag": [f"in-{i}"], "outboundTag": f"out-{i}"})
+            indexes.append(i)
+        
+        if not outbounds:
+            return None, []
+        
+        return {
+            "log": {"loglevel": "warning"},
+            "inbounds": inbounds,
+            "outbounds": outbounds,
+            "routing": {"rules": rules}
+        }, indexes
+    
+    def _build_xray_outbound(self, account):
+        """Build satu outbound xray dari akun (dipakai config single & batch)"""
         protocol = account.get('type', '')
         
         # Mapping protocol names untuk Xray
@@ -268,15 +326,7 @@ class RealGeolocationTester:
             print(f"❌ Unsupported protocol: {protocol}")
             return None
         
-        return {
-            "log": {"loglevel": "warning"},
-            "inbounds": [{
-                "port": self.local_http_port,
-                "protocol": "http",
-                "settings": {}
-            }],
-            "outbounds": [outbound]
-        }
+        return outbound
     
     def test_real_location(self, account):
         """
@@ -291,6 +341,9 @@ class RealGeolocationTester:
         USER REQUEST: "saya tu maunya data yang realnya" - always get real VPN server data
         """
         try:
+            if self._is_cancelled():
+                return {'success': False, 'error': 'Cancelled', 'method': 'cancelled'}
+            
             # Get lookup target dengan user's simplified method
             lookup_target, method = self.get_lookup_target(account)
             
@@ -310,6 +363,9 @@ class RealGeolocationTester:
             modified_account = self._create_account_with_cleaned_domains(account, lookup_target, method)
             vpn_result = self._test_with_actual_vpn_connection(modified_account)
             
+            if self._is_cancelled():
+                return {'success': False, 'error': 'Cancelled', 'method': 'cancelled'}
+            
             # If VPN proxy failed (no xray), try to detect real VPN infrastructure
             if not vpn_result.get('success'):
                 print("⚠️ VPN proxy unavailable, trying to detect real VPN infrastructure...")
@@ -325,70 +381,57 @@ class RealGeolocationTester:
                 'method': 'failed'
             }
     
+    def _is_cancelled(self):
+        return self.cancelled is not None and self.cancelled.is_set()
+    
     def _resolve_domain_to_best_ip(self, domain):
         """TES8 METHOD: Resolve domain ke IP dan pilih yang terbaik (avoid CDN)"""
         try:
-            import socket
-            
-            # Get all IPs untuk domain
-            all_ips = []
-            try:
-                # Standard resolution
-                ip = socket.gethostbyname(domain)
-                all_ips.append(ip)
-            except:
-                pass
-            
-            # Try with different DNS (if dig available) - TES8 enhancement
-            try:
-                result = subprocess.run(
-                    ['dig', '+short', domain], 
-                    capture_output=True, text=True, timeout=5
-                )
-                if result.returncode == 0:
-                    for line in result.stdout.strip().split('\n'):
-                        line = line.strip()
-                        if line and self._is_valid_ip(line):
-                            all_ips.append(line)
-            except:
-                pass
-            
-            # Remove duplicates
-            unique_ips = list(set(all_ips))
+            # Get all IPs untuk domain (resolver sistem + DNS UDP, paralel)
+            unique_ips = resolve_domain_ips(domain, servers=self.dns_servers)
             
             if not unique_ips:
                 return None
             
+            # IP edge CDN (prefix trie) dibuang tanpa geo lookup, kecuali semuanya CDN
+            non_cdn_ips, cdn_ips = get_cdn_ranges().split(unique_ips)
+            candidates = non_cdn_ips or cdn_ips
+            
             # Jika cuma 1 IP, return langsung
-            if len(unique_ips) == 1:
-                return unique_ips[0]
+            if len(candidates) == 1:
+                return candidates[0]
             
             # TES8 ENHANCEMENT: Smart IP selection dengan CDN avoidance scoring
+            # (kandidat dinilai paralel, berhenti begitu ketemu provider VPS)
+            def score_ip(ip):
+                geo_data = self._get_geo_data_direct(ip)
+                if not geo_data or geo_data.get('status') != 'success':
+                    return None
+                provider = geo_data.get('isp', '').lower()
+                score = 0
+                
+                # TES8: Penalize CDN providers (avoid false geolocation)
+                if any(cdn in provider for cdn in ['cloudflare', 'amazon', 'aws', 'google', 'microsoft']):
+                    score -= 50
+                    print(f"🔍 TES8: CDN detected - {ip} ({provider}) score: {score}")
+                
+                # TES8: Reward VPS providers (real server locations)
+                is_vps = any(vps in provider for vps in ['digitalocean', 'linode', 'vultr', 'hetzner', 'ovh'])
+                if is_vps:
+                    score += 30
+                    print(f"🔍 TES8: VPS detected - {ip} ({provider}) score: {score}")
+                return score, is_vps
+            
+            scored = [(ip, result) for ip, result in evaluate_concurrently(
+                candidates, score_ip, stop=lambda ip, result: bool(result and result[1])) if result]
             best_ip = None
             best_score = -999
-            
-            for ip in unique_ips:
-                geo_data = self._get_geo_data_direct(ip)
-                if geo_data and geo_data.get('status') == 'success':
-                    provider = geo_data.get('isp', '').lower()
-                    score = 0
-                    
-                    # TES8: Penalize CDN providers (avoid false geolocation)
-                    if any(cdn in provider for cdn in ['cloudflare', 'amazon', 'aws', 'google', 'microsoft']):
-                        score -= 50
-                        print(f"🔍 TES8: CDN detected - {ip} ({provider}) score: {score}")
-                    
-                    # TES8: Reward VPS providers (real server locations)
-                    if any(vps in provider for vps in ['digitalocean', 'linode', 'vultr', 'hetzner', 'ovh']):
-                        score += 30
-                        print(f"🔍 TES8: VPS detected - {ip} ({provider}) score: {score}")
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_ip = ip
+            if scored:
+                order = {ip: i for i, ip in enumerate(candidates)}
+                best_ip, (best_score, _) = max(scored, key=lambda item: (item[1][0], -order[item[0]]))
             
             print(f"🎯 TES8: Resolved {domain} to {len(unique_ips)} IPs, selected: {best_ip} (score: {best_score})")
-            return best_ip or unique_ips[0]  # Fallback ke IP pertama
+            return best_ip or candidates[0]  # Fallback ke IP pertama
             
         except Exception as e:
             print(f"❌ TES8: Domain resolution error: {e}")
@@ -404,17 +447,11 @@ class RealGeolocationTester:
             return False
     
     def _get_geo_data_direct(self, ip):
-        """Get geolocation data untuk specific IP"""
+        """Get geolocation data untuk specific IP (batch ip-api + cache SQLite, tanpa curl)"""
         try:
-            result = subprocess.run(
-                ['curl', '-s', f"{self.geo_api_url}/{ip}"],
-                capture_output=True, text=True, timeout=10
-            )
-            if result.returncode == 0:
-                return json.loads(result.stdout)
+            return get_geoip_client().lookup(ip)
         except Exception:
-            pass
-        return None
+            return None
     
     def _get_geo_data(self, target):
         """Enhanced geolocation dengan IP resolution untuk domain"""
@@ -463,117 +500,90 @@ class RealGeolocationTester:
             return None
     
     def _get_all_domain_ips(self, domain):
-        """TES8: Get all possible IPs untuk domain dengan multiple methods"""
-        all_ips = []
-        
+        """TES8: Get all possible IPs untuk domain (resolver sistem + UDP ke 8.8.8.8 & 1.1.1.1, paralel)"""
         try:
-            import socket
+            all_ips = resolve_domain_ips(domain, servers=self.dns_servers)
+        except Exception as e:
+            print(f"❌ TES8: DNS resolution error: {e}")
+            return []
+        for ip in all_ips:
+            print(f"🔍 TES8: DNS → {ip}")
+        return all_ips
+    
+    def _score_ip_with_geo(self, ip, original_domain, is_cdn=False):
+        """TES8 scoring satu IP; return (score, geo_data, is_vps) atau None kalau geo gagal"""
+        try:
+            # Get geolocation untuk IP ini
+            geo_data = self._get_geo_data_direct(ip)
+            if not geo_data or geo_data.get('status') != 'success':
+                return None
             
-            # Method 1: Standard resolution
-            try:
-                ip = socket.gethostbyname(domain)
-                all_ips.append(ip)
-                print(f"🔍 TES8: Standard DNS → {ip}")
-            except:
-                pass
+            provider = geo_data.get('isp', '').lower()
+            org = geo_data.get('org', '').lower()
+            country = geo_data.get('countryCode', '')
             
-            # Method 2: dig command (if available)
-            try:
-                result = subprocess.run(
-                    ['dig', '+short', domain], 
-                    capture_output=True, text=True, timeout=5
-                )
-                if result.returncode == 0:
-                    for line in result.stdout.strip().split('\n'):
-                        line = line.strip()
-                        if line and self._is_valid_ip(line):
-                            all_ips.append(line)
-                            print(f"🔍 TES8: dig DNS → {line}")
-            except:
-                pass
-            
-            # Method 3: Try different DNS servers (TES8 enhancement)
-            for dns_server in ['8.8.8.8', '1.1.1.1']:
-                try:
-                    result = subprocess.run(
-                        ['nslookup', domain, dns_server],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    if result.returncode == 0:
-                        # Parse nslookup output untuk IP
-                        import re
-                        ips = re.findall(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', result.stdout)
-                        for ip in ips:
-                            if ip not in ['127.0.0.1', '8.8.8.8', '1.1.1.1'] and self._is_valid_ip(ip):
-                                all_ips.append(ip)
-                                print(f"🔍 TES8: nslookup @{dns_server} → {ip}")
-                except:
-                    pass
+            # TES8 Scoring algorithm
+            score = 0
             
-        except Exception as e:
-            print(f"❌ TES8: DNS resolution error: {e}")
+            # Penalize CDN providers heavily
+            if is_cdn or any(cdn in provider or cdn in org for cdn in ['cloudflare', 'amazon', 'aws', 'google', 'microsoft', 'akamai']):
+                score -= 100
+                print(f"🔍 TES8: {ip} → {provider} → CDN penalty: {score}")
+                # Don't skip entirely - sometimes CDN is the only option
+                # But heavily penalized so VPS will be preferred
+            
+            # Reward VPS/hosting providers  
+            is_vps = any(vps in provider or vps in org for vps in ['digitalocean', 'linode', 'vultr', 'hetzner', 'ovh', 'contabo'])
+            if is_vps:
+                score += 50
+                print(f"🔍 TES8: {ip} → {provider} → VPS reward: {score}")
+            
+            # Reward legitimate data centers
+            if any(dc in provider or dc in org for dc in ['datacenter', 'data center', 'hosting', 'server', 'network']):
+                score += 30
+                print(f"🔍 TES8: {ip} → {provider} → Datacenter reward: {score}")
+            
+            # Geographic relevance (if domain suggests location)
+            if len(country) == 2:  # Valid country code
+                if original_domain.startswith(country.lower() + '.') or country.lower() in original_domain:
+                    score += 20
+                    print(f"🔍 TES8: {ip} → {country} → Geographic match: {score}")
+            
+            print(f"🔍 TES8: {ip} → {provider} → Final score: {score}")
+            return score, geo_data, is_vps
         
-        # Remove duplicates and return
-        unique_ips = list(set(all_ips))
-        return unique_ips
+        except Exception as e:
+            print(f"❌ TES8: Error evaluating IP {ip}: {e}")
+            return None
     
     def _select_best_ip_with_geo(self, ip_list, original_domain):
-        """TES8: Select best IP berdasarkan geolocation scoring"""
+        """
+        TES8: Select best IP berdasarkan geolocation scoring.
+        Kandidat dinilai paralel (geo lookup ikut satu batch GeoIPClient), berhenti begitu ada
+        provider VPS. IP edge CDN (prefix trie) hanya dinilai kalau tidak ada IP non-CDN yang
+        punya geo valid - jadi kuota geo tidak habis untuk CDN.
+        """
+        non_cdn_ips, cdn_ips = get_cdn_ranges().split(ip_list)
+        print(f"🔍 TES8: Evaluating {len(ip_list)} IPs for best geolocation ({len(cdn_ips)} known CDN)...")
+        
+        scored = evaluate_concurrently(
+            non_cdn_ips, lambda ip: self._score_ip_with_geo(ip, original_domain),
+            stop=lambda ip, result: bool(result and result[2]))
+        scored = [(ip, result) for ip, result in scored if result]
+        if not scored and cdn_ips:
+            # Sometimes CDN is the only option: cukup satu yang geo-nya valid
+            scored = evaluate_concurrently(
+                cdn_ips, lambda ip: self._score_ip_with_geo(ip, original_domain, is_cdn=True),
+                stop=lambda ip, result: result is not None)
+            scored = [(ip, result) for ip, result in scored if result]
+        
         best_ip = None
         best_geo = None
         best_score = -999
-        
-        print(f"🔍 TES8: Evaluating {len(ip_list)} IPs for best geolocation...")
-        
-        for ip in ip_list:
-            try:
-                # Get geolocation untuk IP ini
-                geo_data = self._get_geo_data_direct(ip)
-                if not geo_data or geo_data.get('status') != 'success':
-                    continue
-                
-                provider = geo_data.get('isp', '').lower()
-                org = geo_data.get('org', '').lower()
-                country = geo_data.get('countryCode', '')
-                
-                # TES8 Scoring algorithm
-                score = 0
-                
-                # Penalize CDN providers heavily
-                if any(cdn in provider or cdn in org for cdn in ['cloudflare', 'amazon', 'aws', 'google', 'microsoft', 'akamai']):
-                    score -= 100
-                    print(f"🔍 TES8: {ip} → {provider} → CDN penalty: {score}")
-                    # Don't skip entirely - sometimes CDN is the only option
-                    # But heavily penalized so VPS will be preferred
-                
-                # Reward VPS/hosting providers  
-                if any(vps in provider or vps in org for vps in ['digitalocean', 'linode', 'vultr', 'hetzner', 'ovh', 'contabo']):
-                    score += 50
-                    print(f"🔍 TES8: {ip} → {provider} → VPS reward: {score}")
-                
-                # Reward legitimate data centers
-                if any(dc in provider or dc in org for dc in ['datacenter', 'data center', 'hosting', 'server', 'network']):
-                    score += 30
-                    print(f"🔍 TES8: {ip} → {provider} → Datacenter reward: {score}")
-                
-                # Geographic relevance (if domain suggests location)
-                if len(country) == 2:  # Valid country code
-                    if original_domain.startswith(country.lower() + '.') or country.lower() in original_domain:
-                        score += 20
-                        print(f"🔍 TES8: {ip} → {country} → Geographic match: {score}")
-                
-                print(f"🔍 TES8: {ip} → {provider} → Final score: {score}")
-                
-                if score > best_score:
-                    best_score = score
-                    best_ip = ip
-                    best_geo = geo_data
-                    
-            except Exception as e:
-                print(f"❌ TES8: Error evaluating IP {ip}: {e}")
-                continue
-        
-        if best_ip:
+        if scored:
+            # Skor sama → urutan asli ip_list menang (seperti evaluasi berurutan)
+            order = {ip: i for i, ip in enumerate(ip_list)}
+            best_ip, (best_score, best_geo, _) = max(scored, key=lambda item: (item[1][0], -order[item[0]]))
             print(f"🎯 TES8: Best IP selected: {best_ip} (score: {best_score}) → {best_geo.get('isp', 'N/A')}")
         else:
             print(f"❌ TES8: No suitable IP found, all were CDN or failed")
@@ -745,16 +755,17 @@ class RealGeolocationTester:
         Bypass CDN avoidance when user specifically needs domain testing
         """
         try:
-            import socket
-            
             # Direct domain resolution (no CDN avoidance)
             if self._is_valid_ip(target):
                 print(f"🔍 Direct IP lookup (bypass CDN check): {target}")
                 return self._get_geo_data_direct(target)
             else:
                 print(f"🔍 Force domain resolution (bypass CDN check): {target}")
-                # Get first available IP (no scoring)
-                ip = socket.gethostbyname(target)
+                # Get first available IP (no scoring), lewat resolver bersama (cache + negative cache)
+                ip = resolve_blocking(target)
+                if not ip:
+                    print(f"❌ Force domain lookup failed: {target} did not resolve")
+                    return None
                 print(f"🔍 Force resolved {target} → {ip}")
                 return self._get_geo_data_direct(ip)
                 
@@ -762,82 +773,181 @@ class RealGeolocationTester:
             print(f"❌ Force domain lookup failed: {e}")
             return None
 
+    def _probe_through_proxy(self, proxy_arg):
+        """Ukur latency + ambil exit IP info lewat proxy HTTP lokal xray (satu koneksi keep-alive, tanpa curl)"""
+        with ProxyHTTPClient.from_url(proxy_arg, timeout=self.timeout_seconds) as client:
+            timing = client.measure_latency(self.test_url)
+            
+            # Get real IP via proxy (koneksi yang sama)
+            geo_data = client.get_json(self.geo_api_url)
+        
+        if geo_data:
+            return {
+                'success': True,
+                'country': geo_data.get('countryCode', 'N/A'),
+                'country_name': geo_data.get('country', 'N/A'),
+                'isp': geo_data.get('isp', 'N/A'),
+                'org': geo_data.get('org', 'N/A'),
+                'ip': geo_data.get('query', 'N/A'),
+                'method': 'VPN Proxy',
+                'latency': timing['latency'],
+                'jitter': timing['jitter'],
+                'connect_ms': timing['connect'],
+                'ttfb_ms': timing['ttfb']
+            }
+        
+        return {'success': False, 'error': 'Connection failed', 'method': 'proxy'}
+
     def _test_with_actual_vpn_connection(self, account):
-        """Test dengan actual VPN connection seperti metode user"""
-        if not os.path.exists(self.xray_path):
+        """Test dengan actual VPN connection seperti metode user (xray worker dari pool, port dinamis)"""
+        if self.batch_mode:
+            return get_vpn_batcher(self).test(account, cancelled=self.cancelled)
+        
+        pool = get_xray_pool(self.xray_path)
+        if not pool.is_available():
             print(f"⚠️  Xray not found at {self.xray_path}, skipping proxy test")
             return {'success': False, 'error': 'Xray not available', 'method': 'proxy'}
         
         try:
-            # Create Xray config
-            config = self.create_xray_config(account)
-            if not config:
-                return {'success': False, 'error': 'Config creation failed', 'method': 'proxy'}
-            
-            # Write temp config
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-                json.dump(config, f)
-                temp_config = f.name
-            
-            try:
-                # Start Xray process
-                xray_process = subprocess.Popen(
-                    [self.xray_path, '-c', temp_config],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL
-                )
-                time.sleep(2)  # Wait for startup
-                
-                # Test connection
-                proxy_arg = f"http://127.0.0.1:{self.local_http_port}"
-                start_time = time.monotonic()
-                
-                subprocess.run(
-                    ['curl', '-s', '-I', self.test_url, '--proxy', proxy_arg, 
-                     '--connect-timeout', str(self.timeout_seconds)],
-                    check=True, capture_output=True, timeout=self.timeout_seconds + 2
-                )
-                
-                end_time = time.monotonic()
-                latency_ms = (end_time - start_time) * 1000
-                
-                # Get real IP via proxy
-                geo_result = subprocess.run(
-                    ['curl', '-s', self.geo_api_url, '--proxy', proxy_arg],
-                    capture_output=True, text=True, timeout=10
-                )
-                
-                if geo_result.returncode == 0:
-                    geo_data = json.loads(geo_result.stdout)
-                    return {
-                        'success': True,
-                        'country': geo_data.get('countryCode', 'N/A'),
-                        'country_name': geo_data.get('country', 'N/A'),
-                        'isp': geo_data.get('isp', 'N/A'),
-                        'org': geo_data.get('org', 'N/A'),
-                        'ip': geo_data.get('query', 'N/A'),
-                        'method': 'VPN Proxy',
-                        'latency': latency_ms
-                    }
-                
-            finally:
-                # Cleanup
-                if 'xray_process' in locals():
-                    xray_process.kill()
-                os.unlink(temp_config)
-                
+            with pool.worker(lambda port: self.create_xray_config(account, port)) as worker:
+                if worker is None:
+                    return {'success': False, 'error': 'Config creation failed', 'method': 'proxy'}
+                return self._probe_through_proxy(worker.proxy_url)
         except Exception as e:
             return {'success': False, 'error': str(e), 'method': 'proxy'}
+
+    def test_actual_vpn_connections_batch(self, accounts):
+        """
+        BATCH MODE: test banyak akun lewat SATU proses xray (N inbound → N outbound)
+        Biaya spawn + startup xray dibayar sekali per batch; semua inbound di-probe bersamaan.
+        Kalau xray gagal start (mis. satu outbound tidak didukung), batch dibelah dua dan dicoba
+        ulang sampai akun yang bermasalah terisolasi, jadi akun lain tetap dapat hasil proxy.
+        Return list hasil dengan urutan sama seperti accounts.
+        """
+        pool = get_xray_pool(self.xray_path)
+        if not pool.is_available():
+            print(f"⚠️  Xray not found at {self.xray_path}, skipping proxy test")
+            return [{'success': False, 'error': 'Xray not available', 'method': 'proxy'} for _ in accounts]
         
-        return {'success': False, 'error': 'Connection failed', 'method': 'proxy'}
+        results = [{'success': False, 'error': 'Config creation failed', 'method': 'proxy'} for _ in accounts]
+        built = {}
+        
+        def build_config(ports):
+            config, indexes = self.create_xray_batch_config(accounts, ports)
+            built['indexes'] = indexes
+            return config
+        
+        def probe(index):
+            try:
+                return self._probe_through_proxy(worker.proxy_url_for(index))
+            except Exception as e:
+                return {'success': False, 'error': str(e), 'method': 'proxy'}
+        
+        try:
+            with pool.batch_worker(build_config, len(accounts)) as worker:
+                if worker is None:
+                    return results
+                indexes = built.get('indexes', [])
+                print(f"🚀 Xray batch: testing {len(indexes)} accounts through one xray process")
+                with ThreadPoolExecutor(max_workers=max(1, min(32, len(indexes)))) as executor:
+                    for index, result in zip(indexes, executor.map(probe, indexes)):
+                        results[index] = result
+        except XrayStartupError as e:
+            indexes = built.get('indexes', [])
+            if len(indexes) <= 1:
+                for index in indexes:
+                    results[index] = {'success': False, 'error': str(e), 'method': 'proxy'}
+                return results
+            # Bisect di luar `with` supaya slot pool sudah dilepas sebelum xray berikutnya start
+            print(f"⚠️ Xray batch of {len(indexes)} failed to start ({e}), splitting batch")
+            middle = len(indexes) // 2
+            for part in (indexes[:middle], indexes[middle:]):
+                part_results = self.test_actual_vpn_connections_batch([accounts[i] for i in part])
+                for index, result in zip(part, part_results):
+                    results[index] = result
+        except Exception as e:
+            return [{'success': False, 'error': str(e), 'method': 'proxy'} for _ in accounts]
+        
+        return results
+
+class VpnConnectionBatcher:
+    """
+    Kumpulkan request _test_with_actual_vpn_connection dari banyak thread
+    lalu jalankan per batch (max XRAY_BATCH_SIZE akun per proses xray)
+    """
+    
+    def __init__(self, tester, batch_size=XRAY_BATCH_SIZE, collect_delay=0.5):
+        self.tester = tester
+        self.batch_size = batch_size
+        self.collect_delay = collect_delay
+        self._lock = threading.Lock()
+        self._pending = []  # (account, Future, cancelled Event atau None)
+        self._collector = None
+    
+    def test(self, account, timeout=None, cancelled=None):
+        """
+        Masukkan akun ke batch berikutnya dan tunggu hasilnya (sync, thread-safe).
+        Akun yang `cancelled`-nya sudah di-set saat batch dibentuk tidak ikut xray.
+        """
+        future = Future()
+        with self._lock:
+            self._pending.append((account, future, cancelled))
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect_loop, daemon=True)
+                self._collector.start()
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            return {'success': False, 'error': str(e), 'method': 'proxy'}
+    
+    def _collect_loop(self):
+        # Tunggu sebentar supaya akun lain ikut masuk batch; tiap batch jalan di thread sendiri
+        # (jumlah xray yang jalan bersamaan tetap dibatasi XrayWorkerPool)
+        while True:
+            time.sleep(self.collect_delay)
+            with self._lock:
+                for entry in [entry for entry in self._pending if entry[2] is not None and entry[2].is_set()]:
+                    self._pending.remove(entry)
+                    entry[1].set_result({'success': False, 'error': 'Cancelled', 'method': 'cancelled'})
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                if not batch:
+                    self._collector = None
+                    return
+            threading.Thread(target=self._run_batch, args=(batch,), daemon=True).start()
+    
+    def _run_batch(self, batch):
+        try:
+            results = self.tester.test_actual_vpn_connections_batch([acc for acc, _, _ in batch])
+        except Exception as e:
+            results = [{'success': False, 'error': str(e), 'method': 'proxy'} for _ in batch]
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+_vpn_batchers = {}
+_vpn_batcher_lock = threading.Lock()
+
+def get_vpn_batcher(tester):
+    """
+    Batcher bersama per xray_path (get_real_geolocation membuat tester baru tiap akun,
+    jadi key per instance tidak akan pernah menggabungkan batch)
+    """
+    with _vpn_batcher_lock:
+        batcher = _vpn_batchers.get(tester.xray_path)
+        if batcher is None:
+            batcher = _vpn_batchers[tester.xray_path] = VpnConnectionBatcher(tester)
+        return batcher
 
 # Integration function untuk existing tester
-def get_real_geolocation(account):
+def get_real_geolocation(account, cancelled=None):
     """
     Integration function yang bisa dipanggil dari tester.py
     Implements user's proven method untuk real ISP detection
+    cancelled: threading.Event opsional; kalau di-set, tahap berikutnya (xray, fallback) dilewati
     """
     tester = RealGeolocationTester()
+    tester.cancelled = cancelled
     result = tester.test_real_location(account)
     
     if result.get('success'):
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Result Cache - simpan hasil test per akun (fingerprint stabil) di vortexvpn.db
+Akun yang sama dan masih fresh (umur < TTL) tidak perlu di-probe ulang
+"""
+
+import hashlib
+import json
+import time
+
+from database import get_cached_results, save_cached_results
+
+RESULT_CACHE_TTL_MINUTES = 30
+FINAL_STATUSES = ("✅", "Dead", "❌")
+# Field yang tidak disimpan: identitas akun (diisi ulang saat dipakai) dan penanda run
+UNCACHED_FIELDS = ("index", "OriginalTag", "VpnType", "OriginalAccount", "SharedWith", "Cached", "CachedAgeMinutes")
+
+def account_fingerprint(account: dict) -> str:
+    """
+    Fingerprint stabil satu akun: type, server, port, credential, transport path/host, SNI.
+    Tag/nama tidak ikut, jadi ganti nama akun tidak membuat cache basi.
+    """
+    transport = account.get("transport") if isinstance(account.get("transport"), dict) else {}
+    headers = transport.get("headers") if isinstance(transport.get("headers"), dict) else {}
+    tls = account.get("tls") if isinstance(account.get("tls"), dict) else {}
+    key = {
+        "type": account.get("type", ""),
+        "server": (account.get("server") or "").lower(),
+        "port": str(account.get("server_port", "")),
+        "credential": account.get("uuid") or account.get("password") or "",
+        "method": account.get("method", ""),
+        "path": transport.get("path") or account.get("_ws_path") or account.get("_ss_path") or "",
+        "host": (headers.get("Host") or account.get("_ws_host") or account.get("_ss_ws_host") or "").lower(),
+        "sni": (tls.get("sni") or tls.get("server_name") or "").lower(),
+        "plugin_opts": account.get("plugin_opts", ""),
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+def load_fresh_results(accounts: list, ttl_minutes: float, indexes=None) -> dict:
+    """Return {index: cached_result} untuk akun yang hasilnya masih fresh (hanya `indexes` kalau diisi)"""
+    if not ttl_minutes or ttl_minutes <= 0:
+        return {}
+    if indexes is None:
+        indexes = range(len(accounts))
+    fingerprints = {i: account_fingerprint(accounts[i]) for i in indexes}
+    try:
+        cached = get_cached_results(set(fingerprints.values()), ttl_minutes * 60)
+    except Exception as e:
+        print(f"⚠️ Result cache read error: {e}")
+        return {}
+    now = time.time()
+    fresh = {}
+    for i, fingerprint in fingerprints.items():
+        if fingerprint not in cached:
+            continue
+        account = accounts[i]
+        result, tested_at = cached[fingerprint]
+        result.update({
+            "index": i,
+            "OriginalTag": account.get("tag", "proxy"),
+            "VpnType": account.get("type", "N/A"),
+            "OriginalAccount": account,
+            "Cached": True,
+            "CachedAgeMinutes": round((now - tested_at) / 60, 1),
+        })
+        fresh[i] = result
+    return fresh
+
+def _is_storable(result: dict) -> bool:
+    if result.get("Cached") or result.get("Status") not in FINAL_STATUSES:
+        return False
+    return result.get("TestType") != "Deadline" and not result.get("NegativeCache")
+
+def _save(to_save: dict):
+    try:
+        save_cached_results(to_save)
+    except Exception as e:
+        print(f"⚠️ Result cache write error: {e}")
+
+def store_results(accounts: list, results: list):
+    """
+    Simpan hasil final (✅ / Dead / ❌) ke cache; hasil yang berasal dari cache tidak disimpan ulang,
+    begitu juga ❌ karena deadline budget (akunnya belum benar-benar dites) dan Dead dari
+    negative cache (masa berlakunya diatur negative cache sendiri).
+    """
+    _save({
+        account_fingerprint(accounts[result["index"]]): {
+            k: v for k, v in result.items() if k not in UNCACHED_FIELDS
+        }
+        for result in results if _is_storable(result)
+    })
+
+def update_cached_results(results: list):
+    """Simpan ulang hasil yang diperkaya setelah run (mis. real geolocation), kunci dari OriginalAccount"""
+    _save({
+        account_fingerprint(result["OriginalAccount"]): {
+            k: v for k, v in result.items() if k not in UNCACHED_FIELDS
+        }
+        for result in results if _is_storable(result) and result.get("OriginalAccount")
+    })
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Retry Policy - kapan percobaan koneksi diulang, dan berapa lama menunggu
+Error definitif (refused, unreachable, DNS) langsung gagal; error transien (timeout, TLS)
+diulang dengan exponential backoff + jitter
+"""
+
+import random
+
+# Alasan gagal per error_kind (lihat utils.classify_connect_error)
+FAIL_REASONS = {
+    "refused": "Connection refused",
+    "unreachable": "Network unreachable",
+    "dns": "DNS resolution failed",
+    "timeout": "Connection timeout",
+    "tls": "TLS handshake failed",
+    "error": "Connection error",
+}
+
+DEFINITIVE_ERRORS = ("refused", "unreachable", "dns")
+
+class RetryPolicy:
+    """
+    max_attempts: total percobaan per akun (termasuk yang pertama)
+    base_delay/max_delay: backoff ke-n = min(max_delay, base_delay * 2^n), lalu dikurangi jitter acak
+    fail_fast: error_kind yang langsung dianggap mati tanpa retry
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=4.0, jitter=0.5,
+                 fail_fast=DEFINITIVE_ERRORS):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.jitter = min(1.0, max(0.0, float(jitter)))
+        self.fail_fast = tuple(fail_fast)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Policy dari dict setting (key yang tidak dikenal diabaikan)"""
+        keys = ("max_attempts", "base_delay", "max_delay", "jitter", "fail_fast")
+        if not isinstance(data, dict):
+            data = {}
+        return cls(**{k: v for k, v in data.items() if k in keys})
+
+    def for_budget(self, budget):
+        """Salinan policy yang muat di rencana RunBudget (jumlah percobaan & jeda maksimum)"""
+        return RetryPolicy(
+            max_attempts=min(self.max_attempts, budget.max_retries),
+            base_delay=min(self.base_delay, budget.retry_delay),
+            max_delay=min(self.max_delay, budget.retry_delay),
+            jitter=self.jitter,
+            fail_fast=self.fail_fast,
+        )
+
+    def should_retry(self, error_kind, attempt):
+        """attempt: index percobaan yang barusan gagal (0-based)"""
+        if error_kind in self.fail_fast:
+            return False
+        return attempt + 1 < self.max_attempts
+
+    def delay(self, attempt):
+        """Jeda sebelum percobaan berikutnya setelah percobaan ke-attempt gagal"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * (1 - self.jitter * random.random())
+
+    def to_dict(self):
+        return {
+            "max_attempts": self.max_attempts,
+            "base_delay": self.base_delay,
+            "max_delay": self.max_delay,
+            "jitter": self.jitter,
+            "fail_fast": list(self.fail_fast),
+        }
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+def fail_reason(error_kind):
+    return FAIL_REASONS.get(error_kind or "error", FAIL_REASONS["error"])
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Speed Test - benchmark throughput (download/upload) untuk akun yang lolos test liveness
+Payload di-push/pull lewat inbound HTTP lokal xray milik akun; threshold dari speedtest_config.json
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from proxy_http import ProxyHTTPClient
+from xray_pool import get_xray_pool
+from database import save_speedtest_history
+from result_cache import account_fingerprint
+
+SPEEDTEST_CONFIG_FILE = "speedtest_config.json"
+
+DEFAULT_SPEEDTEST_CONFIG = {
+    "alert_download_threshold": 10.0,  # Mbps
+    "alert_upload_threshold": 5.0,  # Mbps
+    "alert_ping_threshold": 100.0,  # ms
+    "save_history": True,
+    # Endpoint harus plain HTTP (ProxyHTTPClient kirim absolute-URI ke proxy, tanpa CONNECT);
+    # bisa diarahkan ke stand-in HTTP lokal. {bytes} di download_url (opsional) diganti download_bytes.
+    "download_url": "http://speedtest.tele2.net/10MB.zip",
+    "upload_url": "http://speedtest.tele2.net/upload.php",
+    "download_bytes": 10_000_000,
+    "upload_bytes": 5_000_000,
+    "timeout_seconds": 30,
+    "concurrency": 2,  # speed test paralel ikut berebut bandwidth lokal; jaga tetap kecil
+}
+
+def load_speedtest_config(path=SPEEDTEST_CONFIG_FILE) -> dict:
+    """Baca speedtest_config.json, key yang tidak ada diisi default"""
+    config = dict(DEFAULT_SPEEDTEST_CONFIG)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                config.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Speedtest config error ({path}): {e}, memakai default")
+    return config
+
+class SpeedTester:
+    """Ukur Mbps download/upload + TTFB lewat proxy HTTP, lalu cek threshold alert"""
+
+    def __init__(self, config=None, geo_tester=None):
+        self.config = config or load_speedtest_config()
+        self._geo_tester = geo_tester
+
+    def _get_geo_tester(self):
+        # Builder config xray ada di RealGeolocationTester; import lambat supaya modul ini ringan
+        if self._geo_tester is None:
+            from real_geolocation_tester import RealGeolocationTester
+            self._geo_tester = RealGeolocationTester()
+        return self._geo_tester
+
+    def measure_through_proxy(self, proxy_url) -> dict:
+        """Download lalu upload payload lewat proxy_url (proxy HTTP apa pun, mis. stand-in lokal)"""
+        download_url = self.config["download_url"].format(bytes=int(self.config["download_bytes"]))
+        with ProxyHTTPClient.from_url(proxy_url, timeout=self.config["timeout_seconds"]) as client:
+            download = client.measure_download(download_url)
+            upload = client.measure_upload(self.config["upload_url"], self.config["upload_bytes"])
+        return {
+            "download_mbps": download["mbps"],
+            "upload_mbps": upload["mbps"],
+            "ttfb_ms": download["ttfb"],
+        }
+
+    def test_account(self, account) -> dict:
+        """Speed test satu akun lewat xray worker dari pool; return dict hasil atau {'error': ...}"""
+        pool = get_xray_pool()
+        if not pool.is_available():
+            return {"error": "Xray not available"}
+        geo_tester = self._get_geo_tester()
+        try:
+            with pool.worker(lambda port: geo_tester.create_xray_config(account, port)) as worker:
+                if worker is None:
+                    return {"error": "Config creation failed"}
+                return self.measure_through_proxy(worker.proxy_url)
+        except Exception as e:
+            return {"error": str(e)}
+
+    def check_alerts(self, speed, latency) -> list:
+        """Daftar alasan akun di bawah threshold (kosong = lolos)"""
+        alerts = []
+        if speed.get("download_mbps", 0) < self.config["alert_download_threshold"]:
+            alerts.append(f"download < {self.config['alert_download_threshold']} Mbps")
+        if speed.get("upload_mbps", 0) < self.config["alert_upload_threshold"]:
+            alerts.append(f"upload < {self.config['alert_upload_threshold']} Mbps")
+        if isinstance(latency, (int, float)) and latency > self.config["alert_ping_threshold"]:
+            alerts.append(f"ping > {self.config['alert_ping_threshold']} ms")
+        return alerts
+
+async def run_speed_tests(results: list, config=None, live_results=None) -> dict:
+    """
+    Speed test semua hasil ✅ (in-place): tambah field Download/Upload (Mbps), Speed TTFB dan
+    Speed Alert. Concurrency dibatasi config["concurrency"]. Return ringkasan untuk session.
+    """
+    tester = SpeedTester(config)
+    targets = [res for res in results if res.get("Status") == "✅" and res.get("OriginalAccount")]
+    if not targets:
+        return {"tested": 0, "alerts": 0, "failed": 0}
+
+    print(f"🚀 Speed test: {len(targets)} accounts, {tester.config['concurrency']} at a time")
+    loop = asyncio.get_running_loop()
+    history = []
+    summary = {"tested": 0, "alerts": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=max(1, int(tester.config["concurrency"])),
+                            thread_name_prefix="speedtest") as executor:
+        async def run_one(res):
+            speed = await loop.run_in_executor(executor, tester.test_account, res["OriginalAccount"])
+            if "error" in speed:
+                summary["failed"] += 1
+                res.update({"Download": -1, "Upload": -1, "Speed Error": speed["error"]})
+            else:
+                alerts = tester.check_alerts(speed, res.get("Latency"))
+                summary["tested"] += 1
+                summary["alerts"] += bool(alerts)
+                res.update({
+                    "Download": speed["download_mbps"],
+                    "Upload": speed["upload_mbps"],
+                    "Speed TTFB": speed["ttfb_ms"],
+                    "Speed Alert": alerts,
+                })
+                history.append((account_fingerprint(res["OriginalAccount"]), res.get("OriginalTag"),
+                                {**speed, "latency": res.get("Latency"), "alerts": alerts}))
+            if live_results is not None:
+                live_results[res["index"]].update(res)
+
+        await asyncio.gather(*(run_one(res) for res in targets))
+
+    if tester.config.get("save_history") and history:
+        try:
+            save_speedtest_history(history)
+        except Exception as e:
+            print(f"⚠️ Speedtest history write error: {e}")
+    print(f"🚀 Speed test done: {summary['tested']} measured, {summary['alerts']} below threshold, {summary['failed']} failed")
+    return summary
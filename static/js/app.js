@@ -825,7 +825,10 @@ function handleTestingComplete(data) {
     
     updateStatus(`Testing complete: ${data.successful}/${data.total} successful`, 'success');
     
-    showToast('Testing Complete', `${data.successful} out of ${data.total} accounts passed`, 'success');
+    const concurrencyInfo = data.concurrency
+        ? ` (concurrency ${data.concurrency.min}-${data.concurrency.max}, final ${data.concurrency.final})`
+        : '';
+    showToast('Testing Complete', `${data.successful} out of ${data.total} accounts passed${concurrencyInfo}`, 'success');
     
     testResults = data.results;
     
@@ -1012,7 +1015,11 @@ function createTestingRowHtml(result, displayOrder, isActive = false) {
     const jitterText = formatLatency(safeResult.Jitter);
     
     // USER REQUEST: Animated status dot
-    const statusHtml = createAnimatedStatus(safeResult.Status, isActive);
+    let statusHtml = createAnimatedStatus(safeResult.Status, isActive);
+    if (result.Cached) {
+        const age = result.CachedAgeMinutes !== undefined ? ` (${result.CachedAgeMinutes} min old)` : '';
+        statusHtml += `<span class="cached-badge" title="Cached result${age}">⚡</span>`;
+    }
     
     return `
         <td class="order-cell">${displayOrder}</td>
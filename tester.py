@@ -1,11 +1,28 @@
 import asyncio
-import socket
 import re
-from utils import is_alive, geoip_lookup, get_network_stats
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import probe_tcp, probe_tls, probe_websocket, geoip_lookup_async, get_network_stats_async
 from converter import extract_ip_port_from_path
+from dns_resolver import get_resolver
+from retry_policy import DEFAULT_RETRY_POLICY, fail_reason
+from negative_cache import get_negative_cache
+from geoip_client import PRIORITY_FINAL
+from result_cache import account_fingerprint, update_cached_results
 
-MAX_RETRIES = 3
-RETRY_DELAY = 1.5  # detik
+CONNECT_TIMEOUT = 5  # detik, per percobaan TCP
+GEO_THREADS = 64  # thread untuk real geolocation (batch xray butuh banyak akun menunggu bersamaan)
+
+_geo_executor = ThreadPoolExecutor(max_workers=GEO_THREADS, thread_name_prefix="real-geo")
+
+# GeoStatus hasil ✅: real geolocation (xray/proxy) dikerjakan belakangan lewat enrich_geolocation
+GEO_PENDING = "pending"
+GEO_DONE = "done"
+GEO_FAILED = "failed"
+GEO_SKIPPED = "skipped"  # budget habis sebelum sempat
+
+_real_geo_memo = {}  # fingerprint akun → hasil get_real_geolocation (None = gagal)
+_real_geo_lock = threading.Lock()
 
 def get_first_nonempty(*args):
     for x in args:
@@ -13,14 +30,8 @@ def get_first_nonempty(*args):
             return x
     return None
 
-def get_test_target(account):
-    # 1. Coba IP dari path (support SS dan WS path untuk semua protokol)
-    path_str = account.get("_ss_path") or account.get("_ws_path") or ""
-    target_ip, target_port = extract_ip_port_from_path(path_str)
-    if target_ip:
-        return target_ip, target_port or 443, "path"
-
-    # 2. Fallback ke host/sni/server_name/server
+def _get_target_candidates(account):
+    """Kandidat (label, value) dari host/sni/server, tanpa duplikat."""
     # Ambil host dari WebSocket headers
     host = None
     if "host" in account:
@@ -42,24 +53,233 @@ def get_test_target(account):
         candidates.append(("sni", sni))
     if server:
         candidates.append(("server", server))
+    return candidates
+
+def get_tls_server_name(account):
+    """
+    SNI untuk probe TLS kalau akun memakai TLS (tls.enabled, atau plugin shadowsocks dengan opsi tls).
+    Return None kalau akun tanpa TLS.
+    """
+    tls = account.get("tls")
+    if isinstance(tls, dict):
+        if not tls.get("enabled"):
+            return None
+        return tls.get("server_name") or tls.get("sni") or account.get("server")
+    plugin_opts = account.get("plugin_opts") or ""
+    if account.get("type") == "shadowsocks" and "tls" in plugin_opts.split(";"):
+        m = re.search(r'host=([^;]+)', plugin_opts)
+        return m.group(1) if m else account.get("server")
+    return None
+
+def get_probe_identity(account, test_source):
+    """
+    Bagian probe selain (ip, port) yang menentukan hasilnya: akun dengan identitas berbeda
+    (mis. SNI lain di IP CDN yang sama, atau path/Host ws lain) harus di-probe sendiri,
+    bukan berbagi hasil. Target dari path juga membawa server front untuk Upgrade ws.
+    """
+    ws = get_ws_settings(account)
+    tls_server_name = get_tls_server_name(account) if test_source != "path" else None
+    front = None
+    if ws and test_source == "path":
+        front = (account.get("server"), account.get("server_port", 443), get_tls_server_name(account))
+    return (_probe_label(account, tls_server_name), ws, tls_server_name, front)
 
+def get_ws_settings(account):
+    """
+    (path, host) WebSocket akun kalau transport-nya ws (vless/trojan/vmess, atau shadowsocks
+    dengan plugin mode=websocket). Return None kalau bukan ws.
+    """
+    transport = account.get("transport")
+    if isinstance(transport, dict) and transport.get("type") == "ws":
+        headers = transport.get("headers") if isinstance(transport.get("headers"), dict) else {}
+        host = headers.get("Host") or account.get("_ws_host") or account.get("server")
+        return transport.get("path") or account.get("_ws_path") or "/", host
+    plugin_opts = account.get("plugin_opts") or ""
+    if account.get("type") == "shadowsocks" and "mode=websocket" in plugin_opts:
+        m = re.search(r'host=([^;]+)', plugin_opts)
+        host = account.get("_ss_ws_host") or (m.group(1) if m else account.get("server"))
+        return account.get("_ss_path") or "/", host
+    return None
+
+async def get_test_target_async(account):
+    """
+    Target probe (ip, port, source): IP dari path dulu, lalu host/sni/server sesuai urutan.
+    Semua kandidat di-resolve bersamaan lewat resolver bersama (cache TTL + negative cache).
+    """
+    path_str = account.get("_ss_path") or account.get("_ws_path") or ""
+    target_ip, target_port = extract_ip_port_from_path(path_str)
+    if target_ip:
+        return target_ip, target_port or 443, "path"
+
+    candidates = _get_target_candidates(account)
+    resolved = await get_resolver().resolve_many([cand for _, cand in candidates])
     for label, cand in candidates:
-        # Cek apakah cand adalah IP, kalau ya langsung
-        try:
-            socket.inet_aton(cand)
-            return cand, account.get("server_port", 443), label
-        except Exception:
-            pass
-        # Kalau bukan IP, resolve ke IP
-        try:
-            resolved_ip = socket.gethostbyname(cand)
-            return resolved_ip, account.get("server_port", 443), label
-        except Exception:
-            continue
-    # Jika tidak ada yang bisa, return None
+        if resolved.get(cand):
+            return resolved[cand], account.get("server_port", 443), label
     return None, None, None
 
-async def test_account(account: dict, semaphore: asyncio.Semaphore, index: int, live_results=None) -> dict:
+def _probe_label(account, tls_server_name):
+    if get_ws_settings(account):
+        return "WS"
+    return "TLS" if tls_server_name else "TCP"
+
+def _tls_fields(probe):
+    fields = {
+        "TCP Connect": probe["tcp_ms"],
+        "TLS Handshake": probe["tls_ms"],
+        "Cert Valid": "✔" if probe["cert_valid"] else "✖",
+    }
+    if probe["cert_error"]:
+        fields["Cert Error"] = probe["cert_error"]
+    return fields
+
+async def _connection_probe(account, test_ip, test_port, test_source, tls_server_name, timeout):
+    """
+    Satu percobaan koneksi ke target akun.
+    Return (ok, latency_ms, error_kind, extra_fields); extra_fields berisi timing TLS/WS.
+    - ws, target bukan dari path: satu koneksi TCP+TLS+Upgrade ke target
+    - ws, target dari path: TCP ke IP backend, lalu Upgrade lewat server akun (CDN front)
+    - TLS saja: handshake dengan SNI; selain itu TCP connect
+    """
+    ws = get_ws_settings(account)
+    if ws and test_source != "path":
+        path, host = ws
+        probe = await probe_websocket(test_ip, test_port, path, host, tls_server_name, timeout=timeout)
+        fields = _tls_fields(probe) if tls_server_name else {"TCP Connect": probe["tcp_ms"]}
+        fields.update({"WS Upgrade": probe["upgrade_ms"], "WS Status": probe["status"]})
+        return probe["ok"], probe["tcp_ms"], probe["error_kind"], fields
+
+    if tls_server_name:
+        probe = await probe_tls(test_ip, test_port, tls_server_name, timeout=timeout)
+        ok, latency, error_kind, fields = probe["ok"], probe["tcp_ms"], probe["error_kind"], _tls_fields(probe)
+    else:
+        ok, latency, error_kind = await probe_tcp(test_ip, test_port, timeout=timeout)
+        fields = {}
+    if not ok or not ws:
+        return ok, latency, error_kind, fields
+
+    path, host = ws
+    front_ip = await get_resolver().resolve(account.get("server"))
+    if not front_ip:
+        return False, latency, "dns", fields
+    front_tls = get_tls_server_name(account)
+    probe = await probe_websocket(front_ip, account.get("server_port", 443), path, host, front_tls, timeout=timeout)
+    fields.update({"WS Upgrade": probe["upgrade_ms"], "WS Status": probe["status"]})
+    return probe["ok"], latency, probe["error_kind"], fields
+
+def _record_attempt(limiter, ok, error_kind=""):
+    """Feedback ke AdaptiveLimiter (no-op kalau yang dipakai asyncio.Semaphore biasa)"""
+    record = getattr(limiter, "record", None)
+    if record:
+        record(ok, error_kind)
+
+def _real_geolocation(account, cancelled=None):
+    """
+    get_real_geolocation (user's proven method) dengan memo per fingerprint akun; jalan di thread.
+    cancelled: threading.Event; kalau di-set (timeout budget) hasilnya tidak di-memo.
+    """
+    fingerprint = account_fingerprint(account)
+    with _real_geo_lock:
+        if fingerprint in _real_geo_memo:
+            return _real_geo_memo[fingerprint]
+    from real_geolocation_tester import get_real_geolocation
+    try:
+        real_geo = get_real_geolocation(account, cancelled)
+    except Exception as e:
+        print(f"⚠️  Real geolocation error: {e}")
+        real_geo = None
+    if cancelled is not None and cancelled.is_set():
+        return None
+    with _real_geo_lock:
+        _real_geo_memo[fingerprint] = real_geo
+    return real_geo
+
+def _apply_real_geolocation(result, real_geo):
+    if real_geo:
+        # Update dengan real location data
+        result.update(real_geo)
+        result["GeoStatus"] = GEO_DONE
+        print(f"✅ Real geolocation: {real_geo['Country']} - {real_geo['Provider']}")
+    else:
+        result["GeoStatus"] = GEO_FAILED
+        print("⚠️  Real geolocation failed, using basic lookup")
+
+def _pending_geolocation(results):
+    pending = [res for res in results if res.get("GeoStatus") == GEO_PENDING and res.get("OriginalAccount")]
+    if not pending:
+        return []
+    try:
+        import real_geolocation_tester  # noqa: F401
+    except ImportError:
+        print("⚠️  Real geolocation tester not available, using basic lookup")
+        for res in pending:
+            res["GeoStatus"] = GEO_FAILED
+        return []
+    return pending
+
+async def enrich_geolocation(results, budget=None, live_results=None) -> int:
+    """
+    Real geolocation lazy: hanya untuk hasil GeoStatus "pending" yang diberikan (akun yang akan
+    masuk config final), jalan paralel di thread pool dan di-memo per akun.
+    budget: kalau sisa waktunya tidak cukup (atau habis di tengah jalan), sisanya jadi "skipped"
+    dan job yang masih jalan tidak memulai xray/fallback baru.
+    Return jumlah akun yang diproses.
+    """
+    pending = _pending_geolocation(results)
+    if not pending:
+        return 0
+    if budget and not budget.allow_slow_stage():
+        for res in pending:
+            res["GeoStatus"] = GEO_SKIPPED
+        print(f"⏱️ Real geolocation skipped for {len(pending)} accounts (budget)")
+        return 0
+
+    print(f"🌍 Real geolocation: {len(pending)} accounts")
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+
+    async def run_one(res):
+        real_geo = await loop.run_in_executor(_geo_executor, _real_geolocation, res["OriginalAccount"], cancelled)
+        _apply_real_geolocation(res, real_geo)
+        if live_results is not None and "index" in res:
+            live_results[res["index"]].update(res)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*(run_one(res) for res in pending)),
+                               timeout=budget.remaining() if budget else None)
+    except asyncio.TimeoutError:
+        # Job yang belum mulai ikut batal bersama coroutine-nya; yang sedang jalan berhenti
+        # sebelum tahap berikutnya (xray batch / fallback) lewat event ini
+        cancelled.set()
+        for res in pending:
+            if res.get("GeoStatus") == GEO_PENDING:
+                res["GeoStatus"] = GEO_SKIPPED
+    update_cached_results(pending)
+    return len(pending)
+
+def enrich_geolocation_sync(results) -> int:
+    """Versi blocking enrich_geolocation (tanpa budget) untuk kode sync, mis. build_final_accounts"""
+    pending = _pending_geolocation(results)
+    if not pending:
+        return 0
+    print(f"🌍 Real geolocation: {len(pending)} accounts")
+    for res, real_geo in zip(pending, _geo_executor.map(_real_geolocation, [res["OriginalAccount"] for res in pending])):
+        _apply_real_geolocation(res, real_geo)
+    update_cached_results(pending)
+    return len(pending)
+
+async def test_account(account: dict, semaphore: asyncio.Semaphore, index: int, live_results=None,
+                       budget=None, retry_policy=None) -> dict:
+    """
+    Test satu akun (TCP/TLS/WS → geo → real geolocation).
+    Akun TLS di-probe dengan handshake (SNI akun), bukan cuma TCP connect; target dari path
+    (IP backend) tetap TCP saja karena SNI-nya milik CDN. Akun ws juga dicek Upgrade ke path +
+    Host-nya lewat server akun (jawaban selain 101 = path/backend salah, langsung ❌).
+    budget: RunBudget opsional; timeout/retry ikut rencana budget dan real geolocation
+    dilewati kalau sisa waktunya tidak cukup.
+    retry_policy: RetryPolicy (default DEFAULT_RETRY_POLICY). Refused/unreachable/DNS langsung
+    Dead; timeout/TLS diulang dengan backoff. Alasan gagal ada di ErrorKind/FailReason.
+    """
     tag = account.get('tag', 'proxy')
     vpn_type = account.get('type', 'N/A')
     print(f"🔍 DEBUG: test_account called for account {index}: {vpn_type} - {tag}")
@@ -72,18 +292,46 @@ async def test_account(account: dict, semaphore: asyncio.Semaphore, index: int,
 
     async with semaphore:
         # === LOGIKA BARU ===
-        test_ip, test_port, test_source = get_test_target(account)
+        test_ip, test_port, test_source = await get_test_target_async(account)
         if not test_ip:
-            result['Status'] = '❌'
+            result.update({'Status': '❌', 'ErrorKind': 'dns', 'FailReason': fail_reason('dns')})
             return result
 
-        # USER REQUEST: Retry timeout 3x, then mark as dead
-        timeout_retries = 3
-        for attempt in range(MAX_RETRIES):
+        # Endpoint yang baru saja mati (refused/unreachable, atau tls/timeout untuk SNI yang sama)
+        # tidak di-probe + retry ulang
+        tls_server_name = get_tls_server_name(account) if test_source != "path" else None
+        negative = get_negative_cache().check_endpoint(test_ip, test_port, tls_server_name)
+        if negative:
+            result.update({
+                "Status": "Dead",
+                "Latency": "Dead",
+                "TestType": "Dead Connection",
+                "ICMP": "Dead",
+                "Tested IP": test_ip,
+                "ErrorKind": negative["kind"],
+                "FailReason": f"{fail_reason(negative['kind'])} (negative cache, {negative['expires_in']}s left)",
+                "NegativeCache": True,
+            })
+            print(f"💀 Account {index+1} skipped: {test_ip}:{test_port} in negative cache ({negative['kind']})")
+            if live_results is not None:
+                live_results[index].update(result)
+            return result
+
+        policy = retry_policy or DEFAULT_RETRY_POLICY
+        if budget:
+            policy = policy.for_budget(budget)
+        max_retries = policy.max_attempts
+        connect_timeout = budget.connect_timeout if budget else CONNECT_TIMEOUT
+
+        # USER REQUEST: Retry timeout 3x, then mark as dead (error definitif langsung dead)
+        timeout_retries = max_retries
+        error_kind = ""
+        for attempt in range(max_retries):
             # Update status based on retry type
             if result['TimeoutCount'] > 0:
-                result['Status'] = f'Timeout Retry {result["TimeoutCount"]}/3'
-                print(f"🔄 DEBUG: Account {index} retrying timeout {result['TimeoutCount']}/3")
+                retry_label = 'Timeout Retry' if error_kind == 'timeout' else 'Retry'
+                result['Status'] = f'{retry_label} {result["TimeoutCount"]}/{timeout_retries}'
+                print(f"🔄 DEBUG: Account {index} retrying {error_kind} {result['TimeoutCount']}/{timeout_retries}")
             else:
                 result['Status'] = '🔄'
                 print(f"🔄 DEBUG: Account {index} testing (attempt {attempt + 1})")
@@ -95,32 +343,42 @@ async def test_account(account: dict, semaphore: asyncio.Semaphore, index: int,
                 print(f"📊 DEBUG: Updated live_results for account {index} with status: {result['Status']}")
                 await asyncio.sleep(0.1)  # Small delay to allow emission
 
-            is_conn, latency = is_alive(test_ip, test_port, timeout=5)  # 5s timeout for better detection
+            timeout = budget.clip(connect_timeout) if budget else connect_timeout
+            is_conn, latency, error_kind, tls_info = await _connection_probe(
+                account, test_ip, test_port, test_source, tls_server_name, timeout)
+            _record_attempt(semaphore, is_conn, error_kind)
+            
+            ws_status = tls_info.get("WS Status")
+            if not is_conn and ws_status:
+                # Server menjawab tapi menolak Upgrade: path/Host salah atau backend mati, retry percuma
+                result.update({
+                    "Status": "❌",
+                    "TestType": "WS Upgrade",
+                    "Tested IP": test_ip,
+                    "ErrorKind": "ws",
+                    "FailReason": f"WebSocket upgrade rejected (HTTP {ws_status})",
+                    **tls_info
+                })
+                print(f"❌ Account {index+1} WebSocket upgrade rejected (HTTP {ws_status})")
+                if live_results is not None:
+                    live_results[index].update(result)
+                return result
             
             if is_conn:
-                geo_info = geoip_lookup(test_ip)
+                geo_info = await geoip_lookup_async(test_ip, priority=PRIORITY_FINAL)
                 result.update({
                     "Status": "✅",
-                    "TestType": f"{test_source.upper()} TCP",
+                    "TestType": f"{test_source.upper()} {_probe_label(account, tls_server_name)}",
                     "Tested IP": test_ip,
                     "Latency": latency,
                     "Jitter": 0,
                     "ICMP": "✔",
+                    **tls_info,
                     **geo_info
                 })
-                
-                # Enhance dengan real geolocation tester (user's proven method)
-                try:
-                    from real_geolocation_tester import get_real_geolocation
-                    real_geo = get_real_geolocation(account)
-                    if real_geo:
-                        # Update dengan real location data
-                        result.update(real_geo)
-                        print(f"✅ Real geolocation: {real_geo['Country']} - {real_geo['Provider']}")
-                    else:
-                        print("⚠️  Real geolocation failed, using basic lookup")
-                except ImportError:
-                    print("⚠️  Real geolocation tester not available, using basic lookup")
+                # Real geolocation (xray/proxy) tidak di sini: ditunda ke enrich_geolocation, hanya
+                # untuk akun yang akhirnya dipakai, supaya slot semaphore cepat lepas
+                result["GeoStatus"] = GEO_PENDING
                 
                 # USER REQUEST: Progressive updates - update live_results with success status
                 if live_results is not None:
@@ -128,42 +386,46 @@ async def test_account(account: dict, semaphore: asyncio.Semaphore, index: int,
                     print(f"✅ DEBUG: Account {index} completed successfully with status: {result['Status']}")
                 return result
             else:
-                # Connection failed - could be timeout or other error
+                # Connection failed - timeout, refused, unreachable, TLS, ...
                 result['TimeoutCount'] += 1
-                print(f"⚠️ Account {index+1} timeout {result['TimeoutCount']}/3 (attempt {attempt+1})")
+                result.update({"ErrorKind": error_kind or "error", "FailReason": fail_reason(error_kind)})
+                print(f"⚠️ Account {index+1} {error_kind or 'error'} {result['TimeoutCount']}/{timeout_retries} (attempt {attempt+1})")
 
             # USER REQUEST: After 3 timeouts, mark as dead and stop retrying
-            if result['TimeoutCount'] >= timeout_retries:
+            if not policy.should_retry(error_kind, attempt):
+                # Timeout dengan timeout yang dipotong budget bukan bukti endpoint mati: jangan disimpan
+                if error_kind != "timeout" or timeout >= CONNECT_TIMEOUT:
+                    get_negative_cache().add_endpoint(test_ip, test_port, error_kind, result["FailReason"],
+                                                      sni=tls_server_name)
                 result.update({
                     "Status": "Dead",
                     "Latency": "Dead", 
                     "TestType": "Dead Connection",
                     "ICMP": "Dead"
                 })
-                print(f"💀 Account {index+1} marked as DEAD after {timeout_retries} timeouts")
+                print(f"💀 Account {index+1} marked as DEAD after {result['TimeoutCount']} attempts ({result['FailReason']})")
                 if live_results is not None:
                     live_results[index].update(result)
                     print(f"💀 DEBUG: Account {index} marked as DEAD with status: {result['Status']}")
                 return result
 
-            if attempt < MAX_RETRIES - 1:
-                result['Status'] = '🔁'
-                if live_results is not None:
-                    live_results[index].update(result)
-                    await asyncio.sleep(0)
-                await asyncio.sleep(RETRY_DELAY)
+            result['Status'] = '🔁'
+            if live_results is not None:
+                live_results[index].update(result)
+                await asyncio.sleep(0)
+            await asyncio.sleep(policy.delay(attempt))
 
         # Fallback ping jika TCP gagal semua
-        for attempt in range(MAX_RETRIES):
+        for attempt in range(max_retries):
             result['Status'] = '🔄'
             result['Retry'] = attempt
             if live_results is not None:
                 live_results[index].update(result)
                 await asyncio.sleep(0)  # yield to event loop
 
-            stats = get_network_stats(test_ip)
+            stats = await get_network_stats_async(test_ip)
             if stats.get("Latency") != -1:
-                geo_info = geoip_lookup(test_ip)
+                geo_info = await geoip_lookup_async(test_ip, priority=PRIORITY_FINAL)
                 result.update({
                     "Status": "✅",
                     "TestType": f"{test_source.upper()} Ping",
@@ -171,36 +433,24 @@ async def test_account(account: dict, semaphore: asyncio.Semaphore, index: int,
                     **stats,
                     **geo_info
                 })
-                
-                # Enhance dengan real geolocation tester (user's proven method)
-                try:
-                    from real_geolocation_tester import get_real_geolocation
-                    real_geo = get_real_geolocation(account)
-                    if real_geo:
-                        # Update dengan real location data
-                        result.update(real_geo)
-                        print(f"✅ Real geolocation: {real_geo['Country']} - {real_geo['Provider']}")
-                    else:
-                        print("⚠️  Real geolocation failed, using basic lookup")
-                except ImportError:
-                    print("⚠️  Real geolocation tester not available, using basic lookup")
+                result["GeoStatus"] = GEO_PENDING
                 
                 # Update live_results
                 if live_results is not None:
                     live_results[index].update(result)
                 return result
 
-            if attempt < MAX_RETRIES - 1:
+            if attempt < max_retries - 1:
                 result['Status'] = '🔁'
                 result['Retry'] = attempt+1
                 if live_results is not None:
                     live_results[index].update(result)
                     await asyncio.sleep(0)
-                await asyncio.sleep(RETRY_DELAY)
+                await asyncio.sleep(policy.delay(attempt))
 
         # Semua cara sudah dicoba, masih gagal
         result['Status'] = '❌'
-        result['Retry'] = MAX_RETRIES
+        result['Retry'] = max_retries
     # Update live_results for failed case
     if live_results is not None:
         live_results[index].update(result)
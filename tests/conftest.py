@@ -0,0 +1,12 @@
+"""
+Modul repo ini flat (tanpa package), jadi root repo dimasukkan ke sys.path.
+database.py membuat vortexvpn.db di working directory saat di-import: test jalan di direktori
+sementara supaya DB asli tidak tersentuh.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="vortexvpn-tests-"))
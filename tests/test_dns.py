@@ -0,0 +1,151 @@
+"""DNSClient & AsyncResolver terhadap stub DNS UDP di loopback"""
+
+import asyncio
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from dns_client import DNSClient, QTYPES, RCODE_NXDOMAIN
+from dns_resolver import AsyncResolver, MIN_TTL
+
+RECORDS = {
+    ("one.test", QTYPES["A"]): [("10.0.0.1", 120)],
+    ("two.test", QTYPES["A"]): [("10.0.0.2", 300), ("10.0.0.3", 60)],
+    ("two.test", QTYPES["AAAA"]): [("2001:db8::2", 90)],
+    ("cdn.test", QTYPES["A"]): [("10.0.0.9", 0)],
+    ("slow.test", QTYPES["A"]): [("10.0.0.5", 120)],
+}
+NXDOMAIN = {"missing.test"}
+SILENT = {"silent.test"}  # tidak pernah dijawab → timeout
+SLOW = {"slow.test": 0.3}  # detik sebelum dijawab
+
+def _parse_question(data):
+    offset, labels = 12, []
+    while data[offset]:
+        length = data[offset]
+        labels.append(data[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+    qtype, _ = struct.unpack_from("!HH", data, offset + 1)
+    return ".".join(labels), qtype, data[12:offset + 5]
+
+def _build_answer(query):
+    qid = struct.unpack_from("!H", query, 0)[0]
+    name, qtype, question = _parse_question(query)
+    records = RECORDS.get((name, qtype), [])
+    rcode = RCODE_NXDOMAIN if name in NXDOMAIN else 0
+    packet = struct.pack("!HHHHHH", qid, 0x8180 | rcode, 1, len(records), 0, 0) + question
+    for ip, ttl in records:
+        family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+        rdata = socket.inet_pton(family, ip)
+        packet += struct.pack("!HHHIH", 0xC00C, qtype, 1, ttl, len(rdata)) + rdata
+    return name, packet
+
+class StubDNSServer:
+    """Server DNS UDP minimal: jawab dari RECORDS, catat nama yang di-query"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.queries = []
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            name, answer = _build_answer(data)
+            self.queries.append(name)
+            if name in SILENT:
+                continue
+            threading.Timer(SLOW.get(name, 0), self._reply, (answer, addr)).start()
+
+    def _reply(self, answer, addr):
+        try:
+            self.sock.sendto(answer, addr)
+        except OSError:
+            pass
+
+    def close(self):
+        self.sock.close()
+
+@pytest.fixture
+def stub():
+    server = StubDNSServer()
+    yield server
+    server.close()
+
+@pytest.fixture
+def client(stub):
+    return DNSClient(servers=["127.0.0.1"], timeout=1.0, port=stub.port)
+
+def test_resolve_merges_record_types_with_min_ttl(client):
+    ips, ttl = asyncio.run(client.resolve("two.test"))
+    assert ips == ["10.0.0.2", "10.0.0.3", "2001:db8::2"]
+    assert ttl == 60
+
+def test_resolve_dedupes_answers_from_several_servers(stub):
+    client = DNSClient(servers=["127.0.0.1", "127.0.0.1"], timeout=1.0, port=stub.port)
+    ips, ttl = asyncio.run(client.resolve("one.test", ("A",)))
+    assert ips == ["10.0.0.1"]
+    assert ttl == 120
+    assert stub.queries.count("one.test") == 2
+
+def test_lookup_reports_nxdomain(client):
+    assert asyncio.run(client.lookup("missing.test", ("A",))) == ([], None, "nxdomain")
+
+def test_lookup_times_out_per_query(client):
+    started = time.monotonic()
+    ips, ttl, failure = asyncio.run(client.lookup("silent.test", ("A",), timeout=0.2))
+    assert (ips, ttl, failure) == ([], None, "dns")
+    assert time.monotonic() - started < 1.0
+    assert client.stats["timeouts"] == 1
+
+def test_resolver_caches_with_record_ttl(stub, client):
+    resolver = AsyncResolver(dns_client=client)
+
+    async def run():
+        first = await resolver.resolve_all("one.test")
+        second = await resolver.resolve_all("ONE.test.")
+        return first, second
+
+    assert asyncio.run(run()) == (["10.0.0.1"], ["10.0.0.1"])
+    assert stub.queries.count("one.test") == 1
+    assert resolver.stats["hits"] == 1
+    expires_at, _ = resolver._cache["one.test"]
+    assert 110 < expires_at - time.monotonic() <= 120
+
+def test_resolver_floors_zero_ttl(client):
+    resolver = AsyncResolver(dns_client=client)
+    assert asyncio.run(resolver.resolve_all("cdn.test")) == ["10.0.0.9"]
+    expires_at, _ = resolver._cache["cdn.test"]
+    assert MIN_TTL - 5 < expires_at - time.monotonic() <= MIN_TTL
+
+def test_resolver_coalesces_concurrent_lookups(stub, client):
+    resolver = AsyncResolver(dns_client=client)
+
+    async def run():
+        return await asyncio.gather(*(resolver.resolve_all("slow.test") for _ in range(5)))
+
+    assert asyncio.run(run()) == [["10.0.0.5"]] * 5
+    assert stub.queries.count("slow.test") == 1
+    assert resolver.stats["coalesced"] == 4
+
+def test_cancelled_leader_does_not_cancel_waiters(stub, client):
+    resolver = AsyncResolver(dns_client=client)
+
+    async def run():
+        leader = asyncio.ensure_future(resolver.resolve_all("slow.test"))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.ensure_future(resolver.resolve_all("slow.test"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == ["10.0.0.5"]
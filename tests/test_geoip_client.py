@@ -0,0 +1,128 @@
+"""GeoIPClient terhadap stand-in HTTP lokal untuk endpoint /batch ip-api"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from geoip_client import GeoIPClient, MAX_BATCH_ATTEMPTS
+
+class StandInGeoIP:
+    """
+    Server /batch palsu di loopback. `responses` = antrian (status, headers) untuk request
+    berikutnya; kalau kosong jawab 200. Setiap request dicatat (daftar IP yang dikirim).
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                ips = [item["query"] for item in body]
+                stand_in.requests.append(ips)
+                status, headers = stand_in.responses.pop(0) if stand_in.responses else (200, {})
+                payload = json.dumps([{"status": "success", "query": ip, "countryCode": "SG",
+                                       "country": "Singapore", "isp": f"ISP {ip}"} for ip in ips]
+                                     if status == 200 else {"message": "rate limited"}).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stand_in():
+    server = StandInGeoIP()
+    yield server
+    server.close()
+
+def make_client(stand_in, **kwargs):
+    options = {"use_db_cache": False, "use_offline": False, "flush_delay": 0.01, "requests_per_minute": 6000}
+    options.update(kwargs)
+    return GeoIPClient(api_url=stand_in.url, **options)
+
+def test_lookups_are_sent_in_batches_of_batch_size(stand_in):
+    client = make_client(stand_in)
+    ips = [f"10.1.{i // 256}.{i % 256}" for i in range(150)]
+    results = client.lookup_many(ips)
+    assert [len(batch) for batch in stand_in.requests] == [100, 50]
+    assert all(results[ip]["isp"] == f"ISP {ip}" for ip in ips)
+
+def test_concurrent_callers_share_one_batch(stand_in):
+    client = make_client(stand_in, flush_delay=0.2)
+    results = {}
+
+    def lookup(ip):
+        results[ip] = client.lookup(ip)
+
+    threads = [threading.Thread(target=lookup, args=(f"10.2.0.{i}",)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(stand_in.requests) == 1
+    assert all(results[ip]["query"] == ip for ip in results)
+
+def test_answers_are_served_from_sqlite_cache(stand_in):
+    first = make_client(stand_in, use_db_cache=True)
+    assert first.lookup("10.3.0.1")["isp"] == "ISP 10.3.0.1"
+    second = make_client(stand_in, use_db_cache=True)
+    assert second.lookup("10.3.0.1")["isp"] == "ISP 10.3.0.1"
+    assert len(stand_in.requests) == 1
+    assert second.stats["cache_hits"] == 1
+
+def test_rate_limited_batch_is_requeued_not_dropped(stand_in):
+    stand_in.responses = [(429, {"X-Rl": "0", "X-Ttl": "0"})]
+    client = make_client(stand_in)
+    results = client.lookup_many(["10.4.0.1", "10.4.0.2"])
+    assert results["10.4.0.1"]["isp"] == "ISP 10.4.0.1"
+    assert results["10.4.0.2"]["isp"] == "ISP 10.4.0.2"
+    assert len(stand_in.requests) == 2
+    assert client.stats["rate_limited"] == 1
+    assert client.stats["requeued"] == 2
+
+def test_batch_gives_up_after_max_attempts(stand_in):
+    stand_in.responses = [(429, {"X-Ttl": "0"})] * MAX_BATCH_ATTEMPTS
+    client = make_client(stand_in)
+    assert client.lookup("10.5.0.1") is None
+    assert len(stand_in.requests) == MAX_BATCH_ATTEMPTS
+
+def test_429_pauses_for_x_ttl(stand_in):
+    stand_in.responses = [(429, {"X-Rl": "0", "X-Ttl": "1"})]
+    client = make_client(stand_in)
+    started = time.monotonic()
+    assert client.lookup("10.6.0.1")["query"] == "10.6.0.1"
+    assert time.monotonic() - started >= 0.9
+    assert client.stats["bucket_wait_seconds"] >= 0.9
+
+def test_exhausted_x_rl_delays_next_batch_until_x_ttl(stand_in):
+    stand_in.responses = [(200, {"X-Rl": "0", "X-Ttl": "1"})]
+    client = make_client(stand_in)
+    assert client.lookup("10.7.0.1")["query"] == "10.7.0.1"
+    started = time.monotonic()
+    assert client.lookup("10.7.0.2")["query"] == "10.7.0.2"
+    assert time.monotonic() - started >= 0.9
+
+def test_remaining_x_rl_caps_the_bucket(stand_in):
+    stand_in.responses = [(200, {"X-Rl": "3", "X-Ttl": "60"})]
+    client = make_client(stand_in)
+    client.lookup("10.8.0.1")
+    assert client.bucket.tokens <= 3
@@ -0,0 +1,105 @@
+"""LinkScanner di batas chunk dan LinkStream terhadap server HTTP lokal"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import link_stream
+from link_stream import LinkScanner, LinkStream, VPN_LINK_PATTERN
+
+TEXT = (
+    "header line\n"
+    "vless://uuid@a.example:443?security=tls&sni=a.example#A\n"
+    "vmess://eyJhZGQiOiJiLmV4YW1wbGUifQ==\t"
+    "trojan://pass@c.example:443#C ss://YWVzOnB3@d.example:8388#D\r\n"
+    "noise trojan:/ not-a-link vless:// \n"
+    "trojan://tail@e.example:443#E"
+)
+
+def scan(chunks):
+    scanner = LinkScanner()
+    links = []
+    for chunk in chunks:
+        links.extend(scanner.feed(chunk))
+    return links + scanner.close()
+
+def test_single_chunk_matches_findall():
+    assert scan([TEXT]) == VPN_LINK_PATTERN.findall(TEXT)
+
+@pytest.mark.parametrize("cut", range(1, len(TEXT)))
+def test_every_two_chunk_split_matches_findall(cut):
+    assert scan([TEXT[:cut], TEXT[cut:]]) == VPN_LINK_PATTERN.findall(TEXT)
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 9, 10, 64])
+def test_small_fixed_chunks_match_findall(size):
+    chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+    assert scan(chunks) == VPN_LINK_PATTERN.findall(TEXT)
+
+def test_scheme_split_right_after_separator_is_kept():
+    assert scan(["x trojan://", "pass@f.example:443 y"]) == ["trojan://pass@f.example:443"]
+
+def test_tail_without_whitespace_is_bounded():
+    scanner = LinkScanner()
+    scanner.feed("a" * 100_000)
+    assert len(scanner._tail) <= len("trojan://")
+
+class StandInSource:
+    """Server HTTP lokal yang menyajikan `body` (bytes) dengan content-type tertentu"""
+
+    def __init__(self, body, content_type="text/plain"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/sub"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(body, content_type="text/plain"):
+        server = StandInSource(body, content_type)
+        servers.append(server)
+        return server.url
+
+    yield start
+    for server in servers:
+        server.close()
+
+def test_stream_in_small_chunks_matches_findall(serve, monkeypatch):
+    monkeypatch.setattr(link_stream, "CHUNK_SIZE", 5)
+    stream = LinkStream(serve(TEXT.encode()))
+    assert list(stream) == VPN_LINK_PATTERN.findall(TEXT)
+    assert stream.format == "text"
+    assert stream.bytes_read == len(TEXT.encode())
+    assert not stream.truncated
+
+def test_stream_stops_at_max_bytes(serve, monkeypatch):
+    monkeypatch.setattr(link_stream, "CHUNK_SIZE", 16)
+    body = ("vless://uuid@host.example:443#x\n" * 100).encode()
+    stream = LinkStream(serve(body), max_bytes=200)
+    links = list(stream)
+    assert stream.truncated
+    assert stream.bytes_read == 200
+    assert links == VPN_LINK_PATTERN.findall(body[:200].decode())
+
+def test_json_source_is_parsed_whole(serve):
+    payload = {"data": [{"link": "vless://uuid@j.example:443#J"}, {"nested": ["trojan://p@k.example:443"]}]}
+    stream = LinkStream(serve(json.dumps(payload).encode(), "application/json"))
+    assert list(stream) == ["vless://uuid@j.example:443#J", "trojan://p@k.example:443"]
+    assert stream.format == "json"
@@ -0,0 +1,102 @@
+"""SpeedTester & ProxyHTTPClient lewat stand-in proxy HTTP lokal (tanpa xray)"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from proxy_http import ProxyHTTPClient
+from speedtest import DEFAULT_SPEEDTEST_CONFIG, SpeedTester
+
+class StandInProxy:
+    """
+    Proxy HTTP palsu: request absolute-URI dijawab langsung (seperti inbound xray + server tujuan).
+    GET /payload?bytes=N → N byte, POST /upload → 200, selain itu 204.
+    """
+
+    def __init__(self):
+        self.requests = []  # (method, absolute URI, panjang body request)
+        self.connections = set()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive seperti xray
+
+            def _reply(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stand_in.connections.add(self.client_address)
+                stand_in.requests.append(("GET", self.path, 0))
+                parts = urlsplit(self.path)
+                if parts.path == "/payload":
+                    self._reply(200, b"x" * int(parse_qs(parts.query)["bytes"][0]))
+                else:
+                    self._reply(204)
+
+            def do_POST(self):
+                stand_in.connections.add(self.client_address)
+                size = int(self.headers["Content-Length"])
+                self.rfile.read(size)
+                stand_in.requests.append(("POST", self.path, size))
+                self._reply(200, b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def proxy():
+    server = StandInProxy()
+    yield server
+    server.close()
+
+def make_config(**overrides):
+    config = dict(DEFAULT_SPEEDTEST_CONFIG)
+    config.update({
+        "download_url": "http://speed.test/payload?bytes={bytes}",
+        "upload_url": "http://speed.test/upload",
+        "download_bytes": 200_000,
+        "upload_bytes": 100_000,
+        "timeout_seconds": 5,
+    })
+    config.update(overrides)
+    return config
+
+def test_measure_through_proxy_uses_configured_endpoints(proxy):
+    speed = SpeedTester(make_config()).measure_through_proxy(proxy.url)
+    assert proxy.requests == [
+        ("GET", "http://speed.test/payload?bytes=200000", 0),
+        ("POST", "http://speed.test/upload", 100_000),
+    ]
+    assert speed["download_mbps"] > 0
+    assert speed["upload_mbps"] > 0
+    assert speed["ttfb_ms"] >= 0
+    assert len(proxy.connections) == 1  # download & upload satu koneksi keep-alive
+
+def test_latency_samples_share_one_connection(proxy):
+    with ProxyHTTPClient.from_url(proxy.url, timeout=5) as client:
+        timing = client.measure_latency("http://latency.test/generate_204", samples=3)
+    assert len(timing["samples"]) == 3
+    assert [r[1] for r in proxy.requests] == ["http://latency.test/generate_204"] * 3
+    assert len(proxy.connections) == 1
+
+def test_check_alerts_flags_values_below_thresholds():
+    tester = SpeedTester(make_config(alert_download_threshold=10, alert_upload_threshold=5,
+                                     alert_ping_threshold=100))
+    assert tester.check_alerts({"download_mbps": 50, "upload_mbps": 20}, 40) == []
+    assert tester.check_alerts({"download_mbps": 2, "upload_mbps": 1}, 250) == [
+        "download < 10 Mbps", "upload < 5 Mbps", "ping > 100 ms",
+    ]
+    assert tester.check_alerts({"download_mbps": 50, "upload_mbps": 20}, "Timeout") == []
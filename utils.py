@@ -1,6 +1,11 @@
+import os
 import socket
+import ssl
+import base64
 import re
 import time
+import asyncio
+import errno
 import subprocess
 import statistics
 
@@ -14,31 +19,59 @@ def get_flag_emoji(country_code: str) -> str:
         return '❓'
     return "".join(chr(ord(char.upper()) - ord('A') + 0x1F1E6) for char in country_code)
 
+def _parse_ping_output(output: str, count: int) -> dict:
+    result = {"Latency": -1, "Jitter": -1, "ICMP": "Failed"}
+    latencies = [float(x) for x in re.findall(r"time=([\d.]+)", output)]
+    if not latencies:
+        return result
+    result["Latency"] = round(statistics.mean(latencies))
+    if len(latencies) > 1:
+        jitters = [abs(latencies[i] - latencies[i-1]) for i in range(1, len(latencies))]
+        result["Jitter"] = round(statistics.mean(jitters))
+    else:
+        result["Jitter"] = 0
+    loss_match = re.search(r"(\d+)% packet loss", output)
+    if loss_match and int(loss_match.group(1)) == 0:
+        result["ICMP"] = "✔"
+    else:
+        received_match = re.search(r"(\d+) packets received", output) or re.search(r"(\d+) received", output)
+        received = int(received_match.group(1)) if received_match else 0
+        result["ICMP"] = f"{received}/{count}"
+    return result
+
 def get_network_stats(host: str, count: int = 4) -> dict:
     command = ["ping", "-c", str(count), "-i", "0.2", host]
     result = {"Latency": -1, "Jitter": -1, "ICMP": "Failed"}
     try:
         output = subprocess.check_output(command, stderr=subprocess.STDOUT, universal_newlines=True, timeout=5)
-        latencies = [float(x) for x in re.findall(r"time=([\d.]+)", output)]
-        if not latencies:
-            return result
-        result["Latency"] = round(statistics.mean(latencies))
-        if len(latencies) > 1:
-            jitters = [abs(latencies[i] - latencies[i-1]) for i in range(1, len(latencies))]
-            result["Jitter"] = round(statistics.mean(jitters))
-        else:
-            result["Jitter"] = 0
-        loss_match = re.search(r"(\d+)% packet loss", output)
-        if loss_match and int(loss_match.group(1)) == 0:
-            result["ICMP"] = "✔"
-        else:
-            received_match = re.search(r"(\d+) packets received", output) or re.search(r"(\d+) received", output)
-            received = int(received_match.group(1)) if received_match else 0
-            result["ICMP"] = f"{received}/{count}"
+        result = _parse_ping_output(output, count)
     except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
         pass
     return result
 
+async def get_network_stats_async(host: str, count: int = 4, timeout: float = 5) -> dict:
+    """Versi async dari get_network_stats: ping jalan tanpa nge-block event loop."""
+    command = ["ping", "-c", str(count), "-i", "0.2", host]
+    result = {"Latency": -1, "Jitter": -1, "ICMP": "Failed"}
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+    except (FileNotFoundError, PermissionError):
+        return result
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return result
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    if proc.returncode == 0:
+        result = _parse_ping_output(stdout.decode(errors="replace"), count)
+    return result
+
 def is_alive(host, port=443, timeout=3) -> tuple[bool, int]:
     start_time = time.time()
     try:
@@ -48,24 +81,178 @@ def is_alive(host, port=443, timeout=3) -> tuple[bool, int]:
     except (socket.timeout, ConnectionRefusedError, OSError, TypeError):
         return False, -1
 
-def geoip_lookup(ip: str) -> dict:
+def classify_connect_error(exc) -> str:
+    """Kelompokkan error koneksi: timeout, tls, refused, unreachable, dns, atau error."""
+    if isinstance(exc, (asyncio.TimeoutError, socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(exc, ssl.SSLError):
+        return "tls"
+    if isinstance(exc, ConnectionRefusedError):
+        return "refused"
+    if isinstance(exc, socket.gaierror):
+        return "dns"
+    if isinstance(exc, OSError) and exc.errno in (errno.ENETUNREACH, errno.EHOSTUNREACH, errno.EHOSTDOWN):
+        return "unreachable"
+    return "error"
+
+async def probe_tcp(host, port=443, timeout=3) -> tuple[bool, int, str]:
+    """TCP connect non-blocking; return (ok, latency_ms, error_kind) - error_kind "" kalau sukses."""
+    start_time = time.monotonic()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout=timeout)
+    except (asyncio.TimeoutError, OSError, TypeError, ValueError) as e:
+        return False, -1, classify_connect_error(e)
+    latency = int((time.monotonic() - start_time) * 1000)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (ConnectionError, OSError):
+        pass
+    return True, latency, ""
+
+_tls_contexts = {}
+
+def _get_tls_context(verify=True) -> ssl.SSLContext:
+    """SSLContext (verifikasi / tanpa verifikasi), dibuat sekali (load CA store mahal)"""
+    if verify not in _tls_contexts:
+        context = ssl.create_default_context()
+        if not verify:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        _tls_contexts[verify] = context
+    return _tls_contexts[verify]
+
+def _new_probe_result(**extra) -> dict:
+    result = {"ok": False, "tcp_ms": -1, "tls_ms": -1, "cert_valid": False, "error_kind": "", "cert_error": ""}
+    result.update(extra)
+    return result
+
+async def _open_probe_stream(host, port, server_name, timeout, result, verify=True):
+    """
+    TCP connect (+ TLS handshake kalau server_name diisi), isi tcp_ms/tls_ms/cert_* di result.
+    Return (reader, writer, usable); writer None kalau TCP gagal. usable False kalau handshake
+    gagal - termasuk sertifikat tidak valid (cert_error terisi, tls_ms tetap dicatat).
+    """
+    start_time = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout=timeout)
+    except (asyncio.TimeoutError, OSError, TypeError, ValueError) as e:
+        result["error_kind"] = classify_connect_error(e)
+        return None, None, False
+    tcp_done = time.monotonic()
+    result["tcp_ms"] = int((tcp_done - start_time) * 1000)
+    if not server_name:
+        return reader, writer, True
+
+    try:
+        remaining = max(0.05, timeout - (tcp_done - start_time))
+        await asyncio.wait_for(
+            writer.start_tls(_get_tls_context(verify), server_hostname=server_name),
+            timeout=remaining
+        )
+    except ssl.SSLCertVerificationError as e:
+        result["cert_error"] = e.verify_message or str(e)
+        result["tls_ms"] = int((time.monotonic() - tcp_done) * 1000)
+        return reader, writer, False
+    except (asyncio.TimeoutError, OSError) as e:
+        result["error_kind"] = classify_connect_error(e)
+        return reader, writer, False
+    result["tls_ms"] = int((time.monotonic() - tcp_done) * 1000)
+    result["cert_valid"] = verify
+    return reader, writer, True
+
+def _abort(writer):
+    # abort, bukan close: setelah handshake gagal/dibatalkan, close bisa menunggu close_notify selamanya
+    if writer is not None:
+        writer.transport.abort()
+
+async def probe_tls(host, port=443, server_name=None, timeout=3) -> dict:
+    """
+    TCP connect lalu TLS handshake dengan SNI server_name, waktu tiap tahap dicatat terpisah.
+    Sertifikat yang gagal diverifikasi tetap dihitung hidup (server menjawab handshake),
+    tapi cert_valid False. Return dict: ok, tcp_ms, tls_ms, cert_valid, error_kind, cert_error.
+    """
+    result = _new_probe_result()
+    _, writer, usable = await _open_probe_stream(host, port, server_name or host, timeout, result)
+    result["ok"] = usable or bool(result["cert_error"])
+    _abort(writer)
+    return result
+
+async def probe_websocket(host, port=443, path="/", host_header=None, server_name=None, timeout=3) -> dict:
+    """
+    TCP (+ TLS kalau server_name diisi) lalu HTTP/1.1 Upgrade: websocket ke path dengan Host header.
+    ok hanya kalau server menjawab 101. Sertifikat tidak valid: handshake diulang tanpa verifikasi
+    supaya upgrade tetap bisa dites (cert_valid False). Return dict seperti probe_tls plus
+    status (kode HTTP, 0 kalau tidak ada jawaban) dan upgrade_ms.
+    """
+    result = _new_probe_result(status=0, upgrade_ms=-1)
+    start_time = time.monotonic()
+    reader, writer, usable = await _open_probe_stream(host, port, server_name, timeout, result)
+    if writer is not None and not usable and result["cert_error"]:
+        _abort(writer)
+        remaining = max(0.05, timeout - (time.monotonic() - start_time))
+        reader, writer, usable = await _open_probe_stream(host, port, server_name, remaining, result, verify=False)
+    if not usable:
+        _abort(writer)
+        return result
+
+    key = base64.b64encode(os.urandom(16)).decode()
+    request = (
+        f"GET {path or '/'} HTTP/1.1\r\n"
+        f"Host: {host_header or server_name or host}\r\n"
+        "User-Agent: Mozilla/5.0\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n\r\n"
+    )
+    upgrade_start = time.monotonic()
+    try:
+        writer.write(request.encode())
+        remaining = max(0.05, timeout - (upgrade_start - start_time))
+        status_line = await asyncio.wait_for(reader.readline(), timeout=remaining)
+    except (asyncio.TimeoutError, OSError) as e:
+        result["error_kind"] = classify_connect_error(e)
+        _abort(writer)
+        return result
+    result["upgrade_ms"] = int((time.monotonic() - upgrade_start) * 1000)
+
+    parts = status_line.decode("latin-1").split()
+    if len(parts) >= 2 and parts[0].startswith("HTTP/") and parts[1].isdigit():
+        result["status"] = int(parts[1])
+        result["ok"] = result["status"] == 101
+    else:
+        result["error_kind"] = "error"
+    _abort(writer)
+    return result
+
+def geoip_from_api_data(data) -> dict:
+    """Konversi jawaban mentah ip-api ke format {"Country", "Provider"}."""
+    if not data or data.get("status") != "success":
+        return {"Country": "❓", "Provider": "-"}
+    provider = data.get('org') or data.get('isp') or "-"
+    return {
+        "Country": get_flag_emoji(data.get('countryCode', '')),
+        "Provider": provider
+    }
+
+def geoip_lookup(ip: str, priority=None) -> dict:
     default_result = {"Country": "❓", "Provider": "-"}
     if not ip or not isinstance(ip, str): return default_result
     
     if not requests:
         return default_result
-        
-    try:
-        url = f"http://ip-api.com/json/{ip}?fields=status,country,countryCode,isp,org"
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("status") == "success":
-                provider = data.get('org') or data.get('isp') or "-"
-                return {
-                    "Country": get_flag_emoji(data.get('countryCode', '')),
-                    "Provider": provider
-                }
-        return default_result
-    except (requests.RequestException, AttributeError):
-        return default_result
\ No newline at end of file
+    
+    # Lewat GeoIPClient: ikut batch /batch ip-api (token bucket + antrian prioritas) dan cache SQLite
+    from geoip_client import get_geoip_client, PRIORITY_NORMAL
+    client = get_geoip_client()
+    return geoip_from_api_data(client.lookup(ip, priority=PRIORITY_NORMAL if priority is None else priority))
+
+async def geoip_lookup_async(ip: str, priority=None) -> dict:
+    """geoip_lookup tanpa nge-block event loop (ikut antrian batch GeoIPClient)."""
+    if not ip or not isinstance(ip, str) or not requests:
+        return {"Country": "❓", "Provider": "-"}
+    from geoip_client import get_geoip_client, PRIORITY_NORMAL
+    client = get_geoip_client()
+    return geoip_from_api_data(
+        await client.lookup_async(ip, priority=PRIORITY_NORMAL if priority is None else priority))
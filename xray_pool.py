@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Xray Worker Pool - jalankan beberapa proses xray sekaligus tanpa bentrok port
+Setiap worker dapat port inbound sendiri (dialokasikan dinamis) dan temp config sendiri
+"""
+
+import json
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+XRAY_PATH = './xray'
+XRAY_POOL_SIZE = int(os.getenv("XRAY_POOL_SIZE", "0")) or (os.cpu_count() or 4)
+XRAY_STARTUP_TIMEOUT = float(os.getenv("XRAY_STARTUP_TIMEOUT", "5"))  # detik, batas tunggu sampai semua inbound listening
+XRAY_READY_POLL = 0.05  # detik antar cek port
+XRAY_BATCH_SIZE = 64  # akun per proses xray di batch mode
+
+class XrayStartupError(RuntimeError):
+    """xray keluar sebelum siap, atau inbound tidak listening dalam batas waktu"""
+
+class XrayWorker:
+    """Satu proses xray yang sedang jalan dengan port inbound miliknya sendiri"""
+
+    def __init__(self, ports, process, config_path):
+        self.ports = list(ports)
+        self.port = self.ports[0]
+        self.process = process
+        self.config_path = config_path
+
+    @property
+    def proxy_url(self):
+        return self.proxy_url_for(0)
+
+    def proxy_url_for(self, index):
+        """URL proxy HTTP untuk inbound ke-index (batch mode: satu inbound per akun)"""
+        return f"http://127.0.0.1:{self.ports[index]}"
+
+class XrayWorkerPool:
+    """Batasi jumlah xray yang jalan bersamaan dan kelola port + temp config tiap worker"""
+
+    def __init__(self, size=XRAY_POOL_SIZE, xray_path=XRAY_PATH, startup_timeout=XRAY_STARTUP_TIMEOUT):
+        self.size = max(1, int(size))
+        self.xray_path = xray_path
+        self.startup_timeout = float(startup_timeout)
+        self._slots = threading.Condition()  # jaga self._active <= self.size
+        self._active = 0
+        self._ports_lock = threading.Lock()
+        self._reserved_ports = set()
+
+    def is_available(self):
+        return os.path.exists(self.xray_path)
+
+    def resize(self, size):
+        """
+        Ubah jumlah worker maksimum di tempat. Worker yang sedang jalan tetap dihitung,
+        jadi kalau pool dikecilkan, worker baru menunggu sampai jumlahnya di bawah size baru.
+        """
+        with self._slots:
+            self.size = max(1, int(size))
+            self._slots.notify_all()
+
+    @contextmanager
+    def _slot(self):
+        with self._slots:
+            while self._active >= self.size:
+                self._slots.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._slots:
+                self._active -= 1
+                self._slots.notify()
+
+    def _allocate_port(self):
+        """Minta port kosong dari OS; port yang sedang dipakai worker lain dilewati"""
+        while True:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.bind(("127.0.0.1", 0))
+                port = sock.getsockname()[1]
+            with self._ports_lock:
+                if port not in self._reserved_ports:
+                    self._reserved_ports.add(port)
+                    return port
+
+    def _release_port(self, port):
+        with self._ports_lock:
+            self._reserved_ports.discard(port)
+
+    @contextmanager
+    def worker(self, build_config):
+        """
+        Jalankan satu xray worker.
+        build_config(port) -> dict config xray (atau None kalau gagal dibuat).
+        Yield XrayWorker (atau None kalau config gagal); proses & temp file selalu dibersihkan.
+        """
+        with self.batch_worker(lambda ports: build_config(ports[0]), 1) as worker:
+            yield worker
+
+    @contextmanager
+    def batch_worker(self, build_config, count):
+        """
+        Jalankan satu xray dengan `count` inbound sekaligus (satu port per akun).
+        build_config(ports) -> dict config xray dengan inbound di port-port tersebut.
+        """
+        with self._slot():
+            ports = [self._allocate_port() for _ in range(max(1, count))]
+            config_path = None
+            process = None
+            try:
+                config = build_config(ports)
+                if not config:
+                    yield None
+                    return
+                with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+                    json.dump(config, f)
+                    config_path = f.name
+                process = subprocess.Popen(
+                    [self.xray_path, '-c', config_path],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+                wait_until_ready(process, ports, self.startup_timeout)
+                yield XrayWorker(ports, process, config_path)
+            finally:
+                if process is not None:
+                    process.kill()
+                    process.wait()
+                if config_path and os.path.exists(config_path):
+                    os.unlink(config_path)
+                for port in ports:
+                    self._release_port(port)
+
+def _port_is_listening(port):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=XRAY_READY_POLL):
+            return True
+    except OSError:
+        return False
+
+def wait_until_ready(process, ports, timeout=XRAY_STARTUP_TIMEOUT):
+    """
+    Tunggu sampai semua inbound xray menerima koneksi (poll port), bukan sleep tetap.
+    Gagal cepat kalau proses keluar duluan (mis. config salah).
+    """
+    deadline = time.monotonic() + timeout
+    waiting = list(ports)
+    while True:
+        exit_code = process.poll()
+        if exit_code is not None:
+            raise XrayStartupError(f"xray exited early with code {exit_code}")
+        waiting = [port for port in waiting if not _port_is_listening(port)]
+        if not waiting:
+            return
+        if time.monotonic() >= deadline:
+            raise XrayStartupError(f"xray not ready after {timeout}s ({len(waiting)} inbound belum listening)")
+        time.sleep(XRAY_READY_POLL)
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+def get_xray_pool(xray_path=XRAY_PATH) -> XrayWorkerPool:
+    """Pool bersama untuk satu proses"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None or _shared_pool.xray_path != xray_path:
+            _shared_pool = XrayWorkerPool(xray_path=xray_path)
+        return _shared_pool
+
+def configure_xray_pool(size=None, startup_timeout=None, xray_path=XRAY_PATH) -> XrayWorkerPool:
+    """
+    Atur ukuran pool bersama / timeout startup xray; None = default.
+    Pool yang sudah ada diubah di tempat (bukan diganti), jadi worker yang masih jalan tetap
+    dihitung terhadap batas yang sama.
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None or _shared_pool.xray_path != xray_path:
+            _shared_pool = XrayWorkerPool(xray_path=xray_path)
+        _shared_pool.resize(size or XRAY_POOL_SIZE)
+        _shared_pool.startup_timeout = float(startup_timeout or XRAY_STARTUP_TIMEOUT)
+        print(f"⚙️ Xray pool: {_shared_pool.size} workers, startup timeout {_shared_pool.startup_timeout:.1f}s")
+        return _shared_pool